@@ -28,6 +28,7 @@ DEBUG = True
 ALLOWED_HOSTS = []
 
 # Allowed IP or WiFi gateways for attendance marking
+# Entries may be single addresses or CIDR ranges, e.g. "192.168.1.0/24"
 ALLOWED_WIFI_IPS = ["192.168.1.21", "2401:4900:88e4:cb03:94ac:daad:7e6a:840b","192.168.1.68"]  
 
 
@@ -48,10 +49,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'myapp.middleware.QueryInstrumentationMiddleware',  # no-op unless REQUEST_INSTRUMENTATION
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'myapp.middleware.StaffMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -83,6 +86,33 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Concurrent-write profile: readers never block the writer (WAL), commits
+        # fsync only at checkpoints and a writer waits up to 10s for the lock.
+        # The read-then-write service functions take the write lock at BEGIN
+        # (services.write_atomic) and retry locks SQLite gives up on at once
+        # (services.retry_on_lock); other transactions stay deferred.
+        'OPTIONS': {
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+            'timeout': 10,
+        },
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        # A file, so threaded tests see real SQLite locking
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    }
+}
+
+
+# Cache
+# Shared by every worker process on the host, so an invalidation in one worker
+# reaches the others (the default LocMemCache is per process). Point this at
+# Redis/Memcached when running on more than one host.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.django_cache',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
     }
 }
 
@@ -90,6 +120,9 @@ DATABASES = {
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
+# ModelBackend, but async logins hash passwords off the event loop
+AUTHENTICATION_BACKENDS = ['myapp.backends.StaffModelBackend']
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -138,6 +171,32 @@ EMAIL_HOST_PASSWORD = 'zkpa srwy wodm lnnf' # app-specific password, not Gmail p
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
 
+# Per-request query count / SQL time logging and Server-Timing headers
+REQUEST_INSTRUMENTATION = False
+REQUEST_SLOW_THRESHOLD_MS = 500  # slower requests are logged with their slowest SQL
+REQUEST_LOG_SQL_PARAMS = False  # debug only: bound values include session keys and emails
+
+# Serve login, batches, student list and attendance marking from myapp.async_views
+# when running the ASGI application in asgi.py. This is not a speed-up on this
+# stack: with SQLite every async ORM call still runs on one sync thread, and the
+# load_test command measures these views slower than the WSGI ones. Keep it off
+# under WSGI, and under ASGI unless measured behind the real server.
+ASYNC_STAFF_VIEWS = False
+ASYNC_BLOCKING_WORKERS = 4  # threads for password hashing / IP detection from async views
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'myapp': {'handlers': ['console'], 'level': 'WARNING'},
+        'myapp.middleware': {'level': 'INFO'},
+    },
+}
+
+
 # Redirect users after login
 LOGIN_REDIRECT_URL = '/admin/'   # sends you to admin dashboard after login
 LOGOUT_REDIRECT_URL = '/'        # optional: send users to home after logout
@@ -1,9 +1,22 @@
-from django.contrib import admin
+import csv
+
+from django.contrib import admin, messages
 from django import forms
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
 from django.utils.translation import gettext_lazy as _
-from .models import Staff, Course, Student, CourseTopic, StudentTopicProgress, Attendance , StudentAttendance ,Batch
+from .models import Staff, Course, Student, CourseTopic, StudentTopicProgress, Attendance , StudentAttendance ,Batch, EmailOutbox, StudentProgressSummary
 from django.urls import path
-from django.http import JsonResponse
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils.cache import patch_cache_control
+from .caching import course_staff, get_course_tree, staff_batches
+from .exports import attendance_csv_response, progress_csv_response
+from .imports import (
+    STUDENT_IMPORT_COLUMNS, import_curriculum, import_students, read_csv_rows, read_curriculum,
+    validate_student_rows,
+)
+from .paginators import LargeTableAdminMixin
 
 
 # Customize admin site
@@ -17,7 +30,7 @@ class CourseWithStaffFilter(admin.SimpleListFilter):
     parameter_name = 'course'
 
     def lookups(self, request, model_admin):
-        qs = Course.objects.all().order_by('course_name')
+        qs = Course.objects.prefetch_related('staffs').order_by('course_name')
         return [
             (c.pk, f"{c.course_name} ({', '.join([s.staff_name for s in c.staffs.all()])})")
             for c in qs
@@ -30,6 +43,50 @@ class CourseWithStaffFilter(admin.SimpleListFilter):
         return queryset
 
 
+# ----------------------------
+# Autocomplete (type-ahead) Filter
+# ----------------------------
+class AutocompleteListFilter(admin.SimpleListFilter):
+    """Type-ahead sidebar filter for a high-cardinality foreign key.
+
+    Options are fetched page by page from the admin autocomplete endpoint
+    (the related model's admin must define search_fields), so rendering the
+    sidebar only loads the currently selected object. parameter_name is the
+    name of the foreign key on the filtered model.
+    """
+    template = 'admin/myapp/autocomplete_filter.html'
+
+    def __init__(self, request, params, model, model_admin):
+        self.field = model._meta.get_field(self.parameter_name)
+        self.title = self.field.verbose_name
+        self.opts = model._meta
+        super().__init__(request, params, model, model_admin)
+
+    def has_output(self):
+        return True
+
+    def lookups(self, request, model_admin):
+        value = self.value()
+        if not value:
+            return []
+        related_admin = model_admin.admin_site.get_model_admin(self.field.related_model)
+        try:
+            selected = related_admin.get_queryset(request).filter(pk=value).first()
+        except (ValueError, ValidationError):
+            return []
+        return [(selected.pk, str(selected))] if selected else []
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value:
+            return queryset.filter(**{self.field.attname: value})
+        return queryset
+
+
+class StudentAutocompleteFilter(AutocompleteListFilter):
+    parameter_name = 'student'
+
+
 # ----------------------------
 # Student Form (show staff in course name)
 # ----------------------------
@@ -46,29 +103,37 @@ class StudentAdminForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        print(self.data.get('staff'))
+        # Options come from the cached course -> staff -> batch tree; the
+        # querysets are only evaluated to validate a submitted choice.
+        staff_options = []
         if 'course' in self.data:
-            print("Course in data:", self.data.get('course'))
             try:
-                course_id = int(self.data.get('course'))
-                self.fields['staff'].queryset = Staff.objects.filter(courses__course_id=course_id)
-
+                staff_options = course_staff(int(self.data.get('course')))
             except (ValueError, TypeError):
-                self.fields['staff'].queryset = Staff.objects.none()
-        elif self.instance.pk and self.instance.course:
-            self.fields['staff'].queryset = self.instance.course.staffs.all()
-        
+                pass
+        elif self.instance.pk and self.instance.course_id:
+            staff_options = course_staff(self.instance.course_id)
+        self._set_options('staff', Staff, staff_options)
+
+        batch_options = []
         if 'staff' in self.data:
             try:
-                staff_id = int(self.data.get('staff'))
-                self.fields['batch'].queryset = Batch.objects.filter(staff_id=staff_id)
+                batch_options = staff_batches(int(self.data.get('staff')))
             except (ValueError, TypeError):
-                self.fields['batch'].queryset = Batch.objects.none()
-        elif self.instance.pk and self.instance.staff:
-            self.fields['batch'].queryset = Batch.objects.filter(staff=self.instance.staff)
-        else:
-            # Add this: no staff selected -> empty queryset
-            self.fields['batch'].queryset = Batch.objects.none()
+                pass
+        elif self.instance.pk and self.instance.staff_id:
+            batch_options = staff_batches(self.instance.staff_id)
+        # no staff selected -> no batches
+        self._set_options('batch', Batch, batch_options)
+
+    def _set_options(self, name, model, options):
+        field = self.fields[name]
+        field.queryset = model.objects.filter(pk__in=[o["id"] for o in options])
+        field.choices = [("", field.empty_label)] + [(o["id"], o["name"]) for o in options]
+
+class StudentImportForm(forms.Form):
+    file = forms.FileField(help_text="CSV file with a header row.")
+
 
 # ----------------------
 # staff Course Filter
@@ -170,64 +235,144 @@ class StudentAdmin(admin.ModelAdmin):
     list_filter = (CourseWithStaffFilter,)
     search_fields = ('student_name',)
 
+    change_list_template = "admin/myapp/student/change_list.html"
+
     class Media:
         js = ("myapp/student_admin_v2.js",)
 
+    def get_queryset(self, request):
+        # Student.__str__ shows course and staff (changelist, autocomplete results)
+        return super().get_queryset(request).select_related('course', 'staff')
+
     def get_urls(self):
         urls = super().get_urls()
         custom_urls = [
+            path('import/', self.admin_site.admin_view(self.import_csv), name='myapp_student_import'),
+            path('course-tree/', self.admin_site.admin_view(self.get_course_tree), name='course_tree'),
             path('getstaff/', self.admin_site.admin_view(self.get_staff), name='getstaff'),
             path('getbatches/', self.admin_site.admin_view(self.get_batches), name='getbatches'),
         ]
         return custom_urls + urls
 
-    def get_staff(self, request):
-        print(" get_staff called", request.GET)
-        course_id = request.GET.get('course_id')
-        staff_list = []
-        if course_id:
-            staffs = Staff.objects.filter(courses__course_id=course_id)
-            staff_list = [{"id": s.staff_id, "name": s.staff_name} for s in staffs]
-        return JsonResponse(staff_list, safe=False)
-    
-    def get_batches(self, request):
-        """AJAX: return batches for a single staff (filtered)."""   
-        staff_id = request.GET.get('staff_id')
-        batch_list = []
-        # debug log to server console
-        print("DEBUG get_batches called, raw staff_id:", repr(staff_id))
-
-        if staff_id:
+    def import_csv(self, request):
+        """Bulk-create students from an uploaded CSV after validating every row."""
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = StudentImportForm(request.POST or None, request.FILES or None)
+        errors = []
+        if request.method == "POST" and form.is_valid():
             try:
-                sid = int(staff_id)
-            except (ValueError, TypeError):
-                print("DEBUG get_batches: invalid staff_id, returning empty")
-                return JsonResponse(batch_list, safe=False)
-
-            # ensure we only filter by staff id
-            batches = Batch.objects.filter(staff_id=sid).order_by('start_time')
-            print("DEBUG get_batches: matched batches (ids):", list(batches.values_list('batch_id', flat=True)))
-
-            batch_list = [{"id": b.batch_id, "name": str(b)} for b in batches]
-
+                rows = read_csv_rows(form.cleaned_data['file'])
+            except (ValidationError, csv.Error) as exc:
+                form.add_error('file', exc.messages if isinstance(exc, ValidationError) else str(exc))
+            else:
+                students, errors = validate_student_rows(rows)
+                if not errors and not students:
+                    form.add_error('file', "The file has no student rows.")
+                elif not errors:
+                    created = import_students(students)
+                    self.message_user(request, f"Imported {len(created)} students.", messages.SUCCESS)
+                    return redirect('admin:myapp_student_changelist')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Import students",
+            'form': form,
+            'errors': errors,
+            'columns': STUDENT_IMPORT_COLUMNS,
+        }
+        return TemplateResponse(request, "admin/myapp/student/import.html", context)
+
+    def _cached_json(self, request, data, etag):
+        """JSON response that browsers revalidate with If-None-Match."""
+        etag = f'"{etag}"'
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
         else:
-            print("DEBUG get_batches: no staff_id provided in request")
-
-        return JsonResponse(batch_list, safe=False)
-
-
-
+            response = JsonResponse(data, safe=False)
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get_course_tree(self, request):
+        """AJAX: the whole course -> staff -> batch tree, or one course with ?course_id="""
+        tree, etag = get_course_tree()
+        course_id = request.GET.get('course_id')
+        if course_id:
+            tree = [course for course in tree if str(course["id"]) == course_id]
+            etag = f"{etag}-{course_id}"
+        return self._cached_json(request, tree, etag)
 
+    def get_staff(self, request):
+        """AJAX: return staff for a single course (from the cached tree)."""
+        tree, etag = get_course_tree()
+        staff_list = []
+        try:
+            staff_list = [{"id": s["id"], "name": s["name"]} for s in course_staff(int(request.GET.get('course_id')), tree)]
+        except (ValueError, TypeError):
+            pass
+        return self._cached_json(request, staff_list, f"{etag}-c{request.GET.get('course_id')}")
 
+    def get_batches(self, request):
+        """AJAX: return batches for a single staff (from the cached tree)."""
+        tree, etag = get_course_tree()
+        batch_list = []
+        try:
+            batch_list = staff_batches(int(request.GET.get('staff_id')), tree)
+        except (ValueError, TypeError):
+            pass
+        return self._cached_json(request, batch_list, f"{etag}-s{request.GET.get('staff_id')}")
 
 
 # ----------------------------
 # Course Topic Admin
 # ----------------------------
+class CurriculumImportForm(forms.Form):
+    course = forms.ModelChoiceField(queryset=Course.objects.order_by('course_name'))
+    file = forms.FileField(help_text="CSV with module_name,topic_name columns, or a YAML file.")
+
+
 @admin.register(CourseTopic)
 class CourseTopicAdmin(admin.ModelAdmin):
     list_display = ('topic_id', 'course', 'module_name', 'topic_name')
     list_filter = ('course', 'module_name')
+    change_list_template = "admin/myapp/coursetopic/change_list.html"
+
+    def get_urls(self):
+        custom_urls = [
+            path('import/', self.admin_site.admin_view(self.import_curriculum), name='myapp_coursetopic_import'),
+        ]
+        return custom_urls + super().get_urls()
+
+    def import_curriculum(self, request):
+        """Load a whole course's modules and topics from one uploaded file."""
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = CurriculumImportForm(request.POST or None, request.FILES or None)
+        if request.method == "POST" and form.is_valid():
+            try:
+                pairs = read_curriculum(form.cleaned_data['file'])
+            except (ValidationError, csv.Error) as exc:
+                form.add_error('file', exc.messages if isinstance(exc, ValidationError) else str(exc))
+            else:
+                course = form.cleaned_data['course']
+                created, progress_rows = import_curriculum(course, pairs)
+                self.message_user(
+                    request,
+                    f"{course.course_name}: {created} new topic(s) from {len(pairs)} entries, "
+                    f"{progress_rows} student progress row(s) created.",
+                    messages.SUCCESS,
+                )
+                return redirect('admin:myapp_coursetopic_changelist')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Import curriculum",
+            'form': form,
+        }
+        return TemplateResponse(request, "admin/myapp/coursetopic/import.html", context)
 
 
 # ----------------------------
@@ -242,10 +387,17 @@ class AttendanceAdmin(admin.ModelAdmin):
 
 
 @admin.register(StudentAttendance)
-class StudentAttendanceAdmin(admin.ModelAdmin):
+class StudentAttendanceAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ("student", "student_course", "student_staff", "date", "status")
+    date_hierarchy = "date"
     list_filter = ("status", "date", "student__course__course_name", "student__staff__staff_name")
     search_fields = ("student__student_name", "student__staff__staff_name", "student__course__course_name")
+    list_select_related = ("student__course", "student__staff")
+    actions = ("export_csv",)
+
+    def export_csv(self, request, queryset):
+        return attendance_csv_response(queryset)
+    export_csv.short_description = "Export selected attendance as CSV"
 
     def student_course(self, obj):
         return obj.student.course.course_name
@@ -256,6 +408,36 @@ class StudentAttendanceAdmin(admin.ModelAdmin):
     student_staff.admin_order_field = "student__staff__staff_name"
 
 
+# --------------------------
+# EMAIL OUTBOX ADMIN
+# --------------------------
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ("recipient", "subject", "status", "attempts", "next_attempt_at", "sent_at")
+    list_filter = ("status",)
+    search_fields = ("recipient", "subject")
+    readonly_fields = ("created_at", "sent_at")
+
+
+# --------------------------
+# PROGRESS SUMMARY ADMIN (read-only, maintained from StudentTopicProgress)
+# --------------------------
+@admin.register(StudentProgressSummary)
+class StudentProgressSummaryAdmin(admin.ModelAdmin):
+    list_display = ("student", "topics_completed", "topics_total", "percent_completed",
+                    "average_marks", "last_activity")
+    list_filter = ("student__course", "student__staff")
+    list_select_related = ("student__course", "student__staff")
+    search_fields = ("student__student_name",)
+    ordering = ("-topics_completed",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 # --------------------------
 # BATCH ADMIN
 # --------------------------
@@ -272,7 +454,7 @@ from django.contrib import admin
 from .models import StudentTopicProgress
 
 @admin.register(StudentTopicProgress)
-class StudentTopicProgressAdmin(admin.ModelAdmin):
+class StudentTopicProgressAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = (
         'student_name', 
         'staff_name', 
@@ -284,27 +466,49 @@ class StudentTopicProgressAdmin(admin.ModelAdmin):
         'sign'
     )
     search_fields = ('student__student_name', 'topic__topic_name', 'sign')
+    # Join the whole FK chain so the row methods below never hit the database
+    list_select_related = ('student__staff', 'topic__course')
+    actions = ('export_csv',)
+
+    def export_csv(self, request, queryset):
+        return progress_csv_response(queryset)
+    export_csv.short_description = "Export selected progress as CSV"
 
     def student_name(self, obj):
         return obj.student.student_name
+    student_name.admin_order_field = "student__student_name"
 
     def staff_name(self, obj):
         return obj.student.staff.staff_name if obj.student.staff else "Unassigned"
+    staff_name.admin_order_field = "student__staff__staff_name"
 
     def course_name(self, obj):
         return obj.topic.course.course_name
+    course_name.admin_order_field = "topic__course__course_name"
 
     def module_name(self, obj):
         return obj.topic.module_name
+    module_name.admin_order_field = "topic__module_name"
 
     def topic_name(self, obj):
         return obj.topic.topic_name
+    topic_name.admin_order_field = "topic__topic_name"
     
     list_filter = (
         'topic__course__course_name',
         'topic__module_name',
         'student__staff__staff_name',
-        'student',
+        StudentAutocompleteFilter,
     )
 
+    class Media:
+        css = {"screen": ("admin/css/vendor/select2/select2.css", "admin/css/autocomplete.css")}
+        js = (
+            "admin/js/vendor/jquery/jquery.js",
+            "admin/js/vendor/select2/select2.full.js",
+            "admin/js/jquery.init.js",
+            "admin/js/autocomplete.js",
+            "myapp/autocomplete_filter.js",
+        )
+
     
@@ -0,0 +1,384 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+from functools import wraps
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_datetime
+from django.utils.http import quote_etag
+from django.utils.timezone import localdate
+from django.views.decorators.http import require_http_methods
+
+from .models import Batch, Student, StudentAttendance, StudentTopicProgress
+from .services import apply_attendance_operations, save_attendance_records, update_topic_progress
+from .summaries import progress_values
+
+# Largest number of records accepted in one POST
+MAX_RECORDS = 2000
+# Changed attendance rows returned per sync response
+SYNC_PAGE_SIZE = 500
+# How far ahead of the server clock a client timestamp may be
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+# (student, topic) pairs per OR filter when loading progress rows; SQLite
+# rejects expressions nested more than 1000 deep
+PAIRS_PER_QUERY = 200
+
+STATUS_VALUES = {"present": True, "absent": False, True: True, False: False}
+STATUS_NAMES = {True: "present", False: "absent", None: None}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def api_staff_required(view_func):
+    """JSON counterpart of views.staff_required: 401/403 instead of a redirect/404.
+
+    Also turns an ApiError raised by the view into a JSON error response.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "Authentication required."}, status=401)
+        if not request.staff:
+            return JsonResponse({"error": "Staff account required."}, status=403)
+        try:
+            return view_func(request, *args, **kwargs)
+        except ApiError as exc:
+            return JsonResponse({"error": str(exc)}, status=exc.status)
+    return wrapper
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _parse_date(value):
+    if not isinstance(value, str):
+        raise ValueError
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def _query_date(request, name, default):
+    value = request.GET.get(name)
+    if not value:
+        return default
+    try:
+        return _parse_date(value)
+    except ValueError:
+        raise ApiError(f"'{name}' must be a YYYY-MM-DD date.")
+
+
+def _query_ids(request, name):
+    try:
+        return {int(value) for value in request.GET.getlist(name)}
+    except ValueError:
+        raise ApiError(f"'{name}' must be an integer id.")
+
+
+def _staff_students(request):
+    """Students of the logged-in staff member, narrowed by ?batch= / ?student=."""
+    students = Student.objects.filter(staff=request.staff)
+    batch_ids = _query_ids(request, "batch")
+    if batch_ids:
+        if Batch.objects.filter(staff=request.staff, pk__in=batch_ids).count() != len(batch_ids):
+            raise ApiError("Unknown batch.", status=404)
+        students = students.filter(batch_id__in=batch_ids)
+    student_ids = _query_ids(request, "student")
+    if student_ids:
+        students = students.filter(pk__in=student_ids)
+    return students
+
+
+def _records(request):
+    """The ``records`` list of a JSON POST body."""
+    try:
+        body = json.loads(request.body)
+    except (UnicodeDecodeError, ValueError):
+        raise ApiError("Request body must be JSON.")
+    records = body.get("records") if isinstance(body, dict) else None
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        raise ApiError("'records' must be a list of objects.")
+    if len(records) > MAX_RECORDS:
+        raise ApiError(f"At most {MAX_RECORDS} records per request.", status=413)
+    return records
+
+
+def _conditional_json(request, data):
+    """JsonResponse with a content ETag; 304 Not Modified when If-None-Match matches.
+
+    The body is still built, but clients revalidating an unchanged list only
+    download the headers.
+    """
+    response = JsonResponse(data)
+    response["ETag"] = quote_etag(hashlib.md5(response.content, usedforsecurity=False).hexdigest())
+    patch_cache_control(response, private=True, no_cache=True)
+    return get_conditional_response(request, etag=response["ETag"], response=response)
+
+
+def _results(rows, errors, outcomes, written):
+    """Per-row results in request order; nothing is written when any row failed."""
+    results = []
+    for index, key in enumerate(rows):
+        if index in errors:
+            results.append({"index": index, "ok": False, "error": errors[index]})
+        else:
+            results.append({"index": index, "ok": True, "result": outcomes.get(key, "valid")})
+    return JsonResponse({"written": written, "results": results}, status=400 if errors else 200)
+
+
+@require_http_methods(["GET", "HEAD", "POST"])
+@api_staff_required
+def attendance(request):
+    """GET: attendance of the staff member's students (?batch=&student=&from=&to=,
+    dates default to today). POST: ``{"records": [{"student", "date",
+    "status": "present"|"absent"}]}`` across any batches and dates.
+
+    A POST is validated as a whole and written with one upsert in one
+    transaction; if any record is invalid nothing is written and the
+    response (HTTP 400) says which. Session authenticated: POSTs need the
+    CSRF token in the X-CSRFToken header.
+    """
+    today = localdate()
+    if request.method != "POST":
+        date_from = _query_date(request, "from", today)
+        date_to = _query_date(request, "to", date_from)
+        rows = (
+            StudentAttendance.objects
+            .filter(student__in=_staff_students(request), date__range=(date_from, date_to))
+            .order_by('date', 'student_id')
+            .values_list('student_id', 'student__batch_id', 'date', 'status')
+        )
+        return _conditional_json(request, {"records": [
+            {"student": student_id, "batch": batch_id, "date": day.isoformat(), "status": STATUS_NAMES[status]}
+            for student_id, batch_id, day, status in rows
+        ]})
+
+    records = _records(request)
+    known = set(Student.objects.filter(
+        staff=request.staff, pk__in=[r.get("student") for r in records if _is_int(r.get("student"))],
+    ).values_list('pk', flat=True))
+
+    keys, errors, statuses = [], {}, {}
+    for index, record in enumerate(records):
+        student_id, status = record.get("student"), record.get("status")
+        try:
+            day = _parse_date(record.get("date"))
+        except ValueError:
+            day = None
+        keys.append((student_id, day))
+        if not _is_int(student_id) or student_id not in known:
+            errors[index] = "Unknown student."
+        elif day is None:
+            errors[index] = "'date' must be a YYYY-MM-DD date."
+        elif day > today:
+            errors[index] = "Attendance cannot be marked for a future date."
+        elif not isinstance(status, (str, bool)) or status not in STATUS_VALUES:
+            errors[index] = "'status' must be 'present' or 'absent'."
+        elif (student_id, day) in statuses:
+            errors[index] = "Duplicate student and date."
+        else:
+            statuses[student_id, day] = STATUS_VALUES[status]
+
+    outcomes = {} if errors else save_attendance_records(statuses)
+    written = sum(outcome != "unchanged" for outcome in outcomes.values())
+    return _results(keys, errors, outcomes, written)
+
+
+PROGRESS_INPUTS = ("start_date", "end_date", "marks")
+
+
+def _progress_value(name, value):
+    if value is None:
+        return None
+    if name == "marks":
+        if not _is_int(value):
+            raise ValueError
+        return value
+    return _parse_date(value)
+
+
+@require_http_methods(["GET", "HEAD", "POST"])
+@api_staff_required
+def progress(request):
+    """GET: topic progress of the staff member's students in their current
+    course (?batch=&student=). POST: ``{"records": [{"student", "topic",
+    "start_date"?, "end_date"?, "marks"?}]}``; only the fields present are
+    changed and null clears one.
+
+    Validation, the single bulk UPDATE and the per-row results work as for
+    attendance. Written rows are signed with the staff member's name.
+    """
+    if request.method != "POST":
+        rows = (
+            StudentTopicProgress.objects
+            .filter(student__in=_staff_students(request), topic__course_id=F('student__course_id'))
+            .order_by('student_id', 'topic_id')
+            .values_list('student_id', 'topic_id', 'start_date', 'end_date', 'marks', 'sign')
+        )
+        return _conditional_json(request, {"records": [
+            {
+                "student": student_id, "topic": topic_id,
+                "start_date": start_date and start_date.isoformat(),
+                "end_date": end_date and end_date.isoformat(),
+                "marks": marks, "sign": sign,
+            }
+            for student_id, topic_id, start_date, end_date, marks, sign in rows
+        ]})
+
+    records = _records(request)
+    pairs = sorted({
+        (r.get("student"), r.get("topic")) for r in records if _is_int(r.get("student")) and _is_int(r.get("topic"))
+    })
+    progress_rows = {}
+    for start in range(0, len(pairs), PAIRS_PER_QUERY):
+        # exactly the submitted pairs, not every topic of every student mentioned
+        match = Q(*(Q(student_id=s, topic_id=t) for s, t in pairs[start:start + PAIRS_PER_QUERY]), _connector=Q.OR)
+        progress_rows.update(
+            ((row.student_id, row.topic_id), row)
+            for row in StudentTopicProgress.objects.filter(
+                match, student__staff=request.staff, topic__course_id=F('student__course_id'),
+            )
+        )
+
+    keys, errors, seen, outcomes = [], {}, set(), {}
+    for index, record in enumerate(records):
+        key = (record.get("student"), record.get("topic"))
+        keys.append(key)
+        row = progress_rows.get(key) if _is_int(key[0]) and _is_int(key[1]) else None
+        if row is None:
+            errors[index] = "Unknown student and topic."
+            continue
+        if key in seen:
+            errors[index] = "Duplicate student and topic."
+            continue
+        seen.add(key)
+        try:
+            for name in PROGRESS_INPUTS:
+                if name in record:
+                    setattr(row, name, _progress_value(name, record[name]))
+        except ValueError:
+            errors[index] = "Dates must be YYYY-MM-DD and marks an integer."
+            continue
+        try:
+            row.clean()
+        except ValidationError as exc:
+            errors[index] = " ".join(exc.messages)
+            continue
+        outcomes[key] = "updated" if progress_values(row) != row._loaded_progress else "unchanged"
+
+    written = 0
+    if not errors:
+        changed = [progress_rows[key] for key, outcome in outcomes.items() if outcome == "updated"]
+        written = update_topic_progress(changed, signed_by=request.staff.staff_name)
+    return _results(keys, errors, outcomes if not errors else {}, written)
+
+
+def _encode_cursor(change_seq, pk):
+    return f"{change_seq}.{pk}"
+
+
+def _decode_cursor(cursor):
+    try:
+        change_seq, pk = (int(part) for part in cursor.split("."))
+    except (AttributeError, ValueError):
+        raise ApiError("Invalid cursor.")
+    return change_seq, pk
+
+
+def _parse_operation(record, known, today, latest_allowed):
+    """``(op_id, timestamp, student_id, date, status)`` of one sync operation."""
+    op_id, student_id, status = record.get("op_id"), record.get("student"), record.get("status")
+    timestamp = parse_datetime(record["timestamp"]) if isinstance(record.get("timestamp"), str) else None
+    try:
+        day = _parse_date(record.get("date"))
+    except ValueError:
+        day = None
+    if not isinstance(op_id, str) or not 0 < len(op_id) <= 64:
+        raise ValueError("'op_id' must be a string of at most 64 characters.")
+    if timestamp is None or timezone.is_naive(timestamp):
+        raise ValueError("'timestamp' must be an ISO 8601 date-time with a UTC offset.")
+    if timestamp > latest_allowed:
+        raise ValueError("'timestamp' is in the future.")
+    if not _is_int(student_id) or student_id not in known:
+        raise ValueError("Unknown student.")
+    if day is None or day > today:
+        raise ValueError("'date' must be a YYYY-MM-DD date, not in the future.")
+    if not isinstance(status, (str, bool)) or status not in STATUS_VALUES:
+        raise ValueError("'status' must be 'present' or 'absent'.")
+    return op_id, timestamp, student_id, day, STATUS_VALUES[status]
+
+
+@require_http_methods(["POST"])
+@api_staff_required
+def sync(request):
+    """Offline attendance sync: push queued operations, pull changes.
+
+    Body: ``{"cursor": str|null, "operations": [{"op_id", "timestamp",
+    "student", "date", "status"}]}``. ``op_id`` is generated by the client
+    and makes retries idempotent; ``timestamp`` (ISO 8601 with offset) is
+    when attendance was taken, and the latest one wins per student and date.
+    The response lists a result per operation (``applied``, ``stale`` or
+    ``rejected``, with ``duplicate`` set for replays), then up to
+    SYNC_PAGE_SIZE of the staff member's attendance rows changed after
+    ``cursor`` and the cursor to send next time; ``more`` asks the client
+    to sync again straight away. Deleted rows are not reported.
+    """
+    try:
+        body = json.loads(request.body)
+    except (UnicodeDecodeError, ValueError):
+        raise ApiError("Request body must be JSON.")
+    operations = body.get("operations", []) if isinstance(body, dict) else None
+    if not isinstance(operations, list) or not all(isinstance(op, dict) for op in operations):
+        raise ApiError("'operations' must be a list of objects.")
+    if len(operations) > MAX_RECORDS:
+        raise ApiError(f"At most {MAX_RECORDS} operations per request.", status=413)
+    cursor = body.get("cursor")
+    since = _decode_cursor(cursor) if cursor is not None else None
+
+    known = set(Student.objects.filter(
+        staff=request.staff, pk__in=[op.get("student") for op in operations if _is_int(op.get("student"))],
+    ).values_list('pk', flat=True))
+    today, latest_allowed = localdate(), timezone.now() + MAX_CLOCK_SKEW
+    valid, results = [], []
+    for record in operations:
+        try:
+            valid.append(_parse_operation(record, known, today, latest_allowed))
+            results.append({"op_id": record["op_id"]})
+        except ValueError as exc:
+            results.append({"op_id": record.get("op_id"), "result": "rejected", "error": str(exc)})
+    outcomes = apply_attendance_operations(request.staff, valid)
+    answered = set()
+    for result in results:
+        if "result" not in result:
+            result["result"], duplicate = outcomes[result["op_id"]]
+            # an op_id repeated within the payload was only applied once
+            result["duplicate"] = duplicate or result["op_id"] in answered
+            answered.add(result["op_id"])
+
+    changes = StudentAttendance.objects.filter(student__staff=request.staff)
+    if since is not None:
+        changes = changes.filter(Q(change_seq__gt=since[0]) | Q(change_seq=since[0], pk__gt=since[1]))
+    changes = list(
+        changes.order_by('change_seq', 'id')
+        .values_list('pk', 'change_seq', 'student_id', 'student__batch_id', 'date', 'status')[:SYNC_PAGE_SIZE + 1]
+    )
+    more = len(changes) > SYNC_PAGE_SIZE
+    changes = changes[:SYNC_PAGE_SIZE]
+    if changes:
+        cursor = _encode_cursor(changes[-1][1], changes[-1][0])
+    return JsonResponse({
+        "results": results,
+        "changes": [
+            {"student": student_id, "batch": batch_id, "date": day.isoformat(), "status": STATUS_NAMES[status]}
+            for _, _, student_id, batch_id, day, status in changes
+        ],
+        "cursor": cursor,
+        "more": more,
+    })
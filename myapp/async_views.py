@@ -0,0 +1,142 @@
+"""Async twins of the busiest staff views, served when ``ASYNC_STAFF_VIEWS``
+is on (see urls.py). They behave like their counterparts in views.py but
+use the async ORM, so under ASGI a request only leaves the event loop for
+the database and for blocking work sent to the bounded pool. They exist for
+ASGI deployments, not for speed: on SQLite they measure slower than the
+sync views (see the load_test command).
+
+Everything a template touches is fetched before rendering: lazy relations
+or ``request.staff``/``request.user`` would otherwise run sync queries from
+the event loop.
+"""
+import logging
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth import aauthenticate, alogin
+from django.contrib.auth.decorators import login_required
+from django.http import Http404
+from django.shortcuts import aget_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.timezone import datetime, localdate
+
+from .blocking import run_blocking
+from .caching import get_batch_overview
+from .middleware import aget_staff
+from .models import Attendance, Batch, Student, StudentAttendance
+from .services import save_student_attendance
+from .signals import get_client_ip
+
+logger = logging.getLogger(__name__)
+
+
+def staff_required(view_func):
+    """Async views.staff_required; ``request.staff`` and ``request.user`` are
+    resolved before the view runs so templates can read them.
+    """
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        request.user = await request.auser()
+        staff = await request.astaff()
+        if not staff:
+            raise Http404("No Staff matches the given query.")
+        request.staff = staff
+        return await view_func(request, *args, **kwargs)
+    return login_required(wrapper)
+
+
+async def staff_login(request):
+    # loads the session, which the messages in the template read
+    request.user = await request.auser()
+    if request.method == "POST":
+        username = request.POST.get('username')
+        password = request.POST.get('password')
+        user = await aauthenticate(request, username=username, password=password)
+
+        if user is not None:
+            # Resolve the client IP (may probe the network) off the event loop,
+            # so the login attendance receiver finds it cached
+            await run_blocking(get_client_ip, request)
+            await alogin(request, user)
+            if await aget_staff(request, user):
+                return redirect('get_batches')
+            return redirect('home')
+        else:
+            messages.error(request, "Invalid username or password.")
+    return render(request, 'staff_login.html')
+
+
+@staff_required
+async def getBatches(request):
+    staff = request.staff
+    batches = [batch async for batch in Batch.objects.filter(staff=staff).order_by('start_time')]
+    batch_stats = await sync_to_async(get_batch_overview)(staff)
+    return render(request, 'batch.html', {'batches': batches, 'staff': staff, 'batch_stats': batch_stats})
+
+
+@staff_required
+async def student_list(request, batch_id):
+    staff = request.staff
+    batch = await aget_object_or_404(Batch, pk=batch_id, staff=staff)
+
+    if request.method == "POST":
+        student = await aget_object_or_404(Student, pk=request.POST.get('student_id'), staff=staff)
+        new_batch_id = request.POST.get('batch')
+        if new_batch_id:
+            student.batch = await aget_object_or_404(Batch, pk=new_batch_id, staff=staff)
+        mode = request.POST.get('mode')
+        if mode in ['True', 'False']:
+            student.mode = mode == 'True'
+        await student.asave()
+        return redirect('student_list', batch_id=batch_id)
+
+    students = [
+        student async for student in
+        Student.objects.filter(staff=staff, batch=batch).select_related('course')
+    ]
+    batches = [b async for b in Batch.objects.filter(staff=staff)]
+    attendance = await Attendance.objects.filter(staff=staff, date=localdate()).alast()
+    return render(request, 'student_list.html', {
+        'students': students, 'attendance': attendance, 'batch': batch,
+        'all_batches': batches, 'batches': batches,
+    })
+
+
+@staff_required
+async def mark_student_attendance(request, batch_id):
+    staff = request.staff
+    batch = await aget_object_or_404(Batch, pk=batch_id, staff=staff)
+    students = Student.objects.filter(staff=staff, batch=batch).select_related('course')
+    today = timezone.now().date()
+
+    date_str = request.POST.get("date") or request.GET.get("date")
+    try:
+        selected_date = datetime.strptime(date_str, "%Y-%m-%d").date() if date_str else today
+    except ValueError:
+        selected_date = today
+    if selected_date > today:
+        selected_date = today
+
+    if request.method == "POST":
+        statuses = {}
+        async for student_id in students.values_list('student_id', flat=True):
+            status = request.POST.get(f"status_{student_id}")
+            if status is not None:
+                statuses[student_id] = status == "present"
+        written = await sync_to_async(save_student_attendance)(statuses, selected_date)
+        logger.info(f"Attendance saved for batch {batch.batch_id} on {selected_date}: {written} rows written")
+        return redirect(f"{reverse('student_attendance', args=[batch.batch_id])}?date={selected_date.strftime('%Y-%m-%d')}")
+
+    attendance_records = {
+        att.student_id: att
+        async for att in StudentAttendance.objects.filter(date=selected_date, student__in=students)
+    }
+    return render(request, "student_attendance.html", {
+        "students": [student async for student in students],
+        "attendance_records": attendance_records,
+        "today": today.strftime("%Y-%m-%d"),
+        "selected_date": selected_date.strftime("%Y-%m-%d"),
+        "batch": batch,
+    })
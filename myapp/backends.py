@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import verify_password
+
+from .blocking import run_blocking
+
+UserModel = get_user_model()
+
+
+class StaffModelBackend(ModelBackend):
+    """ModelBackend whose async path hashes passwords in the blocking pool.
+
+    Django's ``aauthenticate`` runs the (deliberately slow) password hasher on
+    the event loop, which stalls every other request for the duration of a
+    login. The sync path is unchanged.
+    """
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = await UserModel._default_manager.aget_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash once anyway so unknown users take as long as wrong passwords
+            await run_blocking(UserModel().set_password, password)
+            return None
+        is_correct, must_update = await run_blocking(verify_password, password, user.password)
+        if not (is_correct and self.user_can_authenticate(user)):
+            return None
+        if must_update:
+            await run_blocking(user.set_password, password)
+            user._password = None
+            await user.asave(update_fields=['password'])
+        return user
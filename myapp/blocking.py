@@ -0,0 +1,33 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def blocking_executor():
+    """The process-wide pool for blocking work started from async views.
+
+    Bounded by ``ASYNC_BLOCKING_WORKERS`` so a burst of logins cannot start an
+    unbounded number of threads. Only for work that does not touch the
+    database: ORM calls belong to the async ORM or ``sync_to_async``, which
+    keep them on the connection of the request's thread.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'ASYNC_BLOCKING_WORKERS', 4),
+                    thread_name_prefix='myapp-blocking',
+                )
+    return _executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run ``func(*args, **kwargs)`` in the blocking pool without holding up the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(blocking_executor(), partial(func, *args, **kwargs))
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.timezone import localdate
+
+from .models import Batch, Course, CourseTopic, Staff, Student, StudentTopicProgress
+from .reports import batch_overview
+
+COURSE_TREE_KEY = 'course-tree'
+COURSE_TREE_TIMEOUT = 60 * 60  # a backstop; saves invalidate it right away
+PROGRESS_VERSION_KEY = 'progress-version:{}:{}'
+TOPIC_PROGRESS_KEY = 'topic-progress:{}:{}:{}:{}'
+TOPIC_PROGRESS_TIMEOUT = 60 * 60 * 24
+BATCH_OVERVIEW_KEY = 'batch-overview:{}:{}'
+BATCH_OVERVIEW_TIMEOUT = 60 * 60
+
+
+def build_course_tree():
+    """Build the course -> staff -> batch tree used by the Student admin form.
+
+    Three queries regardless of size: courses, staff/course links, batches.
+    """
+    batches_by_staff = {}
+    for batch in Batch.objects.only('batch_id', 'staff_id', 'batch_name', 'start_time', 'end_time'):
+        batches_by_staff.setdefault(batch.staff_id, []).append({"id": batch.batch_id, "name": str(batch)})
+
+    staff_by_course = {}
+    links = Staff.courses.through.objects.order_by('staff__staff_name').values_list(
+        'course_id', 'staff_id', 'staff__staff_name'
+    )
+    for course_id, staff_id, staff_name in links:
+        staff_by_course.setdefault(course_id, []).append({
+            "id": staff_id,
+            "name": staff_name,
+            "batches": batches_by_staff.get(staff_id, []),
+        })
+
+    return [
+        {"id": course_id, "name": course_name, "staff": staff_by_course.get(course_id, [])}
+        for course_id, course_name in Course.objects.order_by('course_name').values_list('course_id', 'course_name')
+    ]
+
+
+def get_course_tree():
+    """Return ``(tree, etag)`` from the cache, rebuilding it on a miss."""
+    cached = cache.get(COURSE_TREE_KEY)
+    if cached is None:
+        tree = build_course_tree()
+        etag = hashlib.md5(json.dumps(tree, sort_keys=True).encode()).hexdigest()
+        cached = (tree, etag)
+        cache.set(COURSE_TREE_KEY, cached, COURSE_TREE_TIMEOUT)
+    return cached
+
+
+def invalidate_course_tree():
+    """Drop the cached tree now and again on commit, like the progress table
+    versions, so a tree rebuilt from pre-commit data is not kept either.
+    """
+    cache.delete(COURSE_TREE_KEY)
+    transaction.on_commit(lambda: cache.delete(COURSE_TREE_KEY))
+
+
+def course_staff(course_id, tree=None):
+    """Staff entries of one course from the cached tree (or ``tree``, if given)."""
+    if tree is None:
+        tree, _ = get_course_tree()
+    for course in tree:
+        if course["id"] == course_id:
+            return course["staff"]
+    return []
+
+
+def staff_batches(staff_id, tree=None):
+    """Batch entries of one staff member from the cached tree (or ``tree``, if given)."""
+    if tree is None:
+        tree, _ = get_course_tree()
+    for course in tree:
+        for staff in course["staff"]:
+            if staff["id"] == staff_id:
+                return staff["batches"]
+    return []
+
+
+def _progress_versions(keys):
+    """Current version tokens for ``keys``, creating any that are missing."""
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            token = uuid.uuid4().hex
+            versions[key] = token if cache.add(key, token, None) else cache.get(key, token)
+    return versions
+
+
+def bump_progress_versions(course_ids=(), student_ids=()):
+    """Invalidate cached topic/progress tables of whole courses and/or students.
+
+    The versions are bumped now and again when the current transaction
+    commits, so a table cached from pre-commit data by another request is
+    not kept either.
+    """
+    keys = [PROGRESS_VERSION_KEY.format('course', pk) for pk in set(course_ids)]
+    keys += [PROGRESS_VERSION_KEY.format('student', pk) for pk in set(student_ids)]
+    if not keys:
+        return
+
+    def bump():
+        cache.set_many({key: uuid.uuid4().hex for key in keys}, None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def build_topic_progress_list(student):
+    """``[{"topic": CourseTopic, "progress": StudentTopicProgress or None}]`` in topic order."""
+    progress = {p.topic_id: p for p in StudentTopicProgress.objects.filter(student=student)}
+    return [
+        {"topic": topic, "progress": progress.get(topic.pk)}
+        for topic in CourseTopic.objects.filter(course_id=student.course_id).order_by('topic_id')
+    ]
+
+
+def get_topic_progress_list(student):
+    """The student's topic/progress table, cached under the course and student versions."""
+    course_key = PROGRESS_VERSION_KEY.format('course', student.course_id)
+    student_key = PROGRESS_VERSION_KEY.format('student', student.pk)
+    versions = _progress_versions([course_key, student_key])
+    key = TOPIC_PROGRESS_KEY.format(student.pk, student.course_id, versions[course_key], versions[student_key])
+    return cache.get_or_set(key, lambda: build_topic_progress_list(student), TOPIC_PROGRESS_TIMEOUT)
+
+
+def get_batch_overview(staff):
+    """The staff member's per-batch metrics, cached for the day until a write."""
+    today = localdate()
+    return cache.get_or_set(
+        BATCH_OVERVIEW_KEY.format(staff.pk, today), lambda: batch_overview(staff, today), BATCH_OVERVIEW_TIMEOUT,
+    )
+
+
+def invalidate_batch_overview(staff_ids=(), student_ids=()):
+    """Drop the cached overview of ``staff_ids`` and of the staff of ``student_ids``.
+
+    Dropped now and again on commit, like the progress table versions.
+    """
+    staff_ids = {pk for pk in staff_ids if pk is not None}
+    if student_ids:
+        staff_ids.update(
+            Student.objects.filter(pk__in=set(student_ids), staff__isnull=False)
+            .values_list('staff_id', flat=True).distinct()
+        )
+    if not staff_ids:
+        return
+    keys = [BATCH_OVERVIEW_KEY.format(pk, localdate()) for pk in staff_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
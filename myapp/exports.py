@@ -0,0 +1,70 @@
+import csv
+
+from django.http import StreamingHttpResponse
+
+# (header, lookup) pairs; related names are joined in the export query itself
+ATTENDANCE_COLUMNS = [
+    ("Student", "student__student_name"),
+    ("Email", "student__student_email"),
+    ("Course", "student__course__course_name"),
+    ("Staff", "student__staff__staff_name"),
+    ("Batch", "student__batch__batch_name"),
+    ("Date", "date"),
+    ("Status", "status"),
+]
+
+PROGRESS_COLUMNS = [
+    ("Student", "student__student_name"),
+    ("Email", "student__student_email"),
+    ("Staff", "student__staff__staff_name"),
+    ("Course", "topic__course__course_name"),
+    ("Module", "topic__module_name"),
+    ("Topic", "topic__topic_name"),
+    ("Start Date", "start_date"),
+    ("End Date", "end_date"),
+    ("Marks", "marks"),
+    ("Sign", "sign"),
+]
+
+STATUS_LABELS = {True: "Present", False: "Absent", None: ""}
+
+
+class Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow([header for header, _ in columns])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_csv(queryset, columns, filename, chunk_size=2000, transform=None):
+    """StreamingHttpResponse writing ``queryset`` as CSV.
+
+    Rows are read with ``values_list(...).iterator()`` in ``chunk_size``
+    batches, so memory stays flat however many rows are exported and the
+    download starts as soon as the first chunk is fetched.
+    """
+    rows = queryset.values_list(*[lookup for _, lookup in columns]).iterator(chunk_size=chunk_size)
+    if transform is not None:
+        rows = map(transform, rows)
+    response = StreamingHttpResponse(_csv_lines(columns, rows), content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _attendance_row(row):
+    return (*row[:-1], STATUS_LABELS[row[-1]])
+
+
+def attendance_csv_response(queryset, filename="attendance.csv"):
+    return stream_csv(queryset.order_by("date", "pk"), ATTENDANCE_COLUMNS, filename, transform=_attendance_row)
+
+
+def progress_csv_response(queryset, filename="progress.csv"):
+    return stream_csv(queryset.order_by("student_id", "topic_id"), PROGRESS_COLUMNS, filename)
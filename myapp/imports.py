@@ -0,0 +1,259 @@
+import csv
+import io
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models.functions import Lower
+
+try:
+    import yaml
+except ImportError:  # YAML curricula are optional; CSV always works
+    yaml = None
+
+from .caching import bump_progress_versions, invalidate_batch_overview
+from .models import Batch, Course, CourseTopic, EmailOutbox, Staff, Student, mobile_validator
+from .services import seed_topic_progress
+
+STUDENT_IMPORT_COLUMNS = [
+    'student_name', 'student_email', 'student_contact', 'join_date', 'end_date',
+    'course', 'staff', 'batch', 'mode',
+]
+REQUIRED_COLUMNS = {'student_name', 'student_email', 'join_date', 'course', 'staff'}
+DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y")
+MODES = {'': True, 'offline': True, 'online': False}
+
+
+def _parse_date(value):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"invalid date '{value}' (use YYYY-MM-DD)")
+
+
+def read_csv_rows(uploaded_file):
+    """Decode an uploaded CSV file into a list of dicts with lower-case keys."""
+    try:
+        text = uploaded_file.read().decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise ValidationError("The file is not UTF-8 encoded CSV.")
+    reader = csv.DictReader(io.StringIO(text))
+    missing = REQUIRED_COLUMNS - {(name or '').strip().lower() for name in reader.fieldnames or []}
+    if missing:
+        raise ValidationError(f"Missing column(s): {', '.join(sorted(missing))}")
+    return [
+        {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+        for row in reader
+    ]
+
+
+def validate_student_rows(rows):
+    """Validate every row and resolve names to ids.
+
+    Course, staff, staff/course links, batches and existing emails are each
+    looked up with a single query for the whole file. Returns
+    ``(students, errors)`` where errors is a list of ``(row_number, message)``
+    with row numbers matching the spreadsheet (header is row 1).
+    """
+    courses = {name.lower(): pk for pk, name in Course.objects.values_list('course_id', 'course_name')}
+    staff_ids = {}
+    for pk, name in Staff.objects.values_list('staff_id', 'staff_name'):
+        # ambiguous names map to None and are reported per row
+        staff_ids[name.lower()] = None if name.lower() in staff_ids else pk
+    teaches = set(Staff.courses.through.objects.values_list('staff_id', 'course_id'))
+    batches = {
+        (staff_id, name.lower()): pk
+        for pk, staff_id, name in Batch.objects.values_list('batch_id', 'staff_id', 'batch_name')
+    }
+    emails = {row.get('student_email', '').lower() for row in rows}
+    taken = set(
+        Student.objects.annotate(email_lower=Lower('student_email'))
+        .filter(email_lower__in=emails).values_list('email_lower', flat=True)
+    )
+    name_length = Student._meta.get_field('student_name').max_length
+
+    students, errors, seen = [], [], set()
+    for number, row in enumerate(rows, start=2):
+        problems = []
+        name = row.get('student_name', '')
+        email = row.get('student_email', '')
+        if not name:
+            problems.append("student_name is required")
+        elif len(name) > name_length:
+            problems.append(f"student_name is longer than {name_length} characters")
+        try:
+            validate_email(email)
+        except ValidationError:
+            problems.append(f"invalid email '{email}'")
+        else:
+            if email.lower() in taken:
+                problems.append(f"email '{email}' already exists")
+            elif email.lower() in seen:
+                problems.append(f"email '{email}' is repeated in the file")
+            seen.add(email.lower())
+        contact = row.get('student_contact', '')
+        if contact:
+            try:
+                mobile_validator(contact)
+            except ValidationError as exc:
+                problems.extend(exc.messages)
+
+        join_date = end_date = None
+        try:
+            join_date = _parse_date(row.get('join_date', ''))
+            end_date = _parse_date(row['end_date']) if row.get('end_date') else None
+        except ValueError as exc:
+            problems.append(str(exc))
+        if join_date and end_date and end_date < join_date:
+            problems.append("end_date is before join_date")
+
+        course_id = courses.get(row.get('course', '').lower())
+        if course_id is None:
+            problems.append(f"unknown course '{row.get('course', '')}'")
+        staff_key = row.get('staff', '').lower()
+        staff_id = staff_ids.get(staff_key)
+        if staff_id is None:
+            reason = "matches more than one staff member" if staff_key in staff_ids else "is unknown"
+            problems.append(f"staff '{row.get('staff', '')}' {reason}")
+        elif course_id is not None and (staff_id, course_id) not in teaches:
+            problems.append(f"staff '{row['staff']}' does not teach '{row['course']}'")
+        batch_id = None
+        if row.get('batch') and staff_id is not None:
+            batch_id = batches.get((staff_id, row['batch'].lower()))
+            if batch_id is None:
+                problems.append(f"staff '{row['staff']}' has no batch '{row['batch']}'")
+        mode = MODES.get(row.get('mode', '').lower())
+        if mode is None:
+            problems.append(f"mode must be Offline or Online, not '{row['mode']}'")
+
+        if problems:
+            errors.append((number, "; ".join(problems)))
+            continue
+        students.append(Student(
+            student_name=name, student_email=email, student_contact=contact,
+            join_date=join_date, end_date=end_date, course_id=course_id,
+            staff_id=staff_id, batch_id=batch_id, mode=mode,
+        ))
+    return students, errors
+
+
+def _summary_emails(students):
+    """One outbox email per staff member listing all of their new students."""
+    by_staff = {}
+    for student in students:
+        by_staff.setdefault(student.staff_id, []).append(student)
+    staff_rows = Staff.objects.select_related('user').in_bulk(by_staff.keys())
+    emails = []
+    for staff_id, assigned in by_staff.items():
+        staff = staff_rows[staff_id]
+        recipient = staff.staff_email or staff.user.email
+        if not recipient:
+            continue
+        lines = "\n".join(f"- {s.student_name} ({s.student_email}), joins {s.join_date}" for s in assigned)
+        emails.append(EmailOutbox(
+            subject=f"{len(assigned)} New Student(s) Assigned",
+            body=(
+                f"Dear {staff.staff_name},\n\n"
+                f"The following {len(assigned)} student(s) have been assigned to you:\n\n"
+                f"{lines}\n\nPlease check your portal for further details.\n\nRegards,\nAdmin Team\n"
+            ),
+            recipient=recipient,
+        ))
+    EmailOutbox.objects.bulk_create(emails)
+    return len(emails)
+
+
+def import_students(students, batch_size=500):
+    """Insert validated students in chunks, seed their progress and notify staff.
+
+    Everything runs in one transaction; per-student post_save signals are
+    not fired, so staff get one summary email each instead of one per student.
+    """
+    with transaction.atomic():
+        created = Student.objects.bulk_create(students, batch_size=batch_size)
+        seed_topic_progress(students=created)
+        _summary_emails(created)
+        invalidate_batch_overview(staff_ids={student.staff_id for student in created})
+    return created
+
+
+def read_curriculum(uploaded_file):
+    """Read ``(module_name, topic_name)`` pairs from a CSV or YAML curriculum.
+
+    CSV needs ``module_name`` and ``topic_name`` columns. YAML is either a
+    mapping of module -> list of topics or a list of
+    ``{module: ..., topics: [...]}`` entries (requires PyYAML).
+    """
+    name = getattr(uploaded_file, 'name', '') or ''
+    try:
+        text = uploaded_file.read()
+        text = text.decode('utf-8-sig') if isinstance(text, bytes) else text
+    except UnicodeDecodeError:
+        raise ValidationError("The file is not UTF-8 encoded.")
+
+    if name.lower().endswith(('.yaml', '.yml')):
+        if yaml is None:
+            raise ValidationError("YAML curricula need PyYAML installed; upload a CSV instead.")
+        try:
+            data = yaml.safe_load(text) or {}
+        except yaml.YAMLError as exc:
+            raise ValidationError(f"Invalid YAML: {exc}")
+        if isinstance(data, dict):
+            data = [{'module': module, 'topics': topics} for module, topics in data.items()]
+        if not isinstance(data, list):
+            raise ValidationError("YAML curriculum must be a mapping or a list of modules.")
+        pairs = []
+        for entry in data:
+            if not isinstance(entry, dict) or not isinstance(entry.get('topics'), list):
+                raise ValidationError(f"Invalid module entry: {entry!r}")
+            pairs.extend((str(entry.get('module', '')), str(topic)) for topic in entry['topics'])
+    else:
+        reader = csv.DictReader(io.StringIO(text))
+        columns = {(field or '').strip().lower(): field for field in reader.fieldnames or []}
+        if not {'module_name', 'topic_name'} <= columns.keys():
+            raise ValidationError("Missing column(s): module_name, topic_name")
+        pairs = [
+            ((row[columns['module_name']] or ''), (row[columns['topic_name']] or ''))
+            for row in reader
+        ]
+
+    for number, (module_name, topic_name) in enumerate(pairs, start=1):
+        if not module_name.strip() or not topic_name.strip():
+            raise ValidationError(f"Entry {number} has an empty module or topic name.")
+        if len(module_name.strip()) > 100 or len(topic_name.strip()) > 100:
+            raise ValidationError(f"Entry {number} has a name longer than 100 characters.")
+    return pairs
+
+
+def import_curriculum(course, pairs, batch_size=500):
+    """Upsert a course's topics and seed progress for its enrolled students.
+
+    Names are normalized the same way CourseTopic.save() does, duplicates are
+    dropped, and new topics are inserted with one bulk INSERT that skips rows
+    already present under the (course, module_name, topic_name) constraint.
+    Returns ``(created_topics, progress_rows)``.
+    """
+    wanted = {}
+    for module_name, topic_name in pairs:
+        key = (CourseTopic.normalize_name(module_name), CourseTopic.normalize_name(topic_name))
+        wanted.setdefault(key, None)
+
+    with transaction.atomic():
+        existing = set(course.topics.values_list('module_name', 'topic_name'))
+        new_topics = [
+            CourseTopic(course=course, module_name=module_name, topic_name=topic_name)
+            for module_name, topic_name in wanted if (module_name, topic_name) not in existing
+        ]
+        CourseTopic.objects.bulk_create(new_topics, batch_size=batch_size, ignore_conflicts=True)
+        if not new_topics:
+            return 0, 0
+        bump_progress_versions(course_ids=[course.pk])
+        created_ids = [
+            pk for pk, module_name, topic_name in course.topics.values_list('topic_id', 'module_name', 'topic_name')
+            if (module_name, topic_name) not in existing
+        ]
+        progress_rows = seed_topic_progress(topics=created_ids)
+    return len(created_ids), progress_rows
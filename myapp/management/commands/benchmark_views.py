@@ -0,0 +1,145 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+
+import django
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from myapp.models import Staff
+from myapp.synthetic import SCRATCH_CACHES, SIZES, delete_dataset, generate_dataset
+
+
+def _request(client, method, url, data):
+    response = getattr(client, method)(url, data)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def measure(client, method, url, data, repeat):
+    """Time one request: cold (empty cache), then ``repeat`` warm runs.
+
+    Peak memory is taken from a separate run under tracemalloc so that the
+    tracing overhead does not skew the timings.
+    """
+    cache.clear()
+    started = time.perf_counter()
+    response = _request(client, method, url, data)
+    cold = time.perf_counter() - started
+
+    timings = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            _request(client, method, url, data)
+            timings.append(time.perf_counter() - started)
+        queries = len(ctx.captured_queries)
+
+    tracemalloc.start()
+    try:
+        _request(client, method, url, data)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'status': response.status_code,
+        'cold_ms': round(cold * 1000, 2),
+        'median_ms': round(statistics.median(timings) * 1000, 2),
+        'min_ms': round(min(timings) * 1000, 2),
+        'queries': queries,
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the staff views and main admin changelists against synthetic "
+        "datasets of several sizes and print the results as JSON. Each dataset is "
+        "committed and deleted again afterwards, so the run never holds the "
+        "database write lock for long; caching uses a private local-memory cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='small,medium',
+                            help=f"Comma separated dataset sizes from {', '.join(SIZES)} (default: small,medium).")
+        parser.add_argument('--repeat', type=int, default=5,
+                            help="Warm runs per view; the median is reported (default: 5).")
+        parser.add_argument('--label', default='',
+                            help="Free text stored in the report, e.g. a commit id.")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        sizes = [size.strip() for size in options['sizes'].split(',') if size.strip()]
+        unknown = set(sizes) - set(SIZES)
+        if unknown:
+            raise CommandError(f"Unknown size(s): {', '.join(sorted(unknown))}")
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1.")
+        if User.objects.filter(username__startswith='bench-').exists():
+            raise CommandError("Users named 'bench-*' already exist; remove them first.")
+
+        report = {
+            'label': options['label'],
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+        }
+        with override_settings(CACHES=SCRATCH_CACHES):
+            report['results'] = [self.run_size(size, options['repeat']) for size in sizes]
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(output + '\n')
+            self.stderr.write(f"Report written to {options['output']}")
+        else:
+            self.stdout.write(output)
+
+    def run_size(self, size, repeat):
+        tag = f'bench-{size}'
+        result = {'size': size, 'counts': generate_dataset(tag=tag, **SIZES[size])}
+        try:
+            with override_settings(ALLOWED_HOSTS=['*']):
+                result['views'] = {
+                    name: measure(client, method, url, data, repeat)
+                    for name, client, method, url, data in self.targets(size)
+                }
+        finally:
+            User.objects.filter(username=f'{tag}-admin').delete()
+            delete_dataset(tag)
+            cache.clear()  # the scratch cache
+        return result
+
+    def targets(self, size):
+        staff = Staff.objects.select_related('user').filter(
+            user__username__startswith=f'bench-{size}-staff-'
+        ).order_by('pk').first()
+        batch = staff.batches.order_by('pk').first()
+        student = batch.students.order_by('pk').first()
+        day = student.attendances.order_by('-date').values_list('date', flat=True).first()
+
+        staff_client = Client()
+        staff_client.force_login(staff.user)
+        admin_client = Client()
+        admin_client.force_login(User.objects.create_superuser(f'bench-{size}-admin', None, None))
+
+        yield 'student_list', staff_client, 'get', reverse('student_list', args=[batch.pk]), {}
+        yield 'student_detail', staff_client, 'get', reverse('student_detail', args=[student.pk, batch.pk]), {}
+        yield 'add_progress', staff_client, 'get', reverse('add_progress', args=[student.pk, batch.pk]), {}
+        yield 'mark_student_attendance', staff_client, 'get', reverse('student_attendance', args=[batch.pk]), {
+            'date': day.isoformat(),
+        }
+        yield 'mark_student_attendance (POST)', staff_client, 'post', reverse('student_attendance', args=[batch.pk]), {
+            'date': day.isoformat(),
+            **{f'status_{pk}': 'present' for pk in batch.students.values_list('pk', flat=True)},
+        }
+        for model in ('student', 'studentattendance', 'studenttopicprogress'):
+            yield f'admin:{model}', admin_client, 'get', reverse(f'admin:myapp_{model}_changelist'), {}
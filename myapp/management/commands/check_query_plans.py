@@ -0,0 +1,151 @@
+import re
+from datetime import date, time, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from myapp.models import (
+    Attendance, Batch, Course, CourseTopic, Staff, Student, StudentAttendance, StudentTopicProgress,
+)
+
+# Tables that must never be read with a full table scan by the staff views
+WATCHED_MODELS = (Student, StudentAttendance, Attendance, StudentTopicProgress, Batch)
+
+# Names of the throw-away sample data
+SAMPLE_USERNAME = '__plan_check__'
+SAMPLE_COURSE = 'Plan check course'
+
+
+def explain(sql, params):
+    """Return the plan lines of one captured query for the current backend."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return [row[-1] for row in cursor.fetchall()]
+        cursor.execute(f"EXPLAIN {sql}", params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def full_scans(plan, tables):
+    """Tables from ``tables`` that the plan reads with a full table scan."""
+    if connection.vendor == 'sqlite':
+        pattern = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+    else:
+        pattern = re.compile(r'Seq Scan on (\w+)')
+    found = set()
+    for line in plan:
+        match = pattern.search(line.strip())
+        if match and match.group(1) in tables:
+            found.add(match.group(1))
+    return found
+
+
+class Command(BaseCommand):
+    help = (
+        "Run every staff view against a small throw-away dataset, EXPLAIN each "
+        "query it issues and fail if any does a full table scan on the hot tables. "
+        "The dataset is committed and deleted again afterwards, so the run never "
+        "holds the database write lock for long."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help="Print the plan of every checked query.")
+
+    def handle(self, *args, **options):
+        self.verbose_plans = options['verbose_plans']
+        self.problems = []
+        self.delete_sample_data()  # left over from an interrupted run
+        sample = self.create_sample_data()
+        try:
+            with override_settings(ALLOWED_HOSTS=['*']):
+                if connection.vendor == 'postgresql':
+                    with connection.cursor() as cursor:
+                        cursor.execute("SET enable_seqscan = off")
+                self.check_views(sample)
+        finally:
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute("RESET enable_seqscan")
+            self.delete_sample_data()
+
+        if self.problems:
+            for view, tables, sql in self.problems:
+                self.stderr.write(f"{view}: full scan of {', '.join(sorted(tables))}\n    {sql}")
+            raise CommandError(f"{len(self.problems)} quer(y/ies) do full table scans.")
+        self.stdout.write(self.style.SUCCESS("No full table scans on the watched tables."))
+
+    def delete_sample_data(self):
+        User.objects.filter(username=SAMPLE_USERNAME).delete()
+        Course.objects.filter(course_name=SAMPLE_COURSE).delete()
+
+    @transaction.atomic
+    def create_sample_data(self):
+        user = User.objects.create_user(username=SAMPLE_USERNAME, password=None)
+        staff = Staff.objects.create(user=user, staff_name='Plan Check', staff_email='plan-check@example.invalid')
+        course = Course.objects.create(course_name=SAMPLE_COURSE)
+        staff.courses.add(course)
+        batch = Batch.objects.create(staff=staff, batch_name='Plan check', start_time=time(9), end_time=time(10))
+        topics = CourseTopic.objects.bulk_create(
+            CourseTopic(course=course, module_name='Module', topic_name=f'Topic {i}') for i in range(5)
+        )
+        students = Student.objects.bulk_create(
+            Student(student_name=f'Student {i}', join_date=date.today(), course=course, staff=staff,
+                    batch=batch, student_email=f'plan-check-{i}@example.invalid')
+            for i in range(5)
+        )
+        StudentTopicProgress.objects.bulk_create(
+            StudentTopicProgress(student=student, topic=topic) for student in students for topic in topics
+        )
+        StudentAttendance.objects.bulk_create(
+            StudentAttendance(student=student, date=date.today() - timedelta(days=day), status=True)
+            for student in students for day in range(3)
+        )
+        Attendance.objects.create(staff=staff, date=date.today())
+        return user, batch, students[0]
+
+    def view_requests(self, batch, student):
+        today = date.today().strftime('%Y-%m-%d')
+        yield 'get_batches', 'get', reverse('get_batches'), {}
+        yield 'student_list', 'get', reverse('student_list', args=[batch.pk]), {}
+        yield 'student_detail', 'get', reverse('student_detail', args=[student.pk, batch.pk]), {}
+        yield 'add_progress', 'get', reverse('add_progress', args=[student.pk, batch.pk]), {}
+        yield 'student_attendance', 'get', reverse('student_attendance', args=[batch.pk]), {}
+        yield 'student_attendance (POST)', 'post', reverse('student_attendance', args=[batch.pk]), {
+            'date': today, f'status_{student.pk}': 'absent',
+        }
+        yield 'attendance_report', 'get', reverse('attendance_report', args=[batch.pk]), {}
+        yield 'export_attendance', 'get', reverse('export_attendance'), {'batch': batch.pk}
+        yield 'export_progress', 'get', reverse('export_progress'), {'batch': batch.pk}
+        yield 'api_attendance', 'get', reverse('api_attendance'), {'batch': batch.pk}
+        yield 'api_progress', 'get', reverse('api_progress'), {'batch': batch.pk}
+
+    def check_views(self, sample):
+        user, batch, student = sample
+        client = Client()
+        client.force_login(user)
+        tables = {model._meta.db_table for model in WATCHED_MODELS}
+        for name, method, url, data in self.view_requests(batch, student):
+            with CaptureQueriesContext(connection) as ctx:
+                response = getattr(client, method)(url, data)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            if response.status_code >= 400:
+                raise CommandError(f"{name} returned HTTP {response.status_code}")
+            for query in ctx.captured_queries:
+                self.check_query(name, query['sql'], tables)
+
+    def check_query(self, view, sql, tables):
+        if not sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+            return
+        # captured SQL has its parameters already interpolated
+        plan = explain(sql, ())
+        if self.verbose_plans:
+            self.stdout.write(f"{view}: {sql}\n    " + "\n    ".join(plan))
+        scanned = full_scans(plan, tables)
+        if scanned:
+            self.problems.append((view, scanned, sql))
@@ -0,0 +1,127 @@
+import json
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils.timezone import localdate
+
+from myapp.models import Staff
+from myapp.synthetic import SCRATCH_CACHES, delete_dataset, generate_dataset
+
+TAG = 'concurrency'
+
+
+class RetryCounter(logging.Handler):
+    """Counts the lock retries logged by services.retry_on_lock (emit runs under the handler lock)."""
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.count = 0
+
+    def emit(self, record):
+        if 'retrying' in record.getMessage():
+            self.count += 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark attendance from many threads at once, one batch per thread, through "
+        "the attendance view against the configured file database. Reports lock "
+        "errors, retries and throughput. The generated data is deleted afterwards; "
+        "caching uses a private local-memory cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16,
+                            help="Concurrent staff members, each marking their own batch (default: 16).")
+        parser.add_argument('--days', type=int, default=10,
+                            help="Attendance submissions per thread, one per past day (default: 10).")
+        parser.add_argument('--students', type=int, default=25,
+                            help="Students per batch (default: 25).")
+
+    def handle(self, *args, **options):
+        threads, days = options['threads'], options['days']
+        if min(threads, days, options['students']) < 1:
+            raise CommandError("--threads, --days and --students must be at least 1.")
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise CommandError("Needs a file database: in-memory SQLite does not show real lock behaviour.")
+        if Staff.objects.filter(user__username__startswith=f'{TAG}-').exists():
+            raise CommandError(f"Users named '{TAG}-*' already exist; remove them first.")
+
+        with override_settings(CACHES=SCRATCH_CACHES):
+            generate_dataset(tag=TAG, staff=threads, courses=1, batches_per_staff=1,
+                             students_per_batch=options['students'], modules_per_course=1,
+                             topics_per_module=1, months=1)
+            retries = RetryCounter()
+            services_logger = logging.getLogger('myapp.services')
+            services_logger.addHandler(retries)
+            try:
+                with override_settings(ALLOWED_HOSTS=['*']):
+                    report = self.run(threads, days)
+            finally:
+                services_logger.removeHandler(retries)
+                delete_dataset(TAG)
+                cache.clear()  # the scratch cache
+        report['retries'] = retries.count
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run(self, threads, days):
+        workers = []
+        for staff in Staff.objects.select_related('user').filter(user__username__startswith=f'{TAG}-'):
+            client = Client()
+            client.force_login(staff.user)
+            batch_id = staff.batches.values_list('pk', flat=True).get()
+            student_ids = list(staff.students.values_list('pk', flat=True))
+            workers.append((client, batch_id, student_ids))
+
+        lock_errors, other_errors = [], []
+        start = threading.Barrier(len(workers))
+
+        def mark(client, batch_id, student_ids):
+            url = reverse('student_attendance', args=[batch_id])
+            start.wait()
+            try:
+                for n in range(1, days + 1):
+                    day = localdate() - timedelta(days=n)
+                    data = {'date': day.isoformat()}
+                    data.update({f'status_{pk}': 'present' if (pk + n) % 3 else 'absent' for pk in student_ids})
+                    try:
+                        response = client.post(url, data)
+                    except OperationalError as exc:
+                        (lock_errors if 'locked' in str(exc) else other_errors).append(str(exc))
+                        continue
+                    if response.status_code != 302:
+                        other_errors.append(f"HTTP {response.status_code}")
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        pool = [threading.Thread(target=mark, args=worker) for worker in workers]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        submissions = len(workers) * days
+        return {
+            'threads': len(workers),
+            'submissions': submissions,
+            'lock_errors': len(lock_errors),
+            'other_errors': len(other_errors),
+            'elapsed_s': round(elapsed, 2),
+            'submissions_per_s': round(submissions / elapsed, 1),
+            'journal_mode': self.journal_mode(),
+        }
+
+    def journal_mode(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            return cursor.fetchone()[0]
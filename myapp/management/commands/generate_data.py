@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.models import Staff
+from myapp.synthetic import SIZES, generate_dataset
+
+
+class Command(BaseCommand):
+    help = "Insert a synthetic dataset (staff, batches, students, attendance, progress) for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=sorted(SIZES), default='small',
+                            help="Preset dataset size (default: small).")
+        for option in SIZES['small']:
+            parser.add_argument(f"--{option.replace('_', '-')}", type=int, dest=option,
+                                help=f"Override the preset's {option.replace('_', ' ')}.")
+        parser.add_argument('--tag', default='synth',
+                            help="Prefix for generated names, so datasets can coexist (default: synth).")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed (default: 0).")
+
+    def handle(self, *args, **options):
+        params = dict(SIZES[options['size']])
+        params.update({key: options[key] for key in params if options.get(key) is not None})
+        if Staff.objects.filter(user__username__startswith=f"{options['tag']}-staff-").exists():
+            raise CommandError(f"A dataset tagged '{options['tag']}' already exists; pass another --tag.")
+
+        counts = generate_dataset(tag=options['tag'], seed=options['seed'], **params)
+        self.stdout.write(self.style.SUCCESS(
+            "Created " + ", ".join(f"{count} {name.replace('_', ' ')}" for name, count in counts.items()) + "."
+        ))
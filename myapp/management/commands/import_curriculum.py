@@ -0,0 +1,37 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.imports import import_curriculum, read_curriculum
+from myapp.models import Course
+
+
+class Command(BaseCommand):
+    help = "Load a course's modules and topics from a CSV or YAML file in one bulk insert."
+
+    def add_arguments(self, parser):
+        parser.add_argument('course', help="Course name (matched case-insensitively).")
+        parser.add_argument('path', help="CSV (module_name,topic_name) or YAML curriculum file.")
+        parser.add_argument('--create-course', action='store_true',
+                            help="Create the course if it does not exist yet.")
+
+    def handle(self, *args, **options):
+        name = options['course'].strip()
+        course = Course.objects.filter(course_name__iexact=name).first()
+        if course is None:
+            if not options['create_course']:
+                raise CommandError(f"Course '{name}' does not exist (use --create-course).")
+            course = Course.objects.create(course_name=name)
+
+        try:
+            with open(options['path'], 'rb') as handle:
+                pairs = read_curriculum(handle)
+        except OSError as exc:
+            raise CommandError(str(exc))
+        except ValidationError as exc:
+            raise CommandError("; ".join(exc.messages))
+
+        created, progress_rows = import_curriculum(course, pairs)
+        self.stdout.write(self.style.SUCCESS(
+            f"{course.course_name}: {created} new topic(s) of {len(pairs)} entries; "
+            f"{progress_rows} student progress row(s) created."
+        ))
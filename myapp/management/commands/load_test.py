@@ -0,0 +1,187 @@
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from myapp import async_views, views
+from myapp.models import Staff
+from myapp.synthetic import SCRATCH_CACHES, SIZES, delete_dataset, generate_dataset
+from myapp.urls import root_urlconf
+
+TAG = 'loadtest'
+
+
+def _wsgi_get(handler, path, cookie):
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+        'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'testserver', 'HTTP_COOKIE': cookie, 'REMOTE_ADDR': '10.0.0.1',
+        'wsgi.input': BytesIO(), 'wsgi.errors': BytesIO(), 'wsgi.url_scheme': 'http',
+    }
+    status = []
+    result = handler(environ, lambda code, headers, exc_info=None: status.append(int(code.split()[0])))
+    try:
+        b''.join(result)
+    finally:
+        result.close()
+    return status[0]
+
+
+async def _asgi_get(handler, path, cookie):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+        'client': ('10.0.0.1', 40000), 'server': ('testserver', 80),
+    }
+    disconnect = asyncio.Event()
+    messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    status = []
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await disconnect.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    try:
+        await handler(scope, receive, send)
+    finally:
+        disconnect.set()
+    return status[0]
+
+
+def _summary(mode, clients, latencies, statuses, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'server': mode,
+        'clients': clients,
+        'requests': len(latencies),
+        'errors': sum(status != 200 for status in statuses),
+        'requests_per_s': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare WSGI (views.py, one thread per client) and ASGI (async_views.py, "
+        "one coroutine per client) throughput for the staff pages, in process, at "
+        "several levels of concurrency. This checks both code paths under load; it "
+        "is not a server benchmark, as no network or real server (gunicorn, uvicorn) "
+        "is involved. Creates a throw-away dataset in the configured database and "
+        "deletes it afterwards; caching uses a private local-memory cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', default='50,200,400',
+                            help="Comma separated numbers of concurrent clients (default: 50,200,400).")
+        parser.add_argument('--requests', type=int, default=6,
+                            help="Requests per client; each client cycles through the pages (default: 6).")
+        parser.add_argument('--size', default='small', choices=sorted(SIZES),
+                            help="Synthetic dataset size (default: small).")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['clients'].split(',') if level.strip()]
+        except ValueError:
+            raise CommandError("--clients must be a comma separated list of integers.")
+        if not levels or min(levels) < 1 or options['requests'] < 1:
+            raise CommandError("--clients and --requests must be at least 1.")
+        if User.objects.filter(username__startswith=f'{TAG}-').exists():
+            raise CommandError(f"Users named '{TAG}-*' already exist; remove them first.")
+
+        with override_settings(CACHES=SCRATCH_CACHES):
+            generate_dataset(tag=TAG, **SIZES[options['size']])
+            try:
+                sessions = self.staff_sessions()
+                results = []
+                with override_settings(ALLOWED_HOSTS=['*']):
+                    for clients in levels:
+                        plan = [sessions[n % len(sessions)] for n in range(clients)]
+                        results.append(self.run_wsgi(plan, options['requests']))
+                        results.append(self.run_asgi(plan, options['requests']))
+            finally:
+                delete_dataset(TAG)
+                cache.clear()  # the scratch cache
+
+        output = json.dumps({'database': connection.vendor, 'results': results}, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(output + '\n')
+            self.stderr.write(f"Report written to {options['output']}")
+        else:
+            self.stdout.write(output)
+
+    def staff_sessions(self):
+        """(cookie, paths) per generated staff member."""
+        sessions = []
+        for staff in Staff.objects.select_related('user').filter(user__username__startswith=f'{TAG}-'):
+            client = Client()
+            client.force_login(staff.user)
+            cookie = '; '.join(f'{name}={morsel.value}' for name, morsel in client.cookies.items())
+            batch_id = staff.batches.values_list('pk', flat=True).first()
+            sessions.append((cookie, [
+                reverse('get_batches'),
+                reverse('student_list', args=[batch_id]),
+                reverse('student_attendance', args=[batch_id]),
+            ]))
+        return sessions
+
+    def run_wsgi(self, plan, requests):
+        def client(session):
+            cookie, paths = session
+            timings, statuses = [], []
+            for n in range(requests):
+                started = time.perf_counter()
+                statuses.append(_wsgi_get(handler, paths[n % len(paths)], cookie))
+                timings.append(time.perf_counter() - started)
+            return timings, statuses
+
+        with override_settings(ROOT_URLCONF=root_urlconf(views)):
+            handler = WSGIHandler()
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=len(plan)) as pool:
+                outcomes = list(pool.map(client, plan))
+            elapsed = time.perf_counter() - started
+        return _summary('wsgi', len(plan), [t for timings, _ in outcomes for t in timings],
+                        [s for _, statuses in outcomes for s in statuses], elapsed)
+
+    def run_asgi(self, plan, requests):
+        async def client(session):
+            cookie, paths = session
+            timings, statuses = [], []
+            for n in range(requests):
+                started = time.perf_counter()
+                statuses.append(await _asgi_get(handler, paths[n % len(paths)], cookie))
+                timings.append(time.perf_counter() - started)
+            return timings, statuses
+
+        async def run():
+            return await asyncio.gather(*(client(session) for session in plan))
+
+        with override_settings(ROOT_URLCONF=root_urlconf(async_views)):
+            handler = ASGIHandler()
+            started = time.perf_counter()
+            outcomes = asyncio.run(run())
+            elapsed = time.perf_counter() - started
+        return _summary('asgi', len(plan), [t for timings, _ in outcomes for t in timings],
+                        [s for _, statuses in outcomes for s in statuses], elapsed)
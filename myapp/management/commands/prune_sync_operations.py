@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from myapp.services import prune_sync_operations
+
+
+class Command(BaseCommand):
+    help = "Delete applied sync operations older than --days (run daily, e.g. from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30,
+                            help="Keep operations from the last N days (default: 30).")
+
+    def handle(self, *args, **options):
+        deleted = prune_sync_operations(days=options['days'])
+        self.stdout.write(f"Pruned {deleted} sync operation(s).")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from myapp.summaries import rebuild_progress_summaries
+
+
+class Command(BaseCommand):
+    help = "Recompute every StudentProgressSummary from StudentTopicProgress."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help="Students aggregated and upserted per query (default: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_progress_summaries(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt progress summaries for {count} students."))
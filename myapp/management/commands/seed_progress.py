@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from myapp.services import seed_topic_progress
+
+
+class Command(BaseCommand):
+    help = "Create missing StudentTopicProgress rows for every enrolled student."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Rows per INSERT statement (default: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        rows = seed_topic_progress(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {rows} missing progress rows."
+        ))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from myapp.services import deliver_outbox
+
+
+class Command(BaseCommand):
+    help = "Deliver queued EmailOutbox messages in batches over one SMTP connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help="Messages sent per SMTP connection (default: 50).")
+        parser.add_argument('--max-attempts', type=int, default=5,
+                            help="Attempts before a message is marked failed (default: 5).")
+        parser.add_argument('--backoff', type=int, default=60,
+                            help="Base retry delay in seconds, doubled per attempt (default: 60).")
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep running and poll for new messages.")
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help="Seconds to sleep between polls in --loop mode (default: 5).")
+
+    def handle(self, *args, **options):
+        while True:
+            total_sent = total_failed = 0
+            while True:
+                sent, failed = deliver_outbox(
+                    batch_size=options['batch_size'],
+                    max_attempts=options['max_attempts'],
+                    backoff_seconds=options['backoff'],
+                )
+                total_sent += sent
+                total_failed += failed
+                if sent + failed < options['batch_size']:
+                    break
+            if total_sent or total_failed:
+                self.stdout.write(f"Outbox: {total_sent} sent, {total_failed} failed.")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
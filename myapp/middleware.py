@@ -0,0 +1,194 @@
+import heapq
+import json
+import logging
+import time
+from contextlib import ExitStack
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.functional import SimpleLazyObject
+
+from .models import Staff
+
+logger = logging.getLogger(__name__)
+
+SLOWEST_QUERIES = 3
+
+
+class QueryStats:
+    """Collects timing for every query run through ``connection.execute_wrapper``.
+
+    The slowest statements are kept with their placeholders; bound parameters
+    (session keys, emails, ...) are only attached when ``log_params`` is set.
+    """
+
+    def __init__(self, log_params=False):
+        self.log_params = log_params
+        self.count = 0
+        self.duration = 0.0
+        self.seen = {}
+        self.slowest = []  # min-heap of (duration, sql)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            key = (sql, repr(params))
+            self.seen[key] = self.seen.get(key, 0) + 1
+            statement = f"{sql} -- params: {params!r}" if self.log_params and params is not None else sql
+            entry = (elapsed, statement[:2000])
+            if len(self.slowest) < SLOWEST_QUERIES:
+                heapq.heappush(self.slowest, entry)
+            else:
+                heapq.heappushpop(self.slowest, entry)
+
+    @property
+    def duplicates(self):
+        """Queries repeated with identical SQL and parameters, beyond the first run."""
+        return sum(count - 1 for count in self.seen.values())
+
+
+class QueryInstrumentationMiddleware:
+    """Per-request query count, SQL time, duplicate queries and view time.
+
+    Enabled with ``REQUEST_INSTRUMENTATION = True``; works without DEBUG since
+    queries are timed through ``connection.execute_wrapper``. Adds a
+    ``Server-Timing`` header, logs one JSON line per request on
+    ``myapp.middleware`` and, for requests slower than
+    ``REQUEST_SLOW_THRESHOLD_MS``, a warning with the slowest SQL. That SQL
+    carries placeholders only unless ``REQUEST_LOG_SQL_PARAMS`` is on. Time
+    spent iterating a streaming response body is not included.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_INSTRUMENTATION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_threshold_ms = getattr(settings, 'REQUEST_SLOW_THRESHOLD_MS', 500)
+        self.log_params = getattr(settings, 'REQUEST_LOG_SQL_PARAMS', False)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = QueryStats(self.log_params)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            self.wrap_connections(stack, stats)
+            response = self.get_response(request)
+        self.report(request, response, stats, started)
+        return response
+
+    async def __acall__(self, request):
+        stats = QueryStats(self.log_params)
+        started = time.perf_counter()
+        # Connections are per thread and the async ORM runs on the request's
+        # sync thread, so the wrappers are installed and removed there.
+        stack = ExitStack()
+        await sync_to_async(self.wrap_connections)(stack, stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        self.report(request, response, stats, started)
+        return response
+
+    def wrap_connections(self, stack, stats):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+
+    def report(self, request, response, stats, started):
+        total_ms = (time.perf_counter() - started) * 1000
+        sql_ms = stats.duration * 1000
+
+        response['Server-Timing'] = ", ".join([
+            f'sql;dur={sql_ms:.1f};desc="{stats.count} queries"',
+            f'dup;desc="{stats.duplicates} duplicate queries"',
+            f'view;dur={total_ms - sql_ms:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ])
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': stats.count,
+            'duplicates': stats.duplicates,
+            'sql_ms': round(sql_ms, 1),
+            'view_ms': round(total_ms - sql_ms, 1),
+            'total_ms': round(total_ms, 1),
+        }
+        logger.info(json.dumps(record))
+        if total_ms >= self.slow_threshold_ms:
+            slowest = [
+                {'ms': round(duration * 1000, 1), 'sql': sql}
+                for duration, sql in sorted(stats.slowest, reverse=True)
+            ]
+            logger.warning(f"Slow request {request.method} {request.path}: "
+                           + json.dumps({**record, 'slowest_sql': slowest}))
+
+
+def get_staff(request, user=None):
+    """The Staff profile of ``user`` (default ``request.user``, user row joined), or None.
+
+    One lookup on the unique ``user_id``. Nothing is kept across requests, so
+    a profile created or removed for a logged-in user counts from their next
+    request.
+    """
+    user = user if user is not None else request.user
+    if not user.is_authenticated:
+        return None
+    return Staff.objects.select_related('user').filter(user_id=user.pk).first()
+
+
+async def aget_staff(request, user=None):
+    """See get_staff()."""
+    user = user if user is not None else await request.auser()
+    if not user.is_authenticated:
+        return None
+    return await Staff.objects.select_related('user').filter(user_id=user.pk).afirst()
+
+
+async def astaff(request):
+    if not hasattr(request, '_acached_staff'):
+        request._acached_staff = await aget_staff(request)
+    return request._acached_staff
+
+
+class StaffMiddleware:
+    """Set ``request.staff`` to the logged-in user's Staff profile, resolved
+    lazily and at most once per request. It is falsy for non-staff users.
+    Async views await ``request.astaff()`` instead.
+
+    Must come after AuthenticationMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.process_request(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        self.process_request(request)
+        return await self.get_response(request)
+
+    def process_request(self, request):
+        request.staff = SimpleLazyObject(lambda: get_staff(request))
+        request.astaff = partial(astaff, request)
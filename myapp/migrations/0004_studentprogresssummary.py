@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Sum
+
+
+def build_summaries(apps, schema_editor):
+    """Summaries for existing progress; later writes keep them current."""
+    Student = apps.get_model('myapp', 'Student')
+    StudentProgressSummary = apps.get_model('myapp', 'StudentProgressSummary')
+    StudentTopicProgress = apps.get_model('myapp', 'StudentTopicProgress')
+    totals = {
+        row['student_id']: row
+        for row in StudentTopicProgress.objects.filter(topic__course_id=F('student__course_id'))
+        .values('student_id').annotate(
+            total=Count('pk'), started=Count('start_date'), completed=Count('end_date'),
+            marks_sum=Sum('marks'), marked=Count('marks'), last_start=Max('start_date'), last_end=Max('end_date'),
+        )
+    }
+    summaries = []
+    for student_id in Student.objects.values_list('pk', flat=True).iterator():
+        row = totals.get(student_id, {})
+        dates = [day for day in (row.get('last_start'), row.get('last_end')) if day is not None]
+        summaries.append(StudentProgressSummary(
+            student_id=student_id,
+            topics_total=row.get('total', 0),
+            topics_started=row.get('started', 0),
+            topics_completed=row.get('completed', 0),
+            marks_total=row.get('marks_sum') or 0,
+            marks_count=row.get('marked', 0),
+            last_activity=max(dates) if dates else None,
+        ))
+    StudentProgressSummary.objects.bulk_create(summaries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0003_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentProgressSummary',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='progress_summary', serialize=False, to='myapp.student')),
+                ('topics_total', models.PositiveIntegerField(default=0)),
+                ('topics_started', models.PositiveIntegerField(default=0)),
+                ('topics_completed', models.PositiveIntegerField(default=0)),
+                ('marks_total', models.IntegerField(default=0)),
+                ('marks_count', models.PositiveIntegerField(default=0)),
+                ('last_activity', models.DateField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
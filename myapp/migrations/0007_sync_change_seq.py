@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0006_emailoutbox_claimed_by'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='studentattendance',
+            name='myapp_stude_updated_d1afd6_idx',
+        ),
+        migrations.RemoveField(
+            model_name='studentattendance',
+            name='updated_at',
+        ),
+        migrations.AddField(
+            model_name='studentattendance',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='studentattendance',
+            index=models.Index(fields=['change_seq', 'id'], name='myapp_stude_change__c69db0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='syncoperation',
+            index=models.Index(fields=['created_at'], name='myapp_synco_created_b1ed16_idx'),
+        ),
+    ]
@@ -1,8 +1,9 @@
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from django.core.validators import RegexValidator
 from django.core.exceptions import ValidationError
+from django.dispatch import Signal
 
 
 # Professional mobile number validation (India)
@@ -11,6 +12,50 @@ mobile_validator = RegexValidator(
     message="Enter a valid 10-digit mobile number starting with 6-9."
 )
 
+# Sent after rows of a per-student model are deleted directly (Model.delete or
+# QuerySet.delete on that model), with the affected ``student_ids`` and, for a
+# single row, the ``instance``. Receivers use it instead of post_delete: any
+# pre/post_delete receiver would turn off Django's fast delete, and cascades
+# from Student, CourseTopic or Course would then run them row by row.
+student_rows_deleted = Signal()
+
+
+class StudentRowsQuerySet(models.QuerySet):
+    def delete(self):
+        student_ids = set(self.values_list('student_id', flat=True).distinct())
+        result = super().delete()
+        if student_ids:
+            student_rows_deleted.send(sender=self.model, student_ids=student_ids)
+        return result
+
+
+class StudentAttendanceQuerySet(StudentRowsQuerySet):
+    """Stamps every write with the next ``change_seq``.
+
+    The number is read (MAX + 1) in the same transaction as the write. On
+    SQLite a transaction that read before another one committed cannot write
+    anymore, so numbers only ever grow in commit order and a sync cursor
+    never skips a row committed after it was handed out. All rows of one
+    write share the number.
+    """
+    def next_change_seq(self):
+        return (self.model._base_manager.using(self.db).aggregate(last=models.Max('change_seq'))['last'] or 0) + 1
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        if kwargs.get('update_fields'):
+            kwargs['update_fields'] = [*kwargs['update_fields'], 'change_seq']
+        with transaction.atomic(using=self.db, savepoint=False):
+            change_seq = self.next_change_seq()
+            for obj in objs:
+                obj.change_seq = change_seq
+            return super().bulk_create(objs, *args, **kwargs)
+
+    def update(self, **kwargs):
+        with transaction.atomic(using=self.db, savepoint=False):
+            return super().update(change_seq=self.next_change_seq(), **kwargs)
+
+
 # Create your models here.
 class Staff(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -59,6 +104,16 @@ class Student(models.Model):
     ]
     mode = models.BooleanField(choices=MODE_CHOICES, default=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['staff', 'batch'])]  # a staff member's students in one batch
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored course/staff so a reassignment can be detected on save
+        instance._loaded_course_id = instance.__dict__.get('course_id')
+        instance._loaded_staff_id = instance.__dict__.get('staff_id')
+        return instance
 
     def __str__(self):
         course_name = self.course.course_name if self.course else "No Course"
@@ -78,12 +133,15 @@ class CourseTopic(models.Model):
     def __str__(self):
         return f"{self.module_name} - {self.topic_name}"
     
+    @staticmethod
+    def normalize_name(value):
+        """Module/topic names are stored capitalized (also used by bulk imports)"""
+        return value.strip().capitalize()
+
     def save(self,*args,**kwargs):
-        print(self.module_name)
         if self.module_name and self.topic_name:
-            self.module_name=self.module_name.capitalize()
-            self.topic_name=self.topic_name.capitalize()
-            print(self.module_name)
+            self.module_name=self.normalize_name(self.module_name)
+            self.topic_name=self.normalize_name(self.topic_name)
         super().save(*args,**kwargs)
 
 class StudentTopicProgress(models.Model):
@@ -95,12 +153,26 @@ class StudentTopicProgress(models.Model):
     marks = models.IntegerField(null=True, blank=True)
     sign = models.CharField(max_length=100, help_text="Staff full name")
 
+    objects = StudentRowsQuerySet.as_manager()
+
     class Meta:
         unique_together = ('student', 'topic')
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Stored values, so a save can update StudentProgressSummary by delta
+        instance._loaded_progress = tuple(instance.__dict__.get(f) for f in ('start_date', 'end_date', 'marks'))
+        return instance
+
     def __str__(self):
         return f"{self.student.student_name} - {self.topic.topic_name}"
 
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        student_rows_deleted.send(sender=type(self), student_ids={self.student_id}, instance=self)
+        return result
+
     # Add Date Validation
     def clean(self):
         # If end_date is provided but start_date is empty
@@ -114,6 +186,29 @@ class StudentTopicProgress(models.Model):
 
 
 
+class StudentProgressSummary(models.Model):
+    """Per-student totals over StudentTopicProgress, maintained by delta on every
+    progress write (see myapp.summaries) and rebuilt by rebuild_progress_summaries."""
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, primary_key=True, related_name='progress_summary')
+    topics_total = models.PositiveIntegerField(default=0)
+    topics_started = models.PositiveIntegerField(default=0)
+    topics_completed = models.PositiveIntegerField(default=0)
+    marks_total = models.IntegerField(default=0)
+    marks_count = models.PositiveIntegerField(default=0)
+    last_activity = models.DateField(null=True, blank=True)  # latest start/end date of the rows
+
+    def __str__(self):
+        return f"{self.student_id}: {self.topics_completed}/{self.topics_total} completed"
+
+    @property
+    def percent_completed(self):
+        return round(100 * self.topics_completed / self.topics_total, 1) if self.topics_total else None
+
+    @property
+    def average_marks(self):
+        return round(self.marks_total / self.marks_count, 1) if self.marks_count else None
+
+
 class Attendance(models.Model):
     staff = models.ForeignKey("Staff", on_delete=models.CASCADE, related_name="attendances")
     date = models.DateField(default=timezone.now)
@@ -135,13 +230,36 @@ class StudentAttendance(models.Model):
         (False, 'Absent'),
     ]
     status=models.BooleanField(choices=STATUS_CHOICES, null=True,blank=True)  # True for Present, False for Absent
+    # When the status was taken (the client's clock for synced operations); last writer wins
+    recorded_at = models.DateTimeField(null=True, blank=True)
+    # Sync cursor for offline clients pulling updates, set on every write
+    # (see StudentAttendanceQuerySet)
+    change_seq = models.BigIntegerField(default=0, editable=False)
+
+    objects = StudentAttendanceQuerySet.as_manager()
 
     class Meta:
         unique_together = ('student', 'date')  # only one attendance per student per day
+        indexes = [
+            models.Index(fields=['date', 'student']),  # admin date_hierarchy / one day across students
+            models.Index(fields=['change_seq', 'id']),  # sync: changes after a cursor
+        ]
 
     def __str__(self):
         return f"{self.student.student_name} - {self.date}"
 
+    def save(self, *args, **kwargs):
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = [*kwargs['update_fields'], 'change_seq']
+        with transaction.atomic(using=kwargs.get('using'), savepoint=False):
+            self.change_seq = StudentAttendance.objects.db_manager(kwargs.get('using')).next_change_seq()
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        student_rows_deleted.send(sender=type(self), student_ids={self.student_id}, instance=self)
+        return result
+
 
 class Batch(models.Model):
     batch_id = models.AutoField(primary_key=True)
@@ -153,6 +271,7 @@ class Batch(models.Model):
     class Meta:
         unique_together = ('staff', 'batch_name')
         ordering = ['start_time']
+        indexes = [models.Index(fields=['staff', 'start_time'])]  # a staff member's batches, already ordered
 
     def __str__(self):
         return f"{self.batch_name} ({self.start_time.strftime('%I:%M %p')} - {self.end_time.strftime('%I:%M %p')})"
@@ -161,4 +280,51 @@ class Batch(models.Model):
         # Validate time order
         if self.start_time and self.end_time:
             if self.start_time >= self.end_time:
-                raise ValidationError("End Time must be later than Start Time.")
\ No newline at end of file
+                raise ValidationError("End Time must be later than Start Time.")
+
+class SyncOperation(models.Model):
+    """A client operation already applied by the sync endpoint, kept so a
+    retried or replayed operation is answered without being applied twice.
+    Old rows are deleted by the ``prune_sync_operations`` command.
+    """
+    staff = models.ForeignKey(Staff, on_delete=models.CASCADE, related_name='sync_operations')
+    op_id = models.CharField(max_length=64)
+    result = models.CharField(max_length=10)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('staff', 'op_id')
+        indexes = [models.Index(fields=['created_at'])]  # pruning
+
+    def __str__(self):
+        return f"{self.op_id} ({self.result})"
+
+
+class EmailOutbox(models.Model):
+    """Email queued in the same transaction as the change that triggered it.
+
+    Rows are delivered by the ``send_outbox`` management command. A worker
+    claims a batch by stamping ``claimed_by`` and pushing ``next_attempt_at``
+    forward, so concurrent workers never send the same row.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    recipient = models.EmailField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    claimed_by = models.CharField(max_length=32, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.recipient} ({self.status})"
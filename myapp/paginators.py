@@ -0,0 +1,123 @@
+import hashlib
+
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+# Query string parameter carrying the last primary key of the previous page
+CURSOR_VAR = 'after'
+
+
+def estimated_count(queryset, timeout=300):
+    """Cheap row count for large changelists.
+
+    Unfiltered tables on PostgreSQL use the planner's reltuples estimate.
+    Everything else is counted once and cached for ``timeout`` seconds under
+    a key derived from the SQL, so paging and reloads skip the COUNT(*).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] >= 0:
+            return row[0]
+    try:
+        sql = str(queryset.order_by().query)
+    except EmptyResultSet:
+        return 0
+    key = 'estimated-count:' + hashlib.md5(sql.encode()).hexdigest()
+    return cache.get_or_set(key, queryset.count, timeout)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator whose count comes from estimated_count() instead of COUNT(*)."""
+
+    @cached_property
+    def count(self):
+        return estimated_count(self.object_list)
+
+
+class KeysetChangeList(ChangeList):
+    """ChangeList that pages by primary key instead of OFFSET.
+
+    With the default newest-first ordering each page is fetched with
+    ``pk < <last pk of previous page>``, so deep pages cost the same as the
+    first one. Explicit column sorting, "show all" and numbered page links
+    fall back to the stock offset pagination.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR) or None
+        self.next_cursor = None
+        self.keyset_paging = False
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # A cursor only makes sense for the page it was issued on
+        if not new_params or CURSOR_VAR not in new_params:
+            remove = [*(remove or []), CURSOR_VAR]
+        return super().get_query_string(new_params, remove)
+
+    def can_use_keyset(self):
+        return (
+            ORDER_VAR not in self.params
+            and not self.show_all
+            and self.page_num == 1
+            and not self.list_editable
+            and list(self.queryset.query.order_by) == ['-pk']
+        )
+
+    def get_results(self, request):
+        if not self.can_use_keyset():
+            return super().get_results(request)
+
+        queryset = self.queryset
+        if self.cursor is not None:
+            try:
+                queryset = queryset.filter(pk__lt=self.cursor)
+            except (ValueError, ValidationError):
+                raise IncorrectLookupParameters
+        rows = list(queryset[:self.list_per_page + 1])
+        if len(rows) > self.list_per_page:
+            rows = rows[:self.list_per_page]
+            self.next_cursor = rows[-1].pk
+
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_count = self.paginator.count
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.result_list = rows
+        self.can_show_all = False
+        self.multi_page = self.cursor is not None or self.next_cursor is not None
+        self.keyset_paging = True
+
+    @property
+    def first_page_url(self):
+        return self.get_query_string(remove=[CURSOR_VAR])
+
+    @property
+    def next_page_url(self):
+        return self.get_query_string({CURSOR_VAR: self.next_cursor})
+
+
+class LargeTableAdminMixin:
+    """ModelAdmin mixin for tables that grow into millions of rows."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
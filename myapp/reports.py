@@ -0,0 +1,99 @@
+import calendar
+from datetime import date, timedelta
+
+from django.db.models import Count, Q, Sum
+
+from .models import Student, StudentAttendance
+
+
+def _percent(part, whole):
+    return round(100 * part / whole, 1) if whole else None
+
+
+def monthly_attendance_matrix(batch, year, month):
+    """Students x days attendance matrix for one batch and month.
+
+    Two queries in total: the batch's students and every attendance row of
+    the month for them. Cells hold True (present), False (absent) or None
+    (not marked); percentages are over marked days only.
+    """
+    days_in_month = calendar.monthrange(year, month)[1]
+    first_day, last_day = date(year, month, 1), date(year, month, days_in_month)
+
+    students = list(
+        Student.objects.filter(batch=batch).order_by('student_name').values_list('student_id', 'student_name')
+    )
+    row_index = {student_id: i for i, (student_id, _) in enumerate(students)}
+    cells = [[None] * days_in_month for _ in students]
+    for student_id, day, status in StudentAttendance.objects.filter(
+        student__batch=batch, date__range=(first_day, last_day), status__isnull=False
+    ).values_list('student_id', 'date', 'status'):
+        cells[row_index[student_id]][day.day - 1] = status
+
+    rows = []
+    for (student_id, student_name), row in zip(students, cells):
+        present = sum(1 for cell in row if cell is True)
+        marked = sum(1 for cell in row if cell is not None)
+        rows.append({
+            "student_id": student_id,
+            "student_name": student_name,
+            "cells": row,
+            "present": present,
+            "marked": marked,
+            "percent": _percent(present, marked),
+        })
+
+    day_totals = []
+    for i in range(days_in_month):
+        column = [row[i] for row in cells]
+        present = sum(1 for cell in column if cell is True)
+        marked = sum(1 for cell in column if cell is not None)
+        day_totals.append({
+            "date": date(year, month, i + 1),
+            "present": present,
+            "marked": marked,
+            "percent": _percent(present, marked),
+        })
+
+    total_present = sum(row["present"] for row in rows)
+    total_marked = sum(row["marked"] for row in rows)
+    return {
+        "days": [total["date"] for total in day_totals],
+        "rows": rows,
+        "day_totals": day_totals,
+        "percent": _percent(total_present, total_marked),
+    }
+
+
+def batch_overview(staff, today, days=30):
+    """Per-batch metrics for every batch of ``staff`` in two grouped queries.
+
+    Returns ``{batch_id: {"students", "attendance_percent", "completion_percent",
+    "average_marks"}}``. Attendance is over the last ``days`` days (marked
+    days only); completion and marks are pooled over the batch's students
+    from StudentProgressSummary. Batches without students are absent.
+    """
+    overview = {}
+    for row in Student.objects.filter(staff=staff, batch__isnull=False).values('batch_id').annotate(
+        students=Count('pk'),
+        completed=Sum('progress_summary__topics_completed'),
+        topics=Sum('progress_summary__topics_total'),
+        marks_total=Sum('progress_summary__marks_total'),
+        marks_count=Sum('progress_summary__marks_count'),
+    ).order_by():
+        overview[row['batch_id']] = {
+            "students": row['students'],
+            "attendance_percent": None,
+            "completion_percent": _percent(row['completed'] or 0, row['topics'] or 0),
+            "average_marks": round(row['marks_total'] / row['marks_count'], 1) if row['marks_count'] else None,
+        }
+
+    for row in StudentAttendance.objects.filter(
+        student__staff=staff, student__batch__isnull=False,
+        date__range=(today - timedelta(days=days - 1), today), status__isnull=False,
+    ).values('student__batch_id').annotate(
+        present=Count('pk', filter=Q(status=True)), marked=Count('pk'),
+    ).order_by():
+        if row['student__batch_id'] in overview:
+            overview[row['student__batch_id']]["attendance_percent"] = _percent(row['present'], row['marked'])
+    return overview
@@ -0,0 +1,396 @@
+import datetime
+import logging
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from functools import wraps
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+
+from .caching import bump_progress_versions, invalidate_batch_overview
+from .models import (
+    Attendance, CourseTopic, EmailOutbox, Staff, Student, StudentAttendance,
+    StudentTopicProgress, SyncOperation,
+)
+from .summaries import ProgressDeltas, progress_values, rebuild_progress_summaries
+
+logger = logging.getLogger(__name__)
+
+LOCK_RETRIES = 3
+LOCK_BACKOFF_SECONDS = 0.1
+
+
+def _busy_timeout():
+    """Seconds SQLite waits for a lock before raising (the sqlite3 default is 5)."""
+    return connection.settings_dict['OPTIONS'].get('timeout', 5)
+
+
+def retry_on_lock(func):
+    """Retry ``func`` when SQLite reports "database is locked", up to
+    LOCK_RETRIES more times with jittered exponential backoff.
+
+    Retries only start within one busy timeout of the first attempt: they
+    are meant for locks SQLite gives up on at once (a read transaction that
+    cannot become a writer), not for a database that stayed busy for the
+    whole timeout. A call therefore waits at most about two busy timeouts.
+    Meant for functions that run their own transaction; inside an outer
+    atomic block nothing is retried, as the failed transaction belongs to
+    the caller.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.monotonic()
+        for attempt in range(LOCK_RETRIES + 1):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as exc:
+                if (attempt == LOCK_RETRIES or connection.in_atomic_block or 'locked' not in str(exc)
+                        or time.monotonic() - started >= _busy_timeout()):
+                    raise
+                delay = LOCK_BACKOFF_SECONDS * 2 ** attempt * random.uniform(0.5, 1.5)
+                logger.warning(f"{func.__name__}: {exc}; retrying in {delay:.2f}s (attempt {attempt + 1})")
+                time.sleep(delay)
+    return wrapper
+
+
+@contextmanager
+def write_atomic():
+    """transaction.atomic() for read-then-write work.
+
+    On SQLite an outermost block starts with BEGIN IMMEDIATE, taking the
+    write lock up front: a deferred transaction that reads first cannot
+    always upgrade to a writer and fails at once instead of waiting out the
+    busy timeout. Other transactions keep the default deferred BEGIN, so
+    readers never hold the write lock.
+    """
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic():
+            yield
+        return
+    connection.ensure_connection()  # connecting resets transaction_mode from the settings
+    mode, connection.transaction_mode = connection.transaction_mode, 'IMMEDIATE'
+    try:
+        with transaction.atomic():
+            connection.transaction_mode = mode
+            yield
+    finally:
+        connection.transaction_mode = mode
+
+
+def save_student_attendance(statuses, selected_date):
+    """Upsert attendance for many students on one date.
+
+    ``statuses`` maps student_id -> bool (True = present). Rows that already
+    hold the submitted status are left alone; everything else is written with
+    a single INSERT ... ON CONFLICT (student, date) DO UPDATE inside one
+    transaction. Returns the number of rows written.
+    """
+    outcomes = save_attendance_records(
+        {(student_id, selected_date): status for student_id, status in statuses.items()}
+    )
+    return sum(outcome != 'unchanged' for outcome in outcomes.values())
+
+
+@retry_on_lock
+def save_attendance_records(records):
+    """Upsert attendance for any mix of students and dates.
+
+    ``records`` maps (student_id, date) -> bool. Same single upsert as
+    save_student_attendance; returns (student_id, date) -> 'created',
+    'updated' or 'unchanged'.
+    """
+    if not records:
+        return {}
+
+    with write_atomic():
+        existing = {
+            (student_id, day): status
+            for student_id, day, status in StudentAttendance.objects.filter(
+                student_id__in={student_id for student_id, _ in records},
+                date__in={day for _, day in records},
+            ).values_list('student_id', 'date', 'status')
+        }
+        outcomes = {}
+        changed = []
+        recorded_at = timezone.now()
+        for (student_id, day), status in records.items():
+            if (student_id, day) not in existing:
+                outcomes[student_id, day] = 'created'
+            elif existing[student_id, day] != status:
+                outcomes[student_id, day] = 'updated'
+            else:
+                outcomes[student_id, day] = 'unchanged'
+                continue
+            changed.append(StudentAttendance(student_id=student_id, date=day, status=status, recorded_at=recorded_at))
+        _upsert_attendance(changed)
+    return outcomes
+
+
+def _upsert_attendance(rows):
+    if rows:
+        StudentAttendance.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['student', 'date'],
+            update_fields=['status', 'recorded_at'],
+        )
+        invalidate_batch_overview(student_ids={row.student_id for row in rows})
+
+
+@retry_on_lock
+def apply_attendance_operations(staff, operations):
+    """Apply queued offline attendance operations of ``staff`` idempotently.
+
+    ``operations`` is a list of ``(op_id, timestamp, student_id, date, status)``.
+    An op_id already applied is answered with its stored result and nothing
+    else happens, so retries and replays are harmless. For each
+    (student, date) the operation with the latest timestamp wins, whatever
+    order operations arrive in; older ones are reported as ``'stale'``. All
+    lookups and writes are a fixed number of queries in one transaction.
+    Returns op_id -> ``(result, duplicate)`` with result ``'applied'`` or
+    ``'stale'``.
+    """
+    if not operations:
+        return {}
+
+    with write_atomic():
+        done = dict(
+            SyncOperation.objects.filter(staff=staff, op_id__in=[op[0] for op in operations])
+            .values_list('op_id', 'result')
+        )
+        results = {}
+        # latest operation per (student, date); ties go to the larger op_id
+        latest = {}
+        for op in operations:
+            op_id, timestamp, student_id, day, status = op
+            if op_id in results or op_id in done:
+                continue
+            results[op_id] = 'stale'
+            current = latest.get((student_id, day))
+            if current is None or (timestamp, op_id) > (current[1], current[0]):
+                latest[student_id, day] = op
+
+        recorded = dict(
+            ((student_id, day), recorded_at)
+            for student_id, day, recorded_at in StudentAttendance.objects.filter(
+                student_id__in={key[0] for key in latest}, date__in={key[1] for key in latest},
+            ).values_list('student_id', 'date', 'recorded_at')
+        )
+        rows = []
+        for (student_id, day), (op_id, timestamp, _, _, status) in latest.items():
+            stored = recorded.get((student_id, day))
+            if stored is None or timestamp > stored:
+                results[op_id] = 'applied'
+                rows.append(StudentAttendance(student_id=student_id, date=day, status=status, recorded_at=timestamp))
+        _upsert_attendance(rows)
+        SyncOperation.objects.bulk_create(
+            [SyncOperation(staff=staff, op_id=op_id, result=result) for op_id, result in results.items()],
+            ignore_conflicts=True,
+        )
+    return {
+        **{op_id: (result, True) for op_id, result in done.items()},
+        **{op_id: (result, False) for op_id, result in results.items()},
+    }
+
+
+@retry_on_lock
+def prune_sync_operations(days=30):
+    """Delete SyncOperation rows older than ``days``; returns how many.
+
+    A pruned op_id that is replayed later is no longer recognised, but it
+    still changes nothing: its row already has a recorded_at at least as
+    new as the operation's timestamp, so the replay comes back ``'stale'``.
+    """
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = SyncOperation.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+
+def seed_topic_progress(students=None, topics=None, batch_size=1000):
+    """Create the missing StudentTopicProgress rows for students x course topics.
+
+    Limit the work to ``students`` and/or ``topics`` (instances or ids); with
+    neither, every enrolled student is backfilled. Uses one query per side plus
+    one for the rows already present, a bulk INSERT that still skips
+    conflicting rows, and updates each student's summary by the rows added.
+    Returns the number of rows created.
+    """
+    student_qs = Student.objects.all()
+    topic_qs = CourseTopic.objects.all()
+    if students is not None:
+        student_qs = student_qs.filter(pk__in=[getattr(s, 'pk', s) for s in students])
+        # only the topics of those students' courses, not the whole curriculum
+        topic_qs = topic_qs.filter(course_id__in=student_qs.values('course_id'))
+    if topics is not None:
+        topic_qs = topic_qs.filter(pk__in=[getattr(t, 'pk', t) for t in topics])
+
+    topics_by_course = {}
+    for course_id, topic_id in topic_qs.values_list('course_id', 'topic_id'):
+        topics_by_course.setdefault(course_id, []).append(topic_id)
+    if not topics_by_course:
+        return 0
+
+    student_qs = student_qs.filter(course_id__in=topics_by_course.keys())
+    existing = set(
+        StudentTopicProgress.objects.filter(student__in=student_qs, topic__in=topic_qs)
+        .values_list('student_id', 'topic_id')
+    )
+    staff_ids = set()
+    rows = []
+    for student_id, course_id, staff_id in student_qs.values_list('student_id', 'course_id', 'staff_id'):
+        missing = [topic_id for topic_id in topics_by_course[course_id] if (student_id, topic_id) not in existing]
+        if missing:
+            staff_ids.add(staff_id)
+            rows.extend(StudentTopicProgress(student_id=student_id, topic_id=topic_id) for topic_id in missing)
+    if not rows:
+        return 0
+    deltas = ProgressDeltas()
+    for row in rows:
+        deltas.change(row.student_id, None, progress_values(row))
+    with transaction.atomic(savepoint=False):
+        StudentTopicProgress.objects.bulk_create(rows, batch_size=batch_size, ignore_conflicts=True)
+        deltas.apply(staff_ids=staff_ids)
+    bump_progress_versions(course_ids=topics_by_course.keys())
+    return len(rows)
+
+
+PROGRESS_FIELDS = ['start_date', 'end_date', 'marks', 'sign']
+
+
+@retry_on_lock
+def update_topic_progress(progress_rows, signed_by):
+    """Write edited StudentTopicProgress rows with one bulk UPDATE.
+
+    Every row is stamped with ``signed_by`` in ``sign``. Callers pass only
+    the rows that actually changed. Returns the number of rows written.
+    """
+    progress_rows = list(progress_rows)
+    if not progress_rows:
+        return 0
+    deltas, unknown = ProgressDeltas(), set()
+    for progress in progress_rows:
+        progress.sign = signed_by
+        if hasattr(progress, '_loaded_progress'):
+            deltas.change(progress.student_id, progress._loaded_progress, progress_values(progress))
+        else:
+            unknown.add(progress.student_id)  # not loaded from the DB: previous values unknown
+    with write_atomic():
+        StudentTopicProgress.objects.bulk_update(progress_rows, PROGRESS_FIELDS)
+        deltas.apply()
+        if unknown:
+            rebuild_progress_summaries(unknown)
+        bump_progress_versions(student_ids=[progress.student_id for progress in progress_rows])
+    for progress in progress_rows:
+        progress._loaded_progress = progress_values(progress)
+    return len(progress_rows)
+
+
+def claim_outbox(batch_size=50, lease_seconds=300):
+    """Claim up to ``batch_size`` due EmailOutbox rows for this worker.
+
+    One conditional UPDATE stamps a fresh token on the candidates that are
+    still pending and due, and moves their ``next_attempt_at`` past the
+    lease, so a second worker racing over the same rows matches none of
+    them. Only rows carrying our token are returned. A worker that dies
+    mid-batch leaves its rows pending; they become due again once the lease
+    runs out.
+    """
+    now = timezone.now()
+    candidates = list(
+        EmailOutbox.objects.filter(status='pending', next_attempt_at__lte=now)
+        .order_by('next_attempt_at', 'id').values_list('pk', flat=True)[:batch_size]
+    )
+    if not candidates:
+        return []
+    token = uuid.uuid4().hex
+    claimed = EmailOutbox.objects.filter(
+        pk__in=candidates, status='pending', next_attempt_at__lte=now,
+    ).update(claimed_by=token, next_attempt_at=now + timedelta(seconds=lease_seconds))
+    if not claimed:
+        return []
+    return list(EmailOutbox.objects.filter(pk__in=candidates, claimed_by=token).order_by('id'))
+
+
+def deliver_outbox(batch_size=50, max_attempts=5, backoff_seconds=60, lease_seconds=300):
+    """Send one batch of due EmailOutbox rows over a single SMTP connection.
+
+    The batch is claimed first (see ``claim_outbox``), so several
+    ``send_outbox`` workers can run at once without sending a message twice.
+    A failed message is retried with exponential backoff
+    (``backoff_seconds * 2 ** (attempts - 1)``) and marked ``failed`` after
+    ``max_attempts``. Returns ``(sent, failed)`` counts for the batch.
+    """
+    batch = claim_outbox(batch_size, lease_seconds)
+    if not batch:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection()
+    try:
+        connection.open()
+        for item in batch:
+            message = EmailMessage(item.subject, item.body, None, [item.recipient], connection=connection)
+            item.attempts += 1
+            try:
+                message.send()
+            except Exception as exc:
+                failed += 1
+                item.last_error = str(exc)
+                if item.attempts >= max_attempts:
+                    item.status = 'failed'
+                else:
+                    delay = backoff_seconds * 2 ** (item.attempts - 1)
+                    item.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+                logger.warning(f"Outbox email {item.pk} to {item.recipient} failed (attempt {item.attempts}): {exc}")
+            else:
+                sent += 1
+                item.status = 'sent'
+                item.sent_at = timezone.now()
+                item.last_error = ''
+    except Exception as exc:
+        # Could not reach the mail server at all: push the whole batch back
+        logger.warning(f"Outbox could not open mail connection: {exc}")
+        for item in batch:
+            item.next_attempt_at = timezone.now() + timedelta(seconds=backoff_seconds)
+            item.last_error = str(exc)
+    finally:
+        connection.close()
+        for item in batch:
+            item.claimed_by = ''
+        EmailOutbox.objects.bulk_update(
+            batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at', 'claimed_by']
+        )
+    return sent, failed
+
+
+@retry_on_lock
+def record_login_attendance(user_id, day, wifi_verified):
+    """Mark login attendance for the staff member linked to ``user_id``.
+
+    Runs as one INSERT ... SELECT: the staff lookup, the "already marked"
+    checks and the write happen in a single statement, and ON CONFLICT DO
+    NOTHING makes concurrent logins idempotent. A WiFi-verified row blocks
+    any further row for the day; otherwise one row per (date, wifi_verified)
+    is kept. Returns True when a row was inserted.
+    """
+    attendance_table = connection.ops.quote_name(Attendance._meta.db_table)
+    staff_table = connection.ops.quote_name(Staff._meta.db_table)
+    day = connection.ops.adapt_datefield_value(day)
+    now = connection.ops.adapt_timefield_value(datetime.datetime.now().time())
+    sql = f"""
+        INSERT INTO {attendance_table} (staff_id, date, time, wifi_verified)
+        SELECT s.staff_id, %s, %s, %s FROM {staff_table} s
+        WHERE s.user_id = %s AND NOT EXISTS (
+            SELECT 1 FROM {attendance_table} a
+            WHERE a.staff_id = s.staff_id AND a.date = %s
+              AND (a.wifi_verified OR a.wifi_verified = %s)
+        )
+        ON CONFLICT DO NOTHING
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [day, now, wifi_verified, user_id, day, wifi_verified])
+        return cursor.rowcount == 1
@@ -1,31 +1,74 @@
 # myapp/signals.py
-from django.db.models.signals import post_save
+from django.db.models import F, QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
-from django.core.mail import send_mail
 from .models import Student
 from django.contrib.auth.signals import user_logged_in
-from .models import Staff, Attendance
+from .models import (
+    Batch, Course, CourseTopic, EmailOutbox, Staff, StudentAttendance, StudentTopicProgress, student_rows_deleted,
+)
+from .caching import bump_progress_versions, invalidate_batch_overview, invalidate_course_tree
+from .services import record_login_attendance, seed_topic_progress
+from .summaries import ProgressDeltas, progress_values, rebuild_progress_summaries
 from django.utils import timezone
 from django.conf import settings
+import functools
+import ipaddress
+import logging
 import socket
 
+logger = logging.getLogger(__name__)
+
+_local_ip = None
+
+
 def get_local_ip():
-    """Get the device's current LAN/WiFi IP"""
+    """Get the device's current LAN/WiFi IP (resolved once, then cached)"""
+    global _local_ip
+    if _local_ip is not None:
+        return _local_ip
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     try:
         # Doesn’t need to succeed; just binds to a network interface
         s.connect(("8.8.8.8", 80))
-        ip = s.getsockname()[0]
+        _local_ip = s.getsockname()[0]
+        return _local_ip
     except Exception as e:
-        print(f"❌ Failed to fetch local IP: {e}")
-        ip = "127.0.0.1"
+        logger.warning(f"Failed to fetch local IP: {e}")
+        return "127.0.0.1"  # not cached, so the next login retries
     finally:
         s.close()
-    return ip
+
+
+@functools.lru_cache(maxsize=4)
+def _compile_allowed_networks(entries):
+    """Split ALLOWED_WIFI_IPS into a set of single addresses and a tuple of ranges"""
+    hosts, networks = set(), []
+    for entry in entries:
+        try:
+            network = ipaddress.ip_network(entry.strip(), strict=False)
+        except ValueError:
+            logger.warning(f"Ignoring invalid ALLOWED_WIFI_IPS entry: {entry!r}")
+            continue
+        if network.num_addresses == 1:
+            hosts.add(network.network_address)
+        else:
+            networks.append(network)
+    return frozenset(hosts), tuple(networks)
+
+
+def is_allowed_wifi_ip(ip):
+    """True if ip matches an address or CIDR range in settings.ALLOWED_WIFI_IPS"""
+    hosts, networks = _compile_allowed_networks(tuple(getattr(settings, "ALLOWED_WIFI_IPS", ())))
+    try:
+        address = ipaddress.ip_address(ip.strip())
+    except (AttributeError, ValueError):
+        return False
+    return address in hosts or any(address in network for network in networks)
 
 @receiver(post_save, sender=Student)#automatically calls when a new student is created
 def notify_staff_on_new_student(sender, instance, created, **kwargs):
-    if created:  # only when new student is added
+    if created and instance.staff_id:  # only when new student is added to a staff
         staff = instance.staff
         subject = f"New Student Assigned: {instance.student_name}"
         
@@ -56,63 +99,150 @@ Admin Team
         recipient = staff.staff_email or staff.user.email
 
         if recipient:
-            send_mail(
-                subject,
-                message,
-                None,  # DEFAULT_FROM_EMAIL
-                [recipient],
-                fail_silently=False,
-            )
-            print(f"✅ Notification email sent to {recipient} for new student {instance.student_name}.")
+            # Queued in the save's transaction; delivered by the send_outbox command
+            EmailOutbox.objects.create(subject=subject, body=message, recipient=recipient)
+            logger.info(f"Notification email queued for {recipient} for new student {instance.student_name}.")
         else:
-            print(f"⚠️ No email found for staff {staff.staff_name}.")
+            logger.warning(f"No email found for staff {staff.staff_name}.")
+
+
+@receiver(post_save, sender=Student)
+def seed_progress_on_enrollment(sender, instance, created, **kwargs):
+    """Create progress rows for every topic when a student joins a course."""
+    loaded_course_id = getattr(instance, '_loaded_course_id', instance.course_id)
+    if created or instance.course_id != loaded_course_id:
+        seed_topic_progress(students=[instance])
+        if not created:
+            # only the new course's rows count towards the summary
+            rebuild_progress_summaries([instance])
+        instance._loaded_course_id = instance.course_id
+
+
+@receiver(post_save, sender=CourseTopic)
+def seed_progress_on_new_topic(sender, instance, created, **kwargs):
+    """Create progress rows for every enrolled student when a topic is added."""
+    if created:
+        seed_topic_progress(topics=[instance])
+
+
+@receiver(post_save, sender=StudentTopicProgress)
+def update_summary_on_progress_save(sender, instance, created, **kwargs):
+    """Apply the saved row's change to its student's StudentProgressSummary."""
+    new = progress_values(instance)
+    if created or hasattr(instance, '_loaded_progress'):
+        deltas = ProgressDeltas()
+        deltas.change(instance.student_id, None if created else instance._loaded_progress, new)
+        deltas.apply()
+    else:
+        rebuild_progress_summaries([instance.student_id])
+    instance._loaded_progress = new
+
+
+@receiver(student_rows_deleted, sender=StudentTopicProgress)
+def update_summary_on_progress_delete(sender, student_ids, instance=None, **kwargs):
+    """Direct deletes of progress rows; cascades are handled by the topic
+    receivers below, and a deleted student takes its summary with it.
+    """
+    if instance is not None:
+        deltas = ProgressDeltas()
+        deltas.change(instance.student_id, getattr(instance, '_loaded_progress', progress_values(instance)), None)
+        deltas.apply(create_missing=False)
+    else:
+        rebuild_progress_summaries(student_ids)
+    bump_progress_versions(student_ids=student_ids)
+
+
+@receiver(post_save, sender=StudentTopicProgress)
+def refresh_student_progress_table(sender, instance, **kwargs):
+    bump_progress_versions(student_ids=[instance.student_id])
+
+
+def _deletes_topics(origin):
+    """True for a CourseTopic delete (one topic or a queryset), not a Course delete."""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model is CourseTopic
+
+
+@receiver(pre_delete, sender=CourseTopic)
+def collect_topic_summary_students(sender, instance, origin=None, **kwargs):
+    """Before topics go, note once per delete call which students' summaries
+    count their progress rows; those rows then go in one fast DELETE.
+
+    Deleting a Course also deletes its students (and their summaries), so
+    there is nothing to collect then.
+    """
+    if _deletes_topics(origin) and not hasattr(origin, '_summary_student_ids'):
+        topics = origin if isinstance(origin, QuerySet) else [origin]
+        origin._summary_student_ids = set(
+            StudentTopicProgress.objects.filter(topic__in=topics, student__course_id=F('topic__course_id'))
+            .values_list('student_id', flat=True).distinct()
+        )
+
+
+@receiver(post_delete, sender=CourseTopic)
+def rebuild_topic_summaries(sender, instance, origin=None, **kwargs):
+    student_ids = getattr(origin, '__dict__', {}).pop('_summary_student_ids', None)
+    if student_ids:
+        rebuild_progress_summaries(student_ids)
+
+
+@receiver([post_save, post_delete], sender=CourseTopic)
+def refresh_course_progress_tables(sender, instance, **kwargs):
+    bump_progress_versions(course_ids=[instance.course_id])
+
+
+@receiver([post_save, post_delete], sender=Student)
+def refresh_student_batch_overview(sender, instance, **kwargs):
+    """Student counts per batch changed (new student, batch or staff moved, deletion)."""
+    invalidate_batch_overview(staff_ids={instance.staff_id, getattr(instance, '_loaded_staff_id', None)})
+    instance._loaded_staff_id = instance.staff_id
+
+
+@receiver(post_save, sender=StudentAttendance)
+def refresh_attendance_batch_overview(sender, instance, **kwargs):
+    invalidate_batch_overview(student_ids=[instance.student_id])
+
+
+@receiver(student_rows_deleted, sender=StudentAttendance)
+def refresh_overview_on_attendance_delete(sender, student_ids, **kwargs):
+    """Direct deletes only; a deleted student's overview is dropped by the Student receiver."""
+    invalidate_batch_overview(student_ids=student_ids)
+
+
+@receiver([post_save, post_delete], sender=Batch)
+def refresh_batch_overview(sender, instance, **kwargs):
+    invalidate_batch_overview(staff_ids=[instance.staff_id])
+
+
+@receiver([post_save, post_delete], sender=Course)
+@receiver([post_save, post_delete], sender=Staff)
+@receiver([post_save, post_delete], sender=Batch)
+@receiver(m2m_changed, sender=Staff.courses.through)
+def refresh_course_tree(sender, **kwargs):
+    """Drop the cached course -> staff -> batch tree used by the Student admin."""
+    invalidate_course_tree()
 
 
 @receiver(user_logged_in)
 def mark_attendance(sender, request, user, **kwargs):
-    try:
-        staff = Staff.objects.get(user=user)
-    except Staff.DoesNotExist:
-        return  # only apply to staff
-
     today = timezone.now().date()
     ip = get_client_ip(request)
-    wifi_verified = ip in getattr(settings, "ALLOWED_WIFI_IPS", [])
+    wifi_verified = is_allowed_wifi_ip(ip)
 
-    # Case 1: If verified attendance already exists → do nothing
-    if Attendance.objects.filter(staff=staff, date=today, wifi_verified=True).exists():
-        print(f"⚠️ Attendance already marked with WiFi verified for {staff.staff_name} on {today}")
-        return
-
-    # Case 2: If logging in with WiFi verified → create new record
-    if wifi_verified:
-        Attendance.objects.create(staff=staff, date=today, wifi_verified=True)
-        print(f"✅ Attendance (WiFi Verified) marked for {staff.staff_name} on {today} {ip}")
+    # One idempotent INSERT ... SELECT; non-staff users simply match no row
+    if record_login_attendance(user.pk, today, wifi_verified):
+        logger.info(f"Attendance ({'WiFi Verified' if wifi_verified else 'Unverified WiFi'}) marked for user {user.pk} on {today} {ip}")
     else:
-        # Case 3: Allow multiple unverified? → Only one unverified per day
-        if not Attendance.objects.filter(staff=staff, date=today, wifi_verified=False).exists():
-            Attendance.objects.create(staff=staff, date=today, wifi_verified=False)
-            print(f"✅ Attendance (Unverified WiFi) marked for {staff.staff_name} on {today} {ip}")
-        else:
-            print(f"⚠️ Attendance (Unverified) already exists for {staff.staff_name} on {today} {ip}")
-
-    print(f"   🌐 Final IP used: {ip}")
-    print(f"   📶 WiFi Verified: {wifi_verified}")
+        logger.debug(f"No attendance recorded for user {user.pk} on {today} {ip} (not staff or already marked)")
 
 def get_client_ip(request):
     """Extract client IP from request headers"""
     x_forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
     if x_forwarded_for:
-        ip = x_forwarded_for.split(",")[0]
-        print(f"🔎 Found IP from X-Forwarded-For: {ip}")
+        ip = x_forwarded_for.split(",")[0].strip()
     else:
         ip = request.META.get("REMOTE_ADDR")
-        print(f"🔎 Found IP from REMOTE_ADDR: {ip}")
     # If running locally (127.0.0.1 / ::1), fetch actual WiFi IP
     if ip in ("127.0.0.1", "::1"):
-        wifi_ip = get_local_ip()
-        print(f"💡 Localhost detected, replacing with WiFi IP: {wifi_ip}")
-        return wifi_ip
-    print(f"🌐 Detected client IP in Django: {ip}")
+        return get_local_ip()
     return ip
-
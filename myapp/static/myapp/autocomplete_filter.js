@@ -0,0 +1,19 @@
+'use strict';
+{
+    const $ = django.jQuery;
+
+    // Reload the changelist when an autocomplete sidebar filter changes
+    $(function() {
+        $('select.autocomplete-list-filter').on('change', function() {
+            const params = new URLSearchParams(window.location.search);
+            const name = this.dataset.parameterName;
+            if (this.value) {
+                params.set(name, this.value);
+            } else {
+                params.delete(name);
+            }
+            params.delete('p');
+            window.location.search = params.toString();
+        });
+    });
+}
@@ -0,0 +1,139 @@
+from collections import defaultdict
+
+from django.db.models import Count, F, Max, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .caching import invalidate_batch_overview
+from .models import Student, StudentProgressSummary, StudentTopicProgress
+
+COUNTERS = ['topics_total', 'topics_started', 'topics_completed', 'marks_total', 'marks_count']
+SUMMARY_FIELDS = COUNTERS + ['last_activity']
+
+
+def progress_values(progress):
+    """The fields of a StudentTopicProgress row that feed its student's summary."""
+    return (progress.start_date, progress.end_date, progress.marks)
+
+
+def _contribution(start_date, end_date, marks):
+    return (1, int(start_date is not None), int(end_date is not None), marks or 0, int(marks is not None))
+
+
+def _latest(values):
+    dates = [day for day in (values or ())[:2] if day is not None]
+    return max(dates) if dates else None
+
+
+def _progress_totals(student_ids):
+    """Aggregates per student over the rows of the student's current course."""
+    totals = {}
+    for row in StudentTopicProgress.objects.filter(
+        student_id__in=student_ids, topic__course_id=F('student__course_id'),
+    ).values('student_id').annotate(
+        topics_total=Count('pk'),
+        topics_started=Count('start_date'),
+        topics_completed=Count('end_date'),
+        marks_total=Coalesce(Sum('marks'), 0),
+        marks_count=Count('marks'),
+        last_start=Max('start_date'),
+        last_end=Max('end_date'),
+    ):
+        row['last_activity'] = _latest((row.pop('last_start'), row.pop('last_end')))
+        totals[row.pop('student_id')] = row
+    return totals
+
+
+class ProgressDeltas:
+    """Collects summary changes per student and applies them with few UPDATEs.
+
+    Students whose change is identical (e.g. one new topic each) share a single
+    ``UPDATE ... SET col = col + n WHERE student_id IN (...)``. A delta can only
+    move ``last_activity`` forward, so students whose latest date was removed
+    get it recomputed.
+    """
+
+    def __init__(self):
+        self.counters = defaultdict(lambda: [0] * len(COUNTERS))
+        self.activity = {}
+        self.stale_activity = set()
+
+    def change(self, student_id, old, new):
+        """A row of ``student_id`` went from ``old`` to ``new`` values; None means absent."""
+        counters = self.counters[student_id]
+        for values, sign in ((old, -1), (new, 1)):
+            if values is None:
+                continue
+            for i, amount in enumerate(_contribution(*values)):
+                counters[i] += sign * amount
+        old_latest, new_latest = _latest(old), _latest(new)
+        if new_latest:
+            self.activity[student_id] = max(new_latest, self.activity.get(student_id, new_latest))
+        if old_latest and (new_latest is None or new_latest < old_latest):
+            self.stale_activity.add(student_id)
+
+    def apply(self, create_missing=True, staff_ids=None):
+        """Write the collected changes; ``create_missing`` adds empty summaries first.
+
+        The batch overview of the affected students' staff is invalidated;
+        pass ``staff_ids`` when the caller already knows them to save the lookup.
+        """
+        if create_missing and self.counters:
+            StudentProgressSummary.objects.bulk_create(
+                [StudentProgressSummary(student_id=student_id) for student_id in self.counters],
+                ignore_conflicts=True,
+            )
+        groups = defaultdict(list)
+        for student_id, counters in self.counters.items():
+            activity = self.activity.get(student_id)
+            if any(counters) or activity:
+                groups[tuple(counters), activity].append(student_id)
+        for (counters, activity), student_ids in groups.items():
+            changes = {name: F(name) + amount for name, amount in zip(COUNTERS, counters) if amount}
+            if activity:
+                changes['last_activity'] = Greatest(Coalesce('last_activity', Value(activity)), Value(activity))
+            StudentProgressSummary.objects.filter(student_id__in=student_ids).update(**changes)
+        if groups or self.stale_activity:
+            if staff_ids is None:
+                invalidate_batch_overview(student_ids=[*self.counters, *self.stale_activity])
+            else:
+                invalidate_batch_overview(staff_ids=staff_ids)
+        if self.stale_activity:
+            # UPDATE only: never recreate the summary of a student being deleted
+            totals = _progress_totals(self.stale_activity)
+            for student_id in self.stale_activity:
+                StudentProgressSummary.objects.filter(student_id=student_id).update(
+                    last_activity=totals.get(student_id, {}).get('last_activity')
+                )
+        self.counters.clear()
+        self.activity.clear()
+        self.stale_activity.clear()
+
+
+def rebuild_progress_summaries(students=None, chunk_size=1000):
+    """Recompute summaries from StudentTopicProgress with one aggregate query
+    and one upsert per ``chunk_size`` students.
+
+    Only progress rows of the student's current course are counted. Limit the
+    work to ``students`` (instances or ids); with None every student is rebuilt.
+    Returns the number of summaries written.
+    """
+    student_qs = Student.objects.order_by('pk')
+    if students is not None:
+        student_qs = student_qs.filter(pk__in=[getattr(s, 'pk', s) for s in students])
+    student_ids, staff_ids = [], set()
+    for student_id, staff_id in student_qs.values_list('pk', 'staff_id'):
+        student_ids.append(student_id)
+        staff_ids.add(staff_id)
+
+    for start in range(0, len(student_ids), chunk_size):
+        chunk = student_ids[start:start + chunk_size]
+        totals = _progress_totals(chunk)
+        summaries = [
+            StudentProgressSummary(student_id=student_id, **totals.get(student_id, {}))
+            for student_id in chunk
+        ]
+        StudentProgressSummary.objects.bulk_create(
+            summaries, update_conflicts=True, unique_fields=['student'], update_fields=SUMMARY_FIELDS,
+        )
+    invalidate_batch_overview(staff_ids=staff_ids)
+    return len(student_ids)
@@ -0,0 +1,156 @@
+import random
+from datetime import date, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .caching import invalidate_course_tree
+from .models import (
+    Attendance, Batch, Course, CourseTopic, Staff, Student, StudentAttendance, StudentTopicProgress,
+)
+from .summaries import rebuild_progress_summaries
+
+# Named dataset sizes used by the generate_data and benchmark_views commands
+SIZES = {
+    'small': dict(staff=2, courses=2, batches_per_staff=2, students_per_batch=10,
+                  modules_per_course=2, topics_per_module=5, months=1),
+    'medium': dict(staff=10, courses=5, batches_per_staff=3, students_per_batch=25,
+                   modules_per_course=4, topics_per_module=8, months=3),
+    'large': dict(staff=40, courses=10, batches_per_staff=4, students_per_batch=40,
+                  modules_per_course=6, topics_per_module=10, months=6),
+}
+
+# Commands that run against synthetic data swap this in for CACHES, so the
+# cache.clear() they need never wipes the site's cache (or cached sessions)
+SCRATCH_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'synthetic-scratch',
+    },
+}
+
+BATCH_SLOTS = [(time(hour), time(hour + 1)) for hour in range(7, 20)]
+
+
+def _class_days(months, today):
+    """Every Monday-Saturday of the last ``months`` months, oldest first."""
+    first = today - timedelta(days=30 * months)
+    return [first + timedelta(days=n) for n in range((today - first).days + 1)
+            if (first + timedelta(days=n)).weekday() != 6]
+
+
+def generate_dataset(staff=2, courses=2, batches_per_staff=2, students_per_batch=10,
+                     modules_per_course=2, topics_per_module=5, months=1,
+                     tag='synth', seed=0, batch_size=2000):
+    """Insert a synthetic school: staff, courses, batches, students, topics,
+    ``months`` of daily attendance and partially completed progress.
+
+    Everything goes in with bulk INSERTs inside one transaction; model signals
+    do not fire, so progress summaries are rebuilt and the course tree cache
+    is invalidated at the end. Names are prefixed with ``tag`` so several
+    datasets can coexist. The output is deterministic for a given ``seed``.
+    Returns a dict of row counts.
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    password = make_password(None)
+
+    with transaction.atomic():
+        users = User.objects.bulk_create(
+            User(username=f'{tag}-staff-{i}', password=password) for i in range(staff)
+        )
+        staff_rows = Staff.objects.bulk_create(
+            Staff(user=user, staff_name=f'{tag.title()} Staff {i}', staff_email=f'{tag}-staff-{i}@example.com')
+            for i, user in enumerate(users)
+        )
+        course_rows = Course.objects.bulk_create(
+            Course(course_name=f'{tag.title()} Course {i}') for i in range(courses)
+        )
+        # every staff member teaches one or two courses
+        teaches = {
+            member.pk: rng.sample(course_rows, min(len(course_rows), rng.randint(1, 2)))
+            for member in staff_rows
+        }
+        Staff.courses.through.objects.bulk_create(
+            Staff.courses.through(staff_id=staff_id, course_id=course.pk)
+            for staff_id, taught in teaches.items() for course in taught
+        )
+        batch_rows = Batch.objects.bulk_create(
+            Batch(staff=member, batch_name=f'Batch {n}',
+                  start_time=BATCH_SLOTS[n % len(BATCH_SLOTS)][0],
+                  end_time=BATCH_SLOTS[n % len(BATCH_SLOTS)][1])
+            for member in staff_rows for n in range(batches_per_staff)
+        )
+        topics_by_course = {}
+        for topic in CourseTopic.objects.bulk_create(
+            (CourseTopic(course=course, module_name=f'Module {m}', topic_name=f'Topic {m}.{t}')
+             for course in course_rows
+             for m in range(modules_per_course) for t in range(topics_per_module)),
+            batch_size=batch_size,
+        ):
+            topics_by_course.setdefault(topic.course_id, []).append(topic)
+
+        students = []
+        for batch in batch_rows:
+            for n in range(students_per_batch):
+                number = len(students)
+                students.append(Student(
+                    student_name=f'{tag.title()} Student {number}',
+                    student_email=f'{tag}-student-{number}@example.com',
+                    join_date=today - timedelta(days=30 * months),
+                    course=rng.choice(teaches[batch.staff_id]),
+                    staff_id=batch.staff_id,
+                    batch=batch,
+                    mode=rng.random() < 0.8,
+                ))
+        students = Student.objects.bulk_create(students, batch_size=batch_size)
+
+        days = _class_days(months, today)
+        StudentAttendance.objects.bulk_create(
+            (StudentAttendance(student=student, date=day, status=rng.random() < 0.85)
+             for student in students for day in days),
+            batch_size=batch_size,
+        )
+        Attendance.objects.bulk_create(
+            (Attendance(staff=member, date=day, wifi_verified=True) for member in staff_rows for day in days),
+            batch_size=batch_size,
+        )
+
+        staff_names = {member.pk: member.staff_name for member in staff_rows}
+        progress = []
+        for student in students:
+            topics = topics_by_course.get(student.course_id, [])
+            done = rng.randint(0, len(topics))
+            start = student.join_date
+            for index, topic in enumerate(topics):
+                row = StudentTopicProgress(student=student, topic=topic)
+                if index < done:
+                    row.start_date = start
+                    row.end_date = start = start + timedelta(days=rng.randint(1, 4))
+                    row.marks = rng.randint(40, 100)
+                    row.sign = staff_names[student.staff_id]
+                progress.append(row)
+        StudentTopicProgress.objects.bulk_create(progress, batch_size=batch_size)
+        rebuild_progress_summaries(students)
+
+    invalidate_course_tree()
+    return {
+        'staff': len(staff_rows),
+        'courses': len(course_rows),
+        'batches': len(batch_rows),
+        'topics': sum(len(topics) for topics in topics_by_course.values()),
+        'students': len(students),
+        'student_attendance': len(students) * len(days),
+        'progress': len(progress),
+    }
+
+
+def delete_dataset(tag='synth'):
+    """Delete what generate_dataset(tag=tag) created (students go with their
+    courses). Returns the number of rows deleted, cascades included.
+    """
+    deleted = User.objects.filter(username__startswith=f'{tag}-staff-').delete()[0]
+    deleted += Course.objects.filter(course_name__startswith=f'{tag.title()} Course ').delete()[0]
+    invalidate_course_tree()
+    return deleted
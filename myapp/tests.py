@@ -1,3 +1,1561 @@
-from django.test import TestCase
+from datetime import date, time
+import json
+import os
+import random
+import tempfile
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, transaction
+from django.db.models import QuerySet
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.timezone import localdate
+
+from . import async_views, caching, services
+from .imports import import_curriculum
+from .middleware import QueryInstrumentationMiddleware
+from .models import (
+    Attendance, Batch, Course, CourseTopic, EmailOutbox, Staff, Student, StudentAttendance,
+    StudentProgressSummary, StudentTopicProgress, SyncOperation,
+)
+from .services import deliver_outbox, seed_topic_progress, update_topic_progress
+from .signals import is_allowed_wifi_ip
+from .summaries import SUMMARY_FIELDS, rebuild_progress_summaries
+from .urls import root_urlconf
+
+
+def make_staff(username="staff1", course_name="Python"):
+    user = User.objects.create_user(username=username, password="Secret-pass-123")
+    staff = Staff.objects.create(
+        user=user, staff_name=username.title(), staff_email=f"{username}@example.com"
+    )
+    course, _ = Course.objects.get_or_create(course_name=course_name)
+    staff.courses.add(course)
+    batch = Batch.objects.create(
+        staff=staff, batch_name="Morning", start_time=time(9), end_time=time(11)
+    )
+    return user, staff, course, batch
+
+
+def make_students(staff, course, batch, count, start=0):
+    return Student.objects.bulk_create(
+        Student(
+            student_name=f"Student {i}",
+            join_date=date(2025, 1, 1),
+            course=course,
+            staff=staff,
+            batch=batch,
+            student_email=f"{staff.pk}-student{i}@example.com",
+        )
+        for i in range(start, start + count)
+    )
+
+
+class MarkStudentAttendanceTests(TestCase):
+    def setUp(self):
+        self.user, self.staff, self.course, self.batch = make_staff()
+        self.students = make_students(self.staff, self.course, self.batch, 5)
+        self.client.force_login(self.user)
+        self.url = reverse('student_attendance', args=[self.batch.batch_id])
+
+    def post_statuses(self, statuses, day="2025-01-10"):
+        data = {"date": day}
+        for student, status in zip(self.students, statuses):
+            if status is not None:
+                data[f"status_{student.student_id}"] = status
+        return self.client.post(self.url, data)
+
+    def test_post_creates_rows(self):
+        self.post_statuses(["present", "absent", "present", None, "absent"])
+        rows = dict(StudentAttendance.objects.values_list('student_id', 'status'))
+        self.assertEqual(len(rows), 4)
+        self.assertIs(rows[self.students[0].student_id], True)
+        self.assertIs(rows[self.students[1].student_id], False)
+        self.assertNotIn(self.students[3].student_id, rows)
+
+    def test_post_query_count_does_not_grow_with_batch(self):
+        with CaptureQueriesContext(connection) as one:
+            self.post_statuses(["present"], day="2025-01-01")
+        with CaptureQueriesContext(connection) as five:
+            self.post_statuses(["present"] * 5, day="2025-01-02")
+        self.assertEqual(len(one.captured_queries), len(five.captured_queries))
+
+    def test_resubmit_updates_only_changed_rows(self):
+        self.post_statuses(["present"] * 5)
+        first = {a.student_id: a.pk for a in StudentAttendance.objects.all()}
+        self.post_statuses(["present", "absent", "present", "present", "present"])
+        rows = {a.student_id: a for a in StudentAttendance.objects.all()}
+        self.assertEqual({sid: a.pk for sid, a in rows.items()}, first)
+        self.assertIs(rows[self.students[1].student_id].status, False)
+        self.assertEqual(sum(a.status for a in rows.values()), 4)
+
+
+class ProgressSeedingTests(TestCase):
+    def setUp(self):
+        self.user, self.staff, self.course, self.batch = make_staff()
+        self.topics = [
+            CourseTopic.objects.create(course=self.course, module_name="Basics", topic_name=f"Topic {i}")
+            for i in range(3)
+        ]
+
+    def test_new_student_gets_progress_rows(self):
+        student = Student.objects.create(
+            student_name="New", join_date=date(2025, 1, 1), course=self.course,
+            staff=self.staff, batch=self.batch, student_email="new@example.com",
+        )
+        self.assertEqual(student.progress.count(), 3)
+
+    def test_new_topic_seeds_enrolled_students(self):
+        students = make_students(self.staff, self.course, self.batch, 4)
+        CourseTopic.objects.create(course=self.course, module_name="Basics", topic_name="Extra")
+        self.assertEqual(StudentTopicProgress.objects.filter(topic__topic_name="Extra").count(), 4)
+        self.assertEqual(StudentTopicProgress.objects.filter(student=students[0]).count(), 1)
+
+    def test_course_change_seeds_new_course(self):
+        other = Course.objects.create(course_name="Java")
+        CourseTopic.objects.create(course=other, module_name="Intro", topic_name="Jvm")
+        student = make_students(self.staff, self.course, self.batch, 1)[0]
+        student = Student.objects.get(pk=student.pk)
+        student.course = other
+        student.save()
+        self.assertEqual(student.progress.filter(topic__course=other).count(), 1)
+
+    def test_enrollment_reads_only_its_course_topics(self):
+        other = Course.objects.create(course_name="Java")
+        CourseTopic.objects.bulk_create(
+            CourseTopic(course=other, module_name="Intro", topic_name=f"Jvm {i}") for i in range(20)
+        )
+        student = make_students(self.staff, self.course, self.batch, 1)[0]
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(seed_topic_progress(students=[student]), 3)
+        [topic_query] = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT "myapp_coursetopic"')]
+        self.assertIn('"myapp_coursetopic"."course_id" IN (SELECT', topic_query)
+
+    def test_seed_progress_command_backfills_once(self):
+        make_students(self.staff, self.course, self.batch, 5)
+        call_command('seed_progress', stdout=StringIO())
+        call_command('seed_progress', stdout=StringIO())
+        self.assertEqual(StudentTopicProgress.objects.count(), 15)
+
+    def test_add_progress_get_only_reads(self):
+        student = make_students(self.staff, self.course, self.batch, 1)[0]
+        call_command('seed_progress', stdout=StringIO())
+        self.client.force_login(self.user)
+        url = reverse('add_progress', args=[student.pk, self.batch.pk])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['topic_form_pairs']), 3)
+        writes = [q for q in ctx.captured_queries if q['sql'].startswith(('INSERT', 'UPDATE'))]
+        self.assertEqual(writes, [])
+
+
+class AddProgressSaveTests(TestCase):
+    def setUp(self):
+        self.user, self.staff, self.course, self.batch = make_staff()
+        for i in range(4):
+            CourseTopic.objects.create(course=self.course, module_name="Basics", topic_name=f"Topic {i}")
+        self.student = make_students(self.staff, self.course, self.batch, 1)[0]
+        call_command('seed_progress', stdout=StringIO())
+        self.client.force_login(self.user)
+        self.url = reverse('add_progress', args=[self.student.pk, self.batch.pk])
+
+    def formset_data(self, edits):
+        rows = list(StudentTopicProgress.objects.filter(student=self.student).order_by('topic_id'))
+        data = {
+            'form-TOTAL_FORMS': len(rows),
+            'form-INITIAL_FORMS': len(rows),
+            'form-MIN_NUM_FORMS': 0,
+            'form-MAX_NUM_FORMS': 1000,
+        }
+        for i, row in enumerate(rows):
+            data[f'form-{i}-id'] = row.pk
+            data[f'form-{i}-start_date'] = row.start_date or ''
+            data[f'form-{i}-end_date'] = row.end_date or ''
+            data[f'form-{i}-marks'] = '' if row.marks is None else row.marks
+            data.update({f'form-{i}-{k}': v for k, v in edits.get(i, {}).items()})
+        return data
+
+    def test_only_changed_rows_are_signed_and_written(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url, self.formset_data({1: {'marks': 80}}))
+        self.assertEqual(response.status_code, 302)
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "myapp_studenttopicprogress"')]
+        self.assertEqual(len(updates), 1)
+        signed = StudentTopicProgress.objects.exclude(sign='')
+        self.assertEqual([(p.marks, p.sign) for p in signed], [(80, self.staff.staff_name)])
+
+    def test_unchanged_formset_writes_nothing(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(self.url, self.formset_data({}))
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "myapp_studenttopicprogress"')])
+
+
+class ConstantQueryViewTests(TestCase):
+    """Staff pages must not issue a query per student."""
+
+    def setUp(self):
+        self.user, self.staff, self.course, self.batch = make_staff()
+        self.client.force_login(self.user)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def assert_constant(self, url_for):
+        students = make_students(self.staff, self.course, self.batch, 10)
+        small = self.count_queries(url_for(students[0]))
+        make_students(self.staff, self.course, self.batch, 990, start=10)
+        self.assertEqual(Student.objects.filter(batch=self.batch).count(), 1000)
+        large = self.count_queries(url_for(students[0]))
+        self.assertEqual(small, large)
+
+    def test_student_list(self):
+        self.assert_constant(lambda s: reverse('student_list', args=[self.batch.pk]))
+
+    def test_student_attendance(self):
+        self.assert_constant(lambda s: reverse('student_attendance', args=[self.batch.pk]))
+
+    def test_student_detail(self):
+        self.assert_constant(lambda s: reverse('student_detail', args=[s.pk, self.batch.pk]))
+
+    def test_get_batches(self):
+        self.assert_constant(lambda s: reverse('get_batches'))
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionError("SMTP server unavailable")
+
+
+class ConcurrentWorkerEmailBackend(BaseEmailBackend):
+    """Runs a second outbox delivery while the first one is mid-batch."""
+    second_run = None
+
+    def send_messages(self, email_messages):
+        if ConcurrentWorkerEmailBackend.second_run is None:
+            ConcurrentWorkerEmailBackend.second_run = deliver_outbox()
+        mail.outbox.extend(email_messages)
+        return len(email_messages)
+
+
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        self.user, self.staff, self.course, self.batch = make_staff()
+
+    def create_student(self, email="new@example.com"):
+        return Student.objects.create(
+            student_name="New", join_date=date(2025, 1, 1), course=self.course,
+            staff=self.staff, batch=self.batch, student_email=email,
+        )
+
+    def test_new_student_queues_email_without_sending(self):
+        self.create_student()
+        self.assertEqual(len(mail.outbox), 0)
+        queued = EmailOutbox.objects.get()
+        self.assertEqual(queued.recipient, self.staff.staff_email)
+        self.assertEqual(queued.status, 'pending')
+
+    def test_command_drains_outbox(self):
+        for i in range(3):
+            self.create_student(f"s{i}@example.com")
+        call_command('send_outbox', batch_size=2, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(EmailOutbox.objects.filter(status='sent').count(), 3)
+
+    @override_settings(EMAIL_BACKEND='myapp.tests.FailingEmailBackend')
+    def test_failures_back_off_then_give_up(self):
+        self.create_student()
+        self.assertEqual(deliver_outbox(max_attempts=2, backoff_seconds=30), (0, 1))
+        item = EmailOutbox.objects.get()
+        self.assertEqual((item.status, item.attempts), ('pending', 1))
+        self.assertGreater(item.next_attempt_at, timezone.now())
+        # not due yet, so nothing is picked up
+        self.assertEqual(deliver_outbox(max_attempts=2), (0, 0))
+        EmailOutbox.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(deliver_outbox(max_attempts=2), (0, 1))
+        self.assertEqual(EmailOutbox.objects.get().status, 'failed')
+
+    @override_settings(EMAIL_BACKEND='myapp.tests.ConcurrentWorkerEmailBackend')
+    def test_concurrent_deliveries_send_each_row_once(self):
+        for i in range(3):
+            self.create_student(f"s{i}@example.com")
+        ConcurrentWorkerEmailBackend.second_run = None
+        self.assertEqual(deliver_outbox(), (3, 0))
+        # the second worker found every row claimed by the first
+        self.assertEqual(ConcurrentWorkerEmailBackend.second_run, (0, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(
+            list(EmailOutbox.objects.values_list('status', 'attempts', 'claimed_by').distinct()),
+            [('sent', 1, '')],
+        )
+
+    def test_claim_skips_rows_taken_between_select_and_update(self):
+        for i in range(3):
+            self.create_student(f"s{i}@example.com")
+        other_worker = []
+        original_update = QuerySet.update
+
+        def racing_update(queryset, **kwargs):
+            # another worker claims two of our candidates just before our UPDATE runs
+            if not other_worker:
+                other_worker.append(None)
+                other_worker[0] = services.claim_outbox(batch_size=2)
+            return original_update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', autospec=True, side_effect=racing_update):
+            ours = services.claim_outbox(batch_size=3)
+        theirs = other_worker[0]
+        self.assertEqual((len(ours), len(theirs)), (1, 2))
+        self.assertFalse({item.pk for item in ours} & {item.pk for item in theirs})
+        self.assertEqual(deliver_outbox(), (0, 0))
+
+
+@override_settings(ALLOWED_WIFI_IPS=["192.168.1.21", "10.20.0.0/16", "2401:4900::/32"])
+class LoginAttendanceTests(TestCase):
+    def setUp(self):
+        self.user, self.staff, self.course, self.batch = make_staff()
+
+    def login_from(self, ip, user="staff1"):
+        self.client.post(reverse('staff_login'), {'username': user, 'password': "Secret-pass-123"}, REMOTE_ADDR=ip)
+        self.client.logout()
+
+    def rows(self):
+        return list(Attendance.objects.order_by('wifi_verified').values_list('wifi_verified', flat=True))
+
+    def test_login_attendance_is_one_insert(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.login_from("10.20.3.4")
+        self.assertEqual(len([q for q in ctx.captured_queries if 'myapp_attendance' in q['sql']]), 1)
+        self.assertEqual(self.rows(), [True])
+
+    def test_unverified_then_verified(self):
+        self.login_from("172.16.0.5")
+        self.login_from("172.16.0.5")
+        self.assertEqual(self.rows(), [False])
+        self.login_from("192.168.1.21")
+        self.login_from("172.16.0.5")
+        self.assertEqual(self.rows(), [False, True])
+
+    def test_verified_blocks_later_unverified(self):
+        self.login_from("192.168.1.21")
+        self.login_from("172.16.0.5")
+        self.assertEqual(self.rows(), [True])
+
+    def test_non_staff_login_records_nothing(self):
+        User.objects.create_user(username="plain", password="Secret-pass-123")
+        self.login_from("192.168.1.21", user="plain")
+        self.assertEqual(self.rows(), [])
+
+    def test_allowed_wifi_matching(self):
+        self.assertTrue(is_allowed_wifi_ip("192.168.1.21"))
+        self.assertTrue(is_allowed_wifi_ip("10.20.255.1"))
+        self.assertTrue(is_allowed_wifi_ip("2401:4900:88e4::1"))
+        self.assertFalse(is_allowed_wifi_ip("192.168.1.22"))
+        self.assertFalse(is_allowed_wifi_ip("not-an-ip"))
+        self.assertFalse(is_allowed_wifi_ip(None))
+
+
+class ProgressAdminChangelistTests(TestCase):
+    def setUp(self):
+        self.user, self.staff, self.course, self.batch = make_staff()
+        admin_user = User.objects.create_superuser("admin", "admin@example.com", "Secret-pass-123")
+        self.client.force_login(admin_user)
+        self.url = reverse('admin:myapp_studenttopicprogress_changelist')
+        for i in range(5):
+            CourseTopic.objects.create(course=self.course, module_name="Basics", topic_name=f"Topic {i}")
+
+    def changelist_queries(self, **params):
+        cache.clear()  # measure with a cold row-count cache
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_is_fixed(self):
+        make_students(self.staff, self.course, self.batch, 2)
+        call_command('seed_progress', stdout=StringIO())
+        small = self.changelist_queries()
+        for i in range(5, 50):
+            CourseTopic.objects.create(course=self.course, module_name="Basics", topic_name=f"Topic {i}")
+        self.assertEqual(StudentTopicProgress.objects.count(), 100)
+        self.assertEqual(self.changelist_queries(), small)
+
+    def test_sidebar_does_not_grow_with_students(self):
+        make_students(self.staff, self.course, self.batch, 2)
+        call_command('seed_progress', stdout=StringIO())
+        small = self.changelist_queries()
+        make_students(self.staff, self.course, self.batch, 40, start=2)
+        call_command('seed_progress', stdout=StringIO())
+        self.assertEqual(self.changelist_queries(), small)
+
+    def test_student_filter_selection(self):
+        students = make_students(self.staff, self.course, self.batch, 3)
+        call_command('seed_progress', stdout=StringIO())
+        response = self.client.get(self.url, {'student': students[1].pk})
+        self.assertEqual(response.context['cl'].result_count, 5)
+        self.assertContains(response, f'<option value="{students[1].pk}" selected>{students[1]}</option>', html=True)
+
+    def test_student_autocomplete_endpoint_is_paginated(self):
+        make_students(self.staff, self.course, self.batch, 45)
+        params = {
+            'app_label': 'myapp', 'model_name': 'studenttopicprogress',
+            'field_name': 'student', 'term': 'Student', 'page': 1,
+        }
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(reverse('admin:autocomplete'), params).json()
+        self.assertEqual(len(data['results']), 20)
+        self.assertTrue(data['pagination']['more'])
+        self.assertLess(len(ctx.captured_queries), 8)
+        data = self.client.get(reverse('admin:autocomplete'), dict(params, page=3)).json()
+        self.assertEqual((len(data['results']), data['pagination']['more']), (5, False))
+
+    def test_related_columns_sort_in_sql(self):
+        other_user, other_staff, other_course, other_batch = make_staff("staff0", course_name="Java")
+        CourseTopic.objects.create(course=other_course, module_name="Advanced", topic_name="Streams")
+        make_students(self.staff, self.course, self.batch, 3)
+        make_students(other_staff, other_course, other_batch, 2, start=3)
+        call_command('seed_progress', stdout=StringIO())
+        # o=1..5 are the student/staff/course/module/topic columns
+        columns = {
+            1: ('"myapp_student"."student_name"', lambda p: p.student.student_name),
+            2: ('"myapp_staff"."staff_name"', lambda p: p.student.staff.staff_name),
+            3: ('"myapp_course"."course_name"', lambda p: p.topic.course.course_name),
+            4: ('"myapp_coursetopic"."module_name"', lambda p: p.topic.module_name),
+            5: ('"myapp_coursetopic"."topic_name"', lambda p: p.topic.topic_name),
+        }
+        for column, (sql_column, key) in columns.items():
+            for direction in ('', '-'):
+                with self.subTest(o=f'{direction}{column}'), CaptureQueriesContext(connection) as ctx:
+                    response = self.client.get(self.url, {'o': f'{direction}{column}'})
+                    rows = [key(progress) for progress in response.context['cl'].result_list]
+                    self.assertEqual(len(rows), 17)
+                    self.assertEqual(rows, sorted(rows, reverse=bool(direction)))
+                    order = f'ORDER BY {sql_column}{" DESC" if direction else " ASC"}'
+                    self.assertTrue(
+                        any(order in query['sql'] for query in ctx.captured_queries),
+                        f"no query ordered by {sql_column}",
+                    )
+
+
+class KeysetAdminPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, self.staff, self.course, self.batch = make_staff()
+        admin_user = User.objects.create_superuser("admin", "admin@example.com", "Secret-pass-123")
+        self.client.force_login(admin_user)
+        self.url = reverse('admin:myapp_studentattendance_changelist')
+        students = make_students(self.staff, self.course, self.batch, 5)
+        # 28 days in January and 22 in February per student
+        StudentAttendance.objects.bulk_create(
+            StudentAttendance(student=student, date=date(2025, 1 + day // 28, 1 + day % 28), status=True)
+            for student in students for day in range(50)
+        )
+
+    def test_walks_all_pages_by_cursor(self):
+        seen, params = [], {}
+        while True:
+            response = self.client.get(self.url, params)
+            cl = response.context['cl']
+            self.assertTrue(cl.keyset_paging)
+            seen.extend(row.pk for row in cl.result_list)
+            if not cl.next_cursor:
+                break
+            params = {'after': cl.next_cursor}
+        self.assertEqual(len(seen), 250)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+    def test_deep_page_uses_no_offset_or_count(self):
+        self.client.get(self.url)  # warms the cached count
+        last_pk = StudentAttendance.objects.order_by('pk').values_list('pk', flat=True)[120]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, {'after': last_pk})
+        sql = " ".join(q['sql'] for q in ctx.captured_queries if 'myapp_studentattendance' in q['sql'])
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('COUNT(', sql)
+        self.assertEqual(response.context['cl'].result_count, 250)
+
+    def test_cursor_is_not_a_filter_and_sorting_falls_back(self):
+        response = self.client.get(self.url, {'after': 10**6, 'status__exact': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('after=', response.context['cl'].get_query_string({'status__exact': '0'}))
+        response = self.client.get(self.url, {'o': '4'})
+        self.assertFalse(response.context['cl'].keyset_paging)
+
+    def test_date_hierarchy_drilldown(self):
+        response = self.client.get(self.url, {'date__year': 2025, 'date__month': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 110)
+
+
+class CourseTreeLookupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, self.staff, self.course, self.batch = make_staff()
+        admin_user = User.objects.create_superuser("admin", "admin@example.com", "Secret-pass-123")
+        self.client.force_login(admin_user)
+        self.url = reverse('admin:course_tree')
+
+    def myapp_queries(self, ctx):
+        return [q for q in ctx.captured_queries if 'myapp_' in q['sql']]
+
+    def test_tree_and_conditional_get(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.json(), [{
+            "id": self.course.pk, "name": "Python",
+            "staff": [{"id": self.staff.pk, "name": "Staff1", "batches": [{"id": self.batch.pk, "name": str(self.batch)}]}],
+        }])
+        self.assertIn('no-cache', response['Cache-Control'])
+        with CaptureQueriesContext(connection) as ctx:
+            cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(self.myapp_queries(ctx), [])
+
+    def test_changes_invalidate_tree(self):
+        etag = self.client.get(self.url)['ETag']
+        Batch.objects.create(staff=self.staff, batch_name="Evening", start_time=time(17), end_time=time(19))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()[0]["staff"][0]["batches"]), 2)
+        etag = response['ETag']
+        self.staff.courses.remove(self.course)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).json()[0]["staff"], [])
+
+    def test_tree_rebuilt_before_commit_is_dropped_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Batch.objects.create(staff=self.staff, batch_name="Evening", start_time=time(17), end_time=time(19))
+            # Another request rebuilding the tree from pre-commit data
+            cache.set(caching.COURSE_TREE_KEY, ([], 'stale'))
+        self.assertIsNone(cache.get(caching.COURSE_TREE_KEY))
+
+    def test_course_slice_and_legacy_endpoints(self):
+        other = Course.objects.create(course_name="Java")
+        self.assertEqual([c["name"] for c in self.client.get(self.url, {'course_id': other.pk}).json()], ["Java"])
+        staff = self.client.get(reverse('admin:getstaff'), {'course_id': self.course.pk}).json()
+        self.assertEqual(staff, [{"id": self.staff.pk, "name": "Staff1"}])
+        batches = self.client.get(reverse('admin:getbatches'), {'staff_id': self.staff.pk}).json()
+        self.assertEqual([b["id"] for b in batches], [self.batch.pk])
+
+    def test_legacy_endpoints_read_tree_once(self):
+        from . import admin
+
+        tree = mock.Mock(wraps=caching.get_course_tree)
+        with mock.patch.object(admin, 'get_course_tree', tree), mock.patch.object(caching, 'get_course_tree', tree):
+            self.client.get(reverse('admin:getstaff'), {'course_id': self.course.pk})
+            self.assertEqual(tree.call_count, 1)
+            self.client.get(reverse('admin:getbatches'), {'staff_id': self.staff.pk})
+            self.assertEqual(tree.call_count, 2)
+
+    def test_admin_form_options_come_from_cache(self):
+        from .admin import StudentAdminForm
+
+        self.client.get(self.url)  # warm the cache
+        with CaptureQueriesContext(connection) as ctx:
+            form = StudentAdminForm(data={'course': self.course.pk, 'staff': self.staff.pk})
+            staff_choices = list(form.fields['staff'].choices)
+            batch_choices = list(form.fields['batch'].choices)
+        self.assertEqual(self.myapp_queries(ctx), [])
+        self.assertEqual(staff_choices[1:], [(self.staff.pk, "Staff1")])
+        self.assertEqual(batch_choices[1:], [(self.batch.pk, str(self.batch))])
+
+
+class AttendanceReportTests(TestCase):
+    def setUp(self):
+        self.user, self.staff, self.course, self.batch = make_staff()
+        self.students = make_students(self.staff, self.course, self.batch, 3)
+        self.client.force_login(self.user)
+        self.url = reverse('attendance_report', args=[self.batch.pk])
+        marks = {
+            (0, 1): True, (0, 2): True, (0, 3): False,
+            (1, 1): False, (1, 2): True,
+            (2, 1): True,
+        }
+        StudentAttendance.objects.bulk_create(
+            StudentAttendance(student=self.students[i], date=date(2025, 2, day), status=status)
+            for (i, day), status in marks.items()
+        )
+        # outside the month, ignored
+        StudentAttendance.objects.create(student=self.students[0], date=date(2025, 3, 1), status=False)
+
+    def test_matrix_and_percentages(self):
+        report = self.client.get(self.url, {'month': '2025-02'}).context['report']
+        self.assertEqual(len(report['days']), 28)
+        rows = {row['student_id']: row for row in report['rows']}
+        first = rows[self.students[0].pk]
+        self.assertEqual(first['cells'][:4], [True, True, False, None])
+        self.assertEqual((first['present'], first['marked'], first['percent']), (2, 3, 66.7))
+        self.assertEqual(report['day_totals'][0]['percent'], 66.7)
+        self.assertEqual(report['day_totals'][1]['percent'], 100.0)
+        self.assertIsNone(report['day_totals'][5]['percent'])
+        self.assertEqual(report['percent'], 66.7)
+
+    def test_query_count_does_not_grow_with_students(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(self.url, {'month': '2025-02'})
+        more = make_students(self.staff, self.course, self.batch, 30, start=3)
+        StudentAttendance.objects.bulk_create(
+            StudentAttendance(student=student, date=date(2025, 2, 10), status=True) for student in more
+        )
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(self.url, {'month': '2025-02'})
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_other_staff_batch_is_404(self):
+        other_user, *_ = make_staff("staff2", "Java")
+        self.client.force_login(other_user)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class CsvExportTests(TestCase):
+    def setUp(self):
+        self.user, self.staff, self.course, self.batch = make_staff()
+        self.students = make_students(self.staff, self.course, self.batch, 3)
+        StudentAttendance.objects.bulk_create(
+            StudentAttendance(student=student, date=date(2025, 1, day), status=day % 2 == 1)
+            for student in self.students for day in (1, 2)
+        )
+        other_user, other_staff, other_course, other_batch = make_staff("staff2", "Java")
+        StudentAttendance.objects.create(
+            student=make_students(other_staff, other_course, other_batch, 1)[0], date=date(2025, 1, 1), status=True
+        )
+        self.client.force_login(self.user)
+
+    def read_csv(self, response):
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode().splitlines()
+
+    def test_staff_attendance_export_streams_own_rows(self):
+        response = self.client.get(reverse('export_attendance'), {'batch': self.batch.pk, 'from': '2025-01-02'})
+        with CaptureQueriesContext(connection) as ctx:
+            lines = self.read_csv(response)
+        self.assertEqual(lines[0], "Student,Email,Course,Staff,Batch,Date,Status")
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(all(line.endswith(",2025-01-02,Absent") for line in lines[1:]))
+        self.assertIn("Student 0,", lines[1])
+        # related names come from the same query
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_progress_export(self):
+        CourseTopic.objects.create(course=self.course, module_name="Basics", topic_name="Loops")
+        lines = self.read_csv(self.client.get(reverse('export_progress')))
+        self.assertEqual(len(lines), 4)
+        self.assertIn(",Python,Basics,Loops,", lines[1])
+
+    def test_other_staff_batch_is_404(self):
+        other_batch = Batch.objects.exclude(staff=self.staff).get()
+        self.assertEqual(self.client.get(reverse('export_attendance'), {'batch': other_batch.pk}).status_code, 404)
+
+    def test_malformed_batch_is_404(self):
+        for name in ('export_attendance', 'export_progress'):
+            for value in ('abc', '1.5', '-1', '1e3'):
+                with self.subTest(view=name, batch=value):
+                    self.assertEqual(self.client.get(reverse(name), {'batch': value}).status_code, 404)
+
+    def test_admin_action_exports_selection(self):
+        admin_user = User.objects.create_superuser("admin", "admin@example.com", "Secret-pass-123")
+        self.client.force_login(admin_user)
+        selected = list(StudentAttendance.objects.filter(date=date(2025, 1, 1)).values_list('pk', flat=True))
+        response = self.client.post(
+            reverse('admin:myapp_studentattendance_changelist'),
+            {'action': 'export_csv', '_selected_action': selected},
+        )
+        self.assertEqual(len(self.read_csv(response)), len(selected) + 1)
+
+
+class StudentCsvImportTests(TestCase):
+    HEADER = "student_name,student_email,student_contact,join_date,end_date,course,staff,batch,mode\n"
+
+    def setUp(self):
+        self.user, self.staff, self.course, self.batch = make_staff()
+        CourseTopic.objects.create(course=self.course, module_name="Basics", topic_name="Loops")
+        admin_user = User.objects.create_superuser("admin", "admin@example.com", "Secret-pass-123")
+        self.client.force_login(admin_user)
+        self.url = reverse('admin:myapp_student_import')
+
+    def upload(self, body):
+        data = (self.HEADER + body).encode()
+        return self.client.post(self.url, {'file': SimpleUploadedFile("students.csv", data, "text/csv")})
+
+    def test_valid_file_is_bulk_inserted_with_one_email_per_staff(self):
+        rows = "".join(
+            f"Student {i},s{i}@example.com,9876543210,2025-01-06,,python,Staff1,Morning,Online\n"
+            for i in range(120)
+        )
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.upload(rows)
+        self.assertRedirects(response, reverse('admin:myapp_student_changelist'))
+        self.assertEqual(Student.objects.filter(batch=self.batch, mode=False).count(), 120)
+        self.assertEqual(StudentTopicProgress.objects.count(), 120)
+        self.assertEqual(list(EmailOutbox.objects.values_list('subject', flat=True)), ["120 New Student(s) Assigned"])
+        self.assertLess(len(ctx.captured_queries), 25)
+
+    def test_errors_are_reported_per_row_and_nothing_is_saved(self):
+        Student.objects.create(
+            student_name="Old", join_date=date(2025, 1, 1), course=self.course,
+            staff=self.staff, student_email="Old@Example.com",
+        )
+        response = self.upload(
+            "Good,good@example.com,,2025-01-06,,Python,Staff1,,\n"
+            "Dup,old@example.com,,2025-01-06,,Python,Staff1,,\n"
+            "Bad,bad@example.com,123,2025-13-01,,Java,Nobody,Evening,Hybrid\n"
+            "Twice,good@example.com,,2025-01-06,2024-01-01,Python,Staff1,Evening,\n"
+            f"{'x' * 101},long@example.com,,2025-01-06,,Python,Staff1,,\n"
+        )
+        errors = dict(response.context['errors'])
+        self.assertEqual(sorted(errors), [3, 4, 5, 6])
+        self.assertIn("already exists", errors[3])
+        self.assertEqual(errors[6], "student_name is longer than 100 characters")
+        for fragment in ("valid 10-digit", "invalid date", "unknown course", "staff 'Nobody' is unknown", "mode must be"):
+            self.assertIn(fragment, errors[4])
+        self.assertIn("repeated in the file", errors[5])
+        self.assertIn("end_date is before join_date", errors[5])
+        self.assertIn("has no batch 'Evening'", errors[5])
+        self.assertFalse(Student.objects.filter(student_email="good@example.com").exists())
+
+    def test_missing_columns(self):
+        response = self.client.post(self.url, {'file': SimpleUploadedFile("s.csv", b"student_name\nA\n")})
+        self.assertContains(response, "Missing column(s)")
+
+    def test_changelist_links_to_import(self):
+        self.assertContains(self.client.get(reverse('admin:myapp_student_changelist')), self.url)
+
+
+class CurriculumImportTests(TestCase):
+    def setUp(self):
+        self.user, self.staff, self.course, self.batch = make_staff()
+        CourseTopic.objects.create(course=self.course, module_name="Basics", topic_name="Loops")
+        make_students(self.staff, self.course, self.batch, 4)
+
+    def test_command_upserts_normalized_topics_and_seeds_progress(self):
+        csv_text = "module_name,topic_name\n" + "".join(f"basics,topic {i}\n" for i in range(300))
+        csv_text += "BASICS,loops\nbasics,topic 1\n"  # existing and duplicate rows
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as handle:
+            handle.write(csv_text)
+            handle.flush()
+            with CaptureQueriesContext(connection) as ctx:
+                call_command('import_curriculum', 'python', handle.name, stdout=StringIO())
+        self.assertLess(len(ctx.captured_queries), 20)
+        self.assertEqual(self.course.topics.count(), 301)
+        self.assertTrue(self.course.topics.filter(module_name="Basics", topic_name="Topic 299").exists())
+        self.assertEqual(StudentTopicProgress.objects.count(), 4 * 300)
+
+    def test_yaml_upload_in_admin(self):
+        admin_user = User.objects.create_superuser("admin", "admin@example.com", "Secret-pass-123")
+        self.client.force_login(admin_user)
+        data = b"Basics:\n  - loops\n  - conditions\nfunctions:\n  - arguments\n"
+        response = self.client.post(reverse('admin:myapp_coursetopic_import'), {
+            'course': self.course.pk, 'file': SimpleUploadedFile("python.yaml", data),
+        })
+        self.assertRedirects(response, reverse('admin:myapp_coursetopic_changelist'))
+        self.assertEqual(
+            sorted(self.course.topics.values_list('module_name', 'topic_name')),
+            [("Basics", "Conditions"), ("Basics", "Loops"), ("Functions", "Arguments")],
+        )
+
+    def test_invalid_file_is_rejected(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as handle:
+            handle.write("module,topic\nA,B\n")
+            handle.flush()
+            with self.assertRaisesMessage(CommandError, "Missing column(s)"):
+                call_command('import_curriculum', 'python', handle.name, stdout=StringIO())
+
+
+class QueryPlanCheckTests(TestCase):
+    def test_staff_views_use_indexes(self):
+        out = StringIO()
+        call_command('check_query_plans', stdout=out, stderr=StringIO())
+        self.assertIn("No full table scans", out.getvalue())
+        self.assertFalse(User.objects.filter(username='__plan_check__').exists())
+
+    @skipUnless(connection.vendor == 'sqlite', "plan text is SQLite specific")
+    def test_hot_filters_use_composite_indexes(self):
+        from .management.commands.check_query_plans import explain
+
+        def plan(queryset):
+            sql, params = queryset.query.sql_with_params()
+            return "\n".join(explain(sql, params))
+
+        user, staff, course, batch = make_staff()
+        self.assertIn("(staff_id=? AND batch_id=?)", plan(Student.objects.filter(staff=staff, batch=batch)))
+        self.assertIn("(staff_id=? AND date=?)", plan(Attendance.objects.filter(staff=staff, date=date.today())))
+        self.assertNotIn("TEMP B-TREE", plan(Batch.objects.filter(staff=staff).order_by('start_time')))
+        self.assertIn("(date=?)", plan(StudentAttendance.objects.filter(date=date.today())))
+
+
+class SyntheticDataTests(TestCase):
+    def test_generate_data_command(self):
+        out = StringIO()
+        call_command('generate_data', '--size', 'small', '--students-per-batch', '3', '--months', '1', stdout=out)
+        self.assertEqual(Student.objects.count(), 2 * 2 * 3)
+        self.assertEqual(Batch.objects.count(), 4)
+        # every student has one progress row per topic of their course
+        self.assertEqual(StudentTopicProgress.objects.count(), Student.objects.count() * 10)
+        self.assertTrue(StudentAttendance.objects.exists())
+        self.assertIn("12 students", out.getvalue())
+        with self.assertRaisesMessage(CommandError, "already exists"):
+            call_command('generate_data', stdout=StringIO())
+
+    def test_benchmark_reports_json_and_cleans_up(self):
+        out = StringIO()
+        cache.set('unrelated', 'kept')
+        call_command('benchmark_views', '--sizes', 'small', '--repeat', '1', '--label', 'test', stdout=out)
+        # the site's cache is left alone
+        self.assertEqual(cache.get('unrelated'), 'kept')
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['label'], 'test')
+        [result] = report['results']
+        self.assertEqual(result['counts']['students'], 40)
+        for name, view in result['views'].items():
+            self.assertIn(view['status'], (200, 302), name)
+            self.assertGreater(view['queries'], 0, name)
+            self.assertGreater(view['peak_kib'], 0, name)
+        self.assertIn('admin:studenttopicprogress', result['views'])
+        self.assertFalse(Student.objects.exists())
+
+
+class QueryInstrumentationTests(TestCase):
+    def setUp(self):
+        self.user, self.staff, self.course, self.batch = make_staff()
+        make_students(self.staff, self.course, self.batch, 3)
+        self.client.force_login(self.user)
+
+    def test_disabled_by_default(self):
+        response = self.client.get(reverse('student_list', args=[self.batch.pk]))
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(REQUEST_INSTRUMENTATION=True, REQUEST_SLOW_THRESHOLD_MS=10_000)
+    def test_server_timing_header_and_log_line(self):
+        with self.assertLogs('myapp.middleware', 'INFO') as logs:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(reverse('get_batches'))
+        header = response['Server-Timing']
+        self.assertIn(f'desc="{len(ctx.captured_queries)} queries"', header)
+        self.assertIn('total;dur=', header)
+        [line] = logs.output
+        record = json.loads(line.split(':', 2)[2])
+        self.assertEqual(record['path'], reverse('get_batches'))
+        self.assertEqual(record['queries'], len(ctx.captured_queries))
+        self.assertGreaterEqual(record['duplicates'], 0)
+
+    @override_settings(REQUEST_INSTRUMENTATION=True, REQUEST_SLOW_THRESHOLD_MS=10_000,
+                       ROOT_URLCONF=root_urlconf(async_views))
+    async def test_counts_queries_of_async_views(self):
+        await self.async_client.aforce_login(self.user)
+        with self.assertLogs('myapp.middleware', 'INFO') as logs:
+            response = await self.async_client.get(reverse('student_list', args=[self.batch.pk]))
+        self.assertEqual(response.status_code, 200)
+        [line] = logs.output
+        queries = json.loads(line.split(':', 2)[2])['queries']
+        self.assertGreater(queries, 0)  # async ORM queries run on the sync thread
+        self.assertIn(f'desc="{queries} queries"', response['Server-Timing'])
+
+        async def get_response(request):
+            pass
+        # runs in the async chain itself, without a sync thread hop
+        self.assertTrue(iscoroutinefunction(QueryInstrumentationMiddleware(get_response)))
+
+    @override_settings(REQUEST_INSTRUMENTATION=True, REQUEST_SLOW_THRESHOLD_MS=0)
+    def test_slow_request_logs_slowest_sql(self):
+        with self.assertLogs('myapp.middleware', 'WARNING') as logs:
+            self.client.get(reverse('student_list', args=[self.batch.pk]))
+        [line] = logs.output
+        self.assertIn("Slow request GET", line)
+        slowest = json.loads(line.split(': ', 1)[1])['slowest_sql']
+        self.assertEqual(len(slowest), 3)
+        self.assertFalse(any('-- params:' in query['sql'] for query in slowest))
+        self.assertNotIn(self.client.session.session_key, line)
+
+    @override_settings(REQUEST_INSTRUMENTATION=True, REQUEST_SLOW_THRESHOLD_MS=0, REQUEST_LOG_SQL_PARAMS=True)
+    def test_slow_request_params_are_opt_in(self):
+        with self.assertLogs('myapp.middleware', 'WARNING') as logs:
+            self.client.get(reverse('student_list', args=[self.batch.pk]))
+        [line] = logs.output
+        self.assertIn('-- params:', line)
+
+
+class StaffMiddlewareTests(TestCase):
+    def setUp(self):
+        self.user, self.staff, self.course, self.batch = make_staff()
+        make_students(self.staff, self.course, self.batch, 3)
+        self.client.force_login(self.user)
+
+    def staff_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [q['sql'] for q in ctx.captured_queries if 'FROM "myapp_staff"' in q['sql']]
+
+    def test_one_lookup_per_request_joined_with_user(self):
+        [query] = self.staff_queries(reverse('student_list', args=[self.batch.pk]))
+        self.assertIn('"myapp_staff"."user_id" =', query)
+        self.assertIn('INNER JOIN "auth_user"', query)
+
+    def test_welcome_uses_request_staff(self):
+        response = self.client.get(reverse('get_batches'))
+        self.assertContains(response, f"Welcome, {self.staff.staff_name}")
+
+    def test_user_without_staff_profile_gets_404(self):
+        other = User.objects.create_user("plain", password="Secret-pass-123")
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('get_batches')).status_code, 404)
+
+    def test_profile_changes_apply_without_logging_in_again(self):
+        other = User.objects.create_user("plain", password="Secret-pass-123")
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('get_batches')).status_code, 404)
+        staff = Staff.objects.create(user=other, staff_name="Plain", staff_email="plain@example.com")
+        self.assertEqual(self.client.get(reverse('get_batches')).status_code, 200)
+        staff.delete()
+        self.assertEqual(self.client.get(reverse('get_batches')).status_code, 404)
+
+
+class TopicProgressCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, self.staff, self.course, self.batch = make_staff()
+        for name in ("Loops", "Functions"):
+            CourseTopic.objects.create(course=self.course, module_name="Basics", topic_name=name)
+        [self.student] = make_students(self.staff, self.course, self.batch, 1)
+        seed_topic_progress(students=[self.student])
+        self.client.force_login(self.user)
+        self.url = reverse('student_detail', args=[self.student.pk, self.batch.pk])
+
+    def table_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response, [
+            q['sql'] for q in ctx.captured_queries
+            if 'FROM "myapp_coursetopic"' in q['sql'] or 'FROM "myapp_studenttopicprogress"' in q['sql']
+        ]
+
+    def test_second_view_is_served_from_cache(self):
+        self.assertEqual(len(self.table_queries()[1]), 2)
+        self.assertEqual(self.table_queries()[1], [])
+
+    def test_progress_edit_invalidates(self):
+        self.table_queries()
+        progress = StudentTopicProgress.objects.get(student=self.student, topic__topic_name="Loops")
+        progress.marks = 87
+        update_topic_progress([progress], signed_by="Staff One")
+        response, queries = self.table_queries()
+        self.assertEqual(len(queries), 2)
+        self.assertContains(response, "87")
+
+    def test_topic_change_invalidates_course(self):
+        self.table_queries()
+        CourseTopic.objects.create(course=self.course, module_name="Basics", topic_name="Classes")
+        response, queries = self.table_queries()
+        self.assertEqual(len(queries), 2)
+        self.assertContains(response, "Classes")
+
+    def test_file_based_cache_backend(self):
+        with tempfile.TemporaryDirectory() as location:
+            backend = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}
+            with override_settings(CACHES={'default': backend}):
+                self.assertEqual(len(self.table_queries()[1]), 2)
+                self.assertEqual(self.table_queries()[1], [])
+                self.assertTrue(os.listdir(location))
+                StudentTopicProgress.objects.filter(student=self.student).first().delete()
+                self.assertEqual(len(self.table_queries()[1]), 2)
+
+
+class ProgressSummaryTests(TestCase):
+    def setUp(self):
+        self.user, self.staff, self.course, self.batch = make_staff()
+        self.topics = [
+            CourseTopic.objects.create(course=self.course, module_name="Basics", topic_name=f"Topic {i}")
+            for i in range(4)
+        ]
+        self.students = make_students(self.staff, self.course, self.batch, 3)
+        seed_topic_progress(students=self.students)
+
+    def summaries(self):
+        return {
+            s.student_id: tuple(getattr(s, f) for f in SUMMARY_FIELDS)
+            for s in StudentProgressSummary.objects.all()
+        }
+
+    def assert_matches_rebuild(self):
+        incremental = self.summaries()
+        rebuild_progress_summaries()
+        self.assertEqual(incremental, self.summaries())
+
+    def test_seeding_counts_topics(self):
+        summary = StudentProgressSummary.objects.get(student=self.students[0])
+        self.assertEqual((summary.topics_total, summary.topics_completed), (4, 0))
+        self.assertEqual(summary.percent_completed, 0.0)
+        self.assertEqual(seed_topic_progress(students=self.students), 0)
+        self.assert_matches_rebuild()
+
+    def test_every_write_path_matches_rebuild(self):
+        # add_progress: bulk update of rows loaded through the formset queryset
+        rows = list(StudentTopicProgress.objects.filter(student=self.students[0]).order_by('topic_id'))
+        rows[0].start_date, rows[0].end_date, rows[0].marks = date(2025, 1, 1), date(2025, 1, 3), 80
+        rows[1].start_date, rows[1].marks = date(2025, 1, 4), 60
+        update_topic_progress(rows[:2], signed_by="Staff One")
+        summary = StudentProgressSummary.objects.get(student=self.students[0])
+        self.assertEqual(summary.percent_completed, 25.0)
+        self.assertEqual(summary.average_marks, 70.0)
+        self.assertEqual(summary.last_activity, date(2025, 1, 4))
+        # editing again only applies the difference
+        rows[0].marks = 90
+        update_topic_progress(rows[:1], signed_by="Staff One")
+        self.assertEqual(StudentProgressSummary.objects.get(student=self.students[0]).marks_total, 150)
+        self.assert_matches_rebuild()
+
+        # single saves and deletes (admin), new topics, bulk curriculum import
+        progress = StudentTopicProgress.objects.get(student=self.students[1], topic=self.topics[2])
+        progress.end_date, progress.start_date = date(2025, 2, 2), date(2025, 2, 1)
+        progress.save()
+        StudentTopicProgress.objects.get(student=self.students[0], topic=self.topics[1]).delete()
+        CourseTopic.objects.create(course=self.course, module_name="Basics", topic_name="Extra")
+        import_curriculum(self.course, [("Advanced", "Generators"), ("Advanced", "Decorators")])
+        self.topics[3].delete()
+        self.assertEqual(StudentProgressSummary.objects.get(student=self.students[2]).topics_total, 6)
+        self.assert_matches_rebuild()
+
+        # moving a student to another course only counts the new course's rows
+        other = Course.objects.create(course_name="Java")
+        CourseTopic.objects.create(course=other, module_name="Intro", topic_name="Jvm")
+        student = Student.objects.get(pk=self.students[1].pk)
+        student.course = other
+        student.save()
+        self.assertEqual(StudentProgressSummary.objects.get(student=student).topics_total, 1)
+        self.assert_matches_rebuild()
+
+        # deleting a student with dated progress must not leave a summary behind
+        Student.objects.get(pk=self.students[0].pk).delete()
+        self.assertFalse(StudentProgressSummary.objects.filter(student_id=self.students[0].pk).exists())
+
+    def delete_queries(self, obj_or_queryset):
+        with CaptureQueriesContext(connection) as ctx:
+            obj_or_queryset.delete()
+        return len(ctx.captured_queries)
+
+    def test_cascading_deletes_stay_bulk(self):
+        small = self.delete_queries(self.topics[0])
+        more = make_students(self.staff, self.course, self.batch, 30, start=3)
+        seed_topic_progress(students=more)
+        # progress rows go in one DELETE and the summaries in one rebuild
+        self.assertEqual(self.delete_queries(self.topics[1]), small)
+        self.assertEqual(StudentProgressSummary.objects.get(student=more[0]).topics_total, 2)
+        self.assert_matches_rebuild()
+
+        student_queries = self.delete_queries(Student.objects.get(pk=more[0].pk))
+        for i in range(4, 24):
+            CourseTopic.objects.create(course=self.course, module_name="Basics", topic_name=f"Topic {i}")
+        self.assertEqual(self.delete_queries(Student.objects.get(pk=more[1].pk)), student_queries)
+        self.assert_matches_rebuild()
+
+        # a queryset of topics is collected once, not per topic
+        queryset_small = self.delete_queries(CourseTopic.objects.filter(topic_name__in=["Topic 4", "Topic 5"]))
+        self.assertEqual(
+            self.delete_queries(CourseTopic.objects.filter(topic_name__in=[f"Topic {i}" for i in range(6, 24)])),
+            queryset_small,
+        )
+        self.assertEqual(StudentProgressSummary.objects.get(student=more[2]).topics_total, 2)
+        self.assert_matches_rebuild()
+        self.course.delete()
+        self.assertFalse(StudentProgressSummary.objects.exists())
+
+    def test_direct_progress_queryset_delete_updates_summaries(self):
+        rows = StudentTopicProgress.objects.filter(topic__in=self.topics[:2])
+        rows.update(start_date=date(2025, 1, 1), end_date=date(2025, 1, 2), marks=50)
+        rebuild_progress_summaries()
+        StudentTopicProgress.objects.filter(student=self.students[0]).exclude(topic=self.topics[3]).delete()
+        StudentTopicProgress.objects.filter(topic=self.topics[0]).delete()
+        summary = StudentProgressSummary.objects.get(student=self.students[1])
+        self.assertEqual((summary.topics_total, summary.marks_total), (3, 50))
+        self.assertEqual(StudentProgressSummary.objects.get(student=self.students[0]).topics_total, 1)
+        self.assert_matches_rebuild()
+
+    def test_rebuild_command(self):
+        StudentProgressSummary.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_progress_summaries', stdout=out)
+        self.assertIn("3 students", out.getvalue())
+        self.assertEqual(StudentProgressSummary.objects.get(student=self.students[0]).topics_total, 4)
+
+    def test_admin_leaderboard(self):
+        admin_user = User.objects.create_superuser("admin", "admin@example.com", "Secret-pass-123")
+        self.client.force_login(admin_user)
+        response = self.client.get(reverse('admin:myapp_studentprogresssummary_changelist'))
+        self.assertContains(response, self.students[0].student_name)
+
+
+class BatchOverviewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, self.staff, self.course, self.batch = make_staff()
+        self.empty_batch = Batch.objects.create(
+            staff=self.staff, batch_name="Evening", start_time=time(18), end_time=time(19)
+        )
+        for i in range(2):
+            CourseTopic.objects.create(course=self.course, module_name="Basics", topic_name=f"Topic {i}")
+        self.students = make_students(self.staff, self.course, self.batch, 2)
+        seed_topic_progress(students=self.students)
+        today = localdate()
+        StudentAttendance.objects.bulk_create([
+            StudentAttendance(student=self.students[0], date=today, status=True),
+            StudentAttendance(student=self.students[1], date=today, status=True),
+            StudentAttendance(student=self.students[1], date=date(2000, 1, 1), status=False),
+        ])
+        progress = StudentTopicProgress.objects.filter(student=self.students[0]).order_by('topic_id').first()
+        progress.start_date, progress.end_date, progress.marks = today, today, 80
+        update_topic_progress([progress], signed_by="Staff1")
+        self.client.force_login(self.user)
+
+    def overview_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('get_batches'))
+        self.assertEqual(response.status_code, 200)
+        return response, [q['sql'] for q in ctx.captured_queries if 'GROUP BY' in q['sql']]
+
+    def test_metrics(self):
+        response, queries = self.overview_queries()
+        self.assertEqual(len(queries), 2)
+        stats = response.context['batch_stats']
+        self.assertEqual(stats[self.batch.pk], {
+            "students": 2, "attendance_percent": 100.0, "completion_percent": 25.0, "average_marks": 80.0,
+        })
+        self.assertNotIn(self.empty_batch.pk, stats)
+        self.assertContains(response, "25.0%")
+
+    def test_cached_until_attendance_is_marked(self):
+        self.overview_queries()
+        self.assertEqual(self.overview_queries()[1], [])
+        self.client.post(reverse('student_attendance', args=[self.batch.pk]), {
+            'date': localdate().strftime('%Y-%m-%d'),
+            f'status_{self.students[0].pk}': 'present',
+            f'status_{self.students[1].pk}': 'absent',
+        })
+        response, queries = self.overview_queries()
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(response.context['batch_stats'][self.batch.pk]["attendance_percent"], 50.0)
+
+    def test_new_student_invalidates(self):
+        self.overview_queries()
+        make_students(self.staff, self.course, self.empty_batch, 1, start=5)[0].save()
+        response, queries = self.overview_queries()
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(response.context['batch_stats'][self.empty_batch.pk]["students"], 1)
+
+    def test_attendance_deletes_invalidate_without_per_row_signals(self):
+        self.overview_queries()
+        # queryset and single-row deletes both drop the cached overview
+        StudentAttendance.objects.filter(student=self.students[1], date=localdate()).delete()
+        self.assertEqual(len(self.overview_queries()[1]), 2)
+        StudentAttendance.objects.get(student=self.students[0], date=localdate()).delete()
+        self.assertEqual(len(self.overview_queries()[1]), 2)
+
+        # a student's attendance rows go in one DELETE, however many there are
+        def student_delete_queries(student):
+            with CaptureQueriesContext(connection) as ctx:
+                Student.objects.get(pk=student.pk).delete()
+            return len(ctx.captured_queries)
+
+        few, many = make_students(self.staff, self.course, self.batch, 2, start=5)
+        StudentAttendance.objects.bulk_create(
+            StudentAttendance(student=many, date=date(2025, 1, day), status=True) for day in range(1, 29)
+        )
+        StudentAttendance.objects.create(student=few, date=date(2025, 1, 1), status=True)
+        self.assertEqual(student_delete_queries(many), student_delete_queries(few))
+
+
+class BulkApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, self.staff, self.course, self.batch = make_staff()
+        self.other_batch = Batch.objects.create(
+            staff=self.staff, batch_name="Evening", start_time=time(18), end_time=time(19)
+        )
+        self.topics = [
+            CourseTopic.objects.create(course=self.course, module_name="Basics", topic_name=f"Topic {i}")
+            for i in range(2)
+        ]
+        self.students = (make_students(self.staff, self.course, self.batch, 2)
+                         + make_students(self.staff, self.course, self.other_batch, 2, start=2))
+        seed_topic_progress(students=self.students)
+        self.client.force_login(self.user)
+
+    def post(self, name, records):
+        return self.client.post(reverse(name), json.dumps({"records": records}), content_type="application/json")
+
+    def test_attendance_across_batches_and_dates(self):
+        today = localdate()
+        StudentAttendance.objects.create(student=self.students[0], date=date(2025, 1, 2), status=True)
+        records = [
+            {"student": s.pk, "date": day, "status": "present" if n % 2 else "absent"}
+            for n, s in enumerate(self.students) for day in ("2025-01-02", today.isoformat())
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post('api_attendance', records)
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(len(ctx.captured_queries), 12)
+        body = response.json()
+        self.assertEqual(body["written"], 8)
+        self.assertEqual([r["result"] for r in body["results"][:2]], ["updated", "created"])
+        self.assertEqual(StudentAttendance.objects.filter(status=True).count(), 4)
+
+        response = self.post('api_attendance', records[:1])
+        self.assertEqual(response.json()["results"][0]["result"], "unchanged")
+
+    def test_invalid_attendance_writes_nothing(self):
+        other_user, other_staff, _, other_batch = make_staff("staff2")
+        [stranger] = make_students(other_staff, self.course, other_batch, 1, start=9)
+        response = self.post('api_attendance', [
+            {"student": self.students[0].pk, "date": "2025-01-02", "status": "present"},
+            {"student": stranger.pk, "date": "2025-01-02", "status": "present"},
+            {"student": self.students[1].pk, "date": "2999-01-01", "status": "present"},
+            {"student": self.students[1].pk, "date": "2025-01-02", "status": "late"},
+            {"student": self.students[0].pk, "date": "2025-01-02", "status": "absent"},
+        ])
+        self.assertEqual(response.status_code, 400)
+        results = response.json()["results"]
+        self.assertEqual([r["ok"] for r in results], [True, False, False, False, False])
+        self.assertEqual(results[1]["error"], "Unknown student.")
+        self.assertFalse(StudentAttendance.objects.exists())
+
+    def test_attendance_get_is_conditional(self):
+        url = reverse('api_attendance') + f"?batch={self.other_batch.pk}&from=2025-01-01&to=2025-01-31"
+        StudentAttendance.objects.create(student=self.students[2], date=date(2025, 1, 5), status=True)
+        StudentAttendance.objects.create(student=self.students[0], date=date(2025, 1, 5), status=True)
+        response = self.client.get(url)
+        self.assertEqual(response.json()["records"], [
+            {"student": self.students[2].pk, "batch": self.other_batch.pk, "date": "2025-01-05", "status": "present"},
+        ])
+        etag = response["ETag"]
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": etag}).status_code, 304)
+        self.post('api_attendance', [{"student": self.students[2].pk, "date": "2025-01-05", "status": "absent"}])
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["records"][0]["status"], "absent")
+
+    def test_progress_update_keeps_summary_and_cache_current(self):
+        detail = reverse('student_detail', args=[self.students[0].pk, self.batch.pk])
+        self.client.get(detail)
+        response = self.post('api_progress', [
+            {"student": self.students[0].pk, "topic": self.topics[0].pk,
+             "start_date": "2025-01-01", "end_date": "2025-01-05", "marks": 91},
+            {"student": self.students[1].pk, "topic": self.topics[1].pk, "start_date": "2025-01-03"},
+            {"student": self.students[2].pk, "topic": self.topics[1].pk},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["result"] for r in response.json()["results"]], ["updated", "updated", "unchanged"])
+        row = StudentTopicProgress.objects.get(student=self.students[0], topic=self.topics[0])
+        self.assertEqual((row.marks, row.sign), (91, self.staff.staff_name))
+        summary = StudentProgressSummary.objects.get(student=self.students[0])
+        self.assertEqual((summary.topics_completed, summary.marks_total), (1, 91))
+        self.assertContains(self.client.get(detail), "91")
+
+        url = reverse('api_progress') + f"?student={self.students[0].pk}"
+        records = self.client.get(url).json()["records"]
+        self.assertEqual(records[0]["end_date"], "2025-01-05")
+
+    def test_progress_post_loads_only_the_submitted_pairs(self):
+        pairs = [(self.students[0], self.topics[0]), (self.students[1], self.topics[1])]
+        with mock.patch.object(StudentTopicProgress, 'from_db', wraps=StudentTopicProgress.from_db) as loaded:
+            response = self.post('api_progress', [{"student": s.pk, "topic": t.pk, "marks": 70} for s, t in pairs])
+        self.assertEqual(response.status_code, 200)
+        # two rows, not the 2 x 2 cross product of the students and topics mentioned
+        self.assertEqual(loaded.call_count, 2)
+
+        more_topics = [
+            CourseTopic.objects.create(course=self.course, module_name="Extra", topic_name=f"Topic {i}")
+            for i in range(150)
+        ]
+        records = [
+            {"student": student.pk, "topic": topic.pk, "marks": 60}
+            for student in self.students[:3] for topic in more_topics
+        ]
+        with mock.patch('myapp.api.PAIRS_PER_QUERY', 100), CaptureQueriesContext(connection) as ctx:
+            response = self.post('api_progress', records)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({r["result"] for r in response.json()["results"]}, {"updated"})
+        # 450 pairs load in chunks of 100
+        loads = [q for q in ctx.captured_queries if q['sql'].startswith('SELECT "myapp_studenttopicprogress"."id"')]
+        self.assertEqual(len(loads), 5)
+
+    def test_invalid_progress_writes_nothing(self):
+        response = self.post('api_progress', [
+            {"student": self.students[0].pk, "topic": self.topics[0].pk, "marks": 50},
+            {"student": self.students[0].pk, "topic": self.topics[1].pk,
+             "start_date": "2025-02-01", "end_date": "2025-01-01"},
+            {"student": self.students[0].pk, "topic": 999, "marks": 1},
+            {"student": self.students[1].pk, "topic": self.topics[0].pk, "marks": "ten"},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r["ok"] for r in response.json()["results"]], [True, False, False, False])
+        self.assertFalse(StudentTopicProgress.objects.filter(marks__isnull=False).exists())
+
+    def test_requires_staff_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('api_attendance')).status_code, 401)
+        self.client.force_login(User.objects.create_user("plain"))
+        self.assertEqual(self.client.get(reverse('api_progress')).status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.post(reverse('api_progress'), "nope", content_type="application/json").status_code, 400)
+
+
+class AttendanceSyncTests(TestCase):
+    """A simulated offline client queues operations and syncs them in batches."""
+
+    def setUp(self):
+        cache.clear()
+        self.user, self.staff, self.course, self.batch = make_staff()
+        self.students = make_students(self.staff, self.course, self.batch, 4)
+        self.client.force_login(self.user)
+        self.start = timezone.now() - timezone.timedelta(days=1)
+
+    def sync(self, operations=(), cursor=None):
+        response = self.client.post(
+            reverse('api_sync'), json.dumps({"cursor": cursor, "operations": list(operations)}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def operation(self, n, student, day, status):
+        return {
+            "op_id": f"op-{n}", "timestamp": (self.start + timezone.timedelta(minutes=n)).isoformat(),
+            "student": student.pk, "date": day, "status": status,
+        }
+
+    def queued_operations(self):
+        rng = random.Random(7)
+        days = ["2025-03-01", "2025-03-02", "2025-03-03"]
+        return [
+            self.operation(n, rng.choice(self.students), rng.choice(days), rng.choice(["present", "absent"]))
+            for n in range(60)
+        ]
+
+    def expected_state(self, operations):
+        latest = {}
+        for op in operations:  # queued in timestamp order
+            latest[op["student"], op["date"]] = op["status"] == "present"
+        return latest
+
+    def stored_state(self):
+        return {
+            (student_id, day.isoformat()): status
+            for student_id, day, status in StudentAttendance.objects.values_list('student_id', 'date', 'status')
+        }
+
+    def test_replayed_and_reordered_batches_converge(self):
+        operations = self.queued_operations()
+        batches = [operations[i:i + 10] for i in range(0, len(operations), 10)]
+        rng = random.Random(3)
+        delivered = batches + rng.sample(batches, 3)  # lost acknowledgements: batches resent
+        rng.shuffle(delivered)
+
+        seen = set()
+        for batch in delivered:
+            body = self.sync(batch)
+            for op, result in zip(batch, body["results"]):
+                self.assertEqual(result["op_id"], op["op_id"])
+                self.assertEqual(result["duplicate"], op["op_id"] in seen)
+                self.assertIn(result["result"], ("applied", "stale"))
+            seen.update(op["op_id"] for op in batch)
+
+        self.assertEqual(self.stored_state(), self.expected_state(operations))
+        self.assertEqual(SyncOperation.objects.count(), 60)
+
+    def test_replay_does_not_override_newer_write(self):
+        first = self.operation(1, self.students[0], "2025-03-01", "present")
+        second = self.operation(2, self.students[0], "2025-03-01", "absent")
+        self.assertEqual(self.sync([second])["results"][0]["result"], "applied")
+        self.assertEqual(self.sync([first])["results"][0]["result"], "stale")
+        result = self.sync([second])["results"][0]
+        self.assertEqual((result["result"], result["duplicate"]), ("applied", True))
+        self.assertIs(StudentAttendance.objects.get().status, False)
+
+    def test_cursor_pulls_only_changes(self):
+        body = self.sync([self.operation(n, s, "2025-03-01", "present") for n, s in enumerate(self.students)])
+        self.assertEqual(len(body["changes"]), 4)
+        cursor = body["cursor"]
+        self.assertEqual(self.sync(cursor=cursor)["changes"], [])
+
+        # a change made elsewhere (the attendance form) shows up after the cursor
+        self.client.post(reverse('student_attendance', args=[self.batch.pk]), {
+            'date': '2025-03-01', f'status_{self.students[1].pk}': 'absent',
+        })
+        body = self.sync(cursor=cursor)
+        self.assertEqual(body["changes"], [
+            {"student": self.students[1].pk, "batch": self.batch.pk, "date": "2025-03-01", "status": "absent"},
+        ])
+        self.assertFalse(body["more"])
+        # the newer server-side write also wins over a late offline operation
+        late = self.operation(5, self.students[1], "2025-03-01", "present")
+        self.assertEqual(self.sync([late])["results"][0]["result"], "stale")
+
+    def test_writes_outside_sync_move_past_the_cursor(self):
+        self.sync([self.operation(n, s, "2025-03-01", "present") for n, s in enumerate(self.students)])
+        cursor = self.sync()["cursor"]
+        first, second = StudentAttendance.objects.order_by('pk')[:2]
+        first.status = False
+        first.save(update_fields=['status'])
+        StudentAttendance.objects.filter(pk=second.pk).update(status=False)
+        body = self.sync(cursor=cursor)
+        self.assertEqual([c["student"] for c in body["changes"]], [first.student_id, second.student_id])
+        self.assertEqual(self.sync(cursor=body["cursor"])["changes"], [])
+
+    def test_op_id_repeated_in_one_payload_is_a_duplicate(self):
+        op = self.operation(1, self.students[0], "2025-03-01", "present")
+        body = self.sync([op, {**op, "status": "absent"}])
+        self.assertEqual([(r["result"], r["duplicate"]) for r in body["results"]], [("applied", False), ("applied", True)])
+        self.assertIs(StudentAttendance.objects.get().status, True)
+
+    def test_prune_old_operations(self):
+        self.sync([self.operation(n, s, "2025-03-01", "present") for n, s in enumerate(self.students)])
+        SyncOperation.objects.filter(op_id__in=["op-0", "op-1"]).update(
+            created_at=timezone.now() - timezone.timedelta(days=31),
+        )
+        out = StringIO()
+        call_command('prune_sync_operations', stdout=out)
+        self.assertEqual(out.getvalue().strip(), "Pruned 2 sync operation(s).")
+        self.assertEqual(sorted(SyncOperation.objects.values_list('op_id', flat=True)), ["op-2", "op-3"])
+        # a pruned operation replayed later changes nothing
+        result = self.sync([self.operation(0, self.students[0], "2025-03-01", "present")])["results"][0]
+        self.assertEqual((result["result"], result["duplicate"]), ("stale", False))
+
+    def test_invalid_operations_are_rejected(self):
+        future = (timezone.now() + timezone.timedelta(hours=1)).isoformat()
+        body = self.sync([
+            {**self.operation(1, self.students[0], "2025-03-01", "present"), "timestamp": future},
+            {**self.operation(2, self.students[0], "2025-03-01", "present"), "op_id": None},
+            self.operation(3, self.students[0], "2025-03-01", "late"),
+            self.operation(4, self.students[0], "2025-03-01", "present"),
+        ])
+        self.assertEqual([r["result"] for r in body["results"]], ["rejected"] * 3 + ["applied"])
+        self.assertEqual(SyncOperation.objects.count(), 1)
+
+
+@override_settings(ROOT_URLCONF=root_urlconf(async_views))
+class AsyncStaffViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, self.staff, self.course, self.batch = make_staff()
+        self.other_batch = Batch.objects.create(
+            staff=self.staff, batch_name="Evening", start_time=time(18), end_time=time(19)
+        )
+        self.students = make_students(self.staff, self.course, self.batch, 3)
+
+    async def test_login_marks_attendance_and_redirects(self):
+        response = await self.async_client.post(
+            reverse('staff_login'), {'username': 'staff1', 'password': 'Secret-pass-123'},
+        )
+        self.assertRedirects(response, reverse('get_batches'), fetch_redirect_response=False)
+        self.assertEqual(await Attendance.objects.filter(staff=self.staff).acount(), 1)
+
+        response = await self.async_client.post(reverse('staff_login'), {'username': 'staff1', 'password': 'wrong'})
+        self.assertContains(response, "Invalid username or password.")
+
+    async def test_staff_pages(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('get_batches'))
+        self.assertContains(response, "Evening")
+        self.assertEqual(response.context['batch_stats'][self.batch.pk]["students"], 3)
+
+        response = await self.async_client.get(reverse('student_list', args=[self.batch.pk]))
+        self.assertContains(response, "Student 2")
+        self.assertContains(response, "Welcome, Staff1")
+
+        await self.async_client.post(reverse('student_list', args=[self.batch.pk]), {
+            'student_id': self.students[0].pk, 'batch': self.other_batch.pk, 'mode': 'False',
+        })
+        student = await Student.objects.aget(pk=self.students[0].pk)
+        self.assertEqual((student.batch_id, student.mode), (self.other_batch.pk, False))
+
+    async def test_mark_attendance(self):
+        await self.async_client.aforce_login(self.user)
+        url = reverse('student_attendance', args=[self.batch.pk])
+        response = await self.async_client.post(url, {
+            'date': '2025-01-06', **{f'status_{s.pk}': 'present' for s in self.students},
+        })
+        self.assertRedirects(response, f"{url}?date=2025-01-06", fetch_redirect_response=False)
+        self.assertEqual(await StudentAttendance.objects.filter(status=True).acount(), 3)
+        response = await self.async_client.get(url, {'date': '2025-01-06'})
+        self.assertEqual(len(response.context['attendance_records']), 3)
+
+    async def test_requires_staff(self):
+        url = reverse('get_batches')
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 302)
+        await self.async_client.aforce_login(await User.objects.acreate(username="plain"))
+        self.assertEqual((await self.async_client.get(url)).status_code, 404)
+
+
+class LoadTestCommandTests(TransactionTestCase):
+    def test_reports_both_servers(self):
+        out = StringIO()
+        cache.set('unrelated', 'kept')
+        call_command('load_test', clients='3', requests=3, stdout=out)
+        self.assertEqual(cache.get('unrelated'), 'kept')
+        results = json.loads(out.getvalue())["results"]
+        self.assertEqual([r["server"] for r in results], ["wsgi", "asgi"])
+        self.assertEqual([(r["requests"], r["errors"]) for r in results], [(9, 0), (9, 0)])
+        self.assertFalse(User.objects.filter(username__startswith='loadtest-').exists())
+
+
+class ConcurrentWriteTests(TransactionTestCase):
+    """Runs on the file test database with the WAL profile from settings."""
+
+    def test_parallel_attendance_marking_has_no_lock_errors(self):
+        out = StringIO()
+        cache.set('unrelated', 'kept')
+        call_command('concurrent_attendance', threads=8, days=3, students=5, stdout=out)
+        self.assertEqual(cache.get('unrelated'), 'kept')
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['journal_mode'], 'wal')
+        self.assertEqual((report['submissions'], report['lock_errors'], report['other_errors']), (24, 0, 0))
+
+    def test_retry_on_lock(self):
+        calls = []
+
+        @services.retry_on_lock
+        def write():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError("database is locked")
+            return "done"
+
+        with mock.patch.object(services, 'LOCK_BACKOFF_SECONDS', 0):
+            self.assertEqual(write(), "done")
+            self.assertEqual(len(calls), 3)
+            # inside an outer transaction the caller owns the retry
+            calls.clear()
+            with self.assertRaises(OperationalError), transaction.atomic():
+                write()
+            self.assertEqual(len(calls), 1)
+            # a lock that already outlasted the busy timeout is not retried
+            calls.clear()
+            with mock.patch.object(services, '_busy_timeout', return_value=0), self.assertRaises(OperationalError):
+                write()
+            self.assertEqual(len(calls), 1)
+
+    @skipUnless(connection.vendor == 'sqlite', "BEGIN modes are SQLite specific")
+    def test_only_write_paths_begin_immediate(self):
+        with CaptureQueriesContext(connection) as ctx:
+            with transaction.atomic():
+                Student.objects.exists()
+            with services.write_atomic():
+                Student.objects.exists()
+            with transaction.atomic(), services.write_atomic():  # nested: the outer BEGIN stands
+                Student.objects.exists()
+        begins = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('BEGIN')]
+        self.assertEqual(begins, ['BEGIN', 'BEGIN IMMEDIATE', 'BEGIN'])
+        self.assertIsNone(connection.transaction_mode)
@@ -1,17 +1,39 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, async_views, views
 
 
-urlpatterns = [
-    path('login/', views.staff_login, name='staff_login'),
+def staff_urlpatterns(staff_views):
+    """The high-traffic staff pages, served by ``views`` or ``async_views``."""
+    return [
+        path('login/', staff_views.staff_login, name='staff_login'),
+        path('get_batches/', staff_views.getBatches, name='get_batches'),
+        path('students/<int:batch_id>/', staff_views.student_list, name='student_list'),
+        path("attendance/<int:batch_id>", staff_views.mark_student_attendance, name="student_attendance"),
+    ]
+
+
+urlpatterns = staff_urlpatterns(async_views if settings.ASYNC_STAFF_VIEWS else views) + [
     path('logout/', views.staff_logout, name='staff_logout'),
-    path('get_batches/', views.getBatches, name='get_batches'),
-    path('students/<int:batch_id>/', views.student_list, name='student_list'),  
     path('student/<int:student_id>/<int:batch_id>', views.student_detail, name='student_detail'),
     path('student/<int:student_id>/<int:batch_id>/progress/', views.add_progress, name='add_progress'),
-    path("attendance/<int:batch_id>", views.mark_student_attendance, name="student_attendance"),
+    path("attendance/<int:batch_id>/report/", views.attendance_report, name="attendance_report"),
     path('add_batch/', views.add_batch, name='add_batch'),
+    path('export/attendance/', views.export_attendance, name='export_attendance'),
+    path('export/progress/', views.export_progress, name='export_progress'),
     path('register_staff/', views.register_staff, name='register_staff'),
+    path('api/attendance/', api.attendance, name='api_attendance'),
+    path('api/progress/', api.progress, name='api_progress'),
+    path('api/sync/', api.sync, name='api_sync'),
 
     path('', views.home, name='home'),
 ]
+
+
+def root_urlconf(staff_views):
+    """A ROOT_URLCONF serving the staff pages from ``staff_views``, so both
+    code paths can be exercised in one process (tests, load_test command).
+    """
+    from StudentReport.urls import urlpatterns as root_patterns
+
+    return type('StaffURLConf', (), {'urlpatterns': staff_urlpatterns(staff_views) + root_patterns})
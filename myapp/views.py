@@ -2,9 +2,9 @@ from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
-from .models import Student, StudentTopicProgress, Staff, CourseTopic , Attendance , StudentAttendance ,Batch
+from .models import Student, StudentTopicProgress, Attendance , StudentAttendance ,Batch
 from django.contrib import messages
 from django.forms import modelformset_factory
 from django import forms
@@ -13,11 +13,29 @@ from django.utils import timezone
 from django.urls import reverse
 from datetime import date
 import logging
+from functools import wraps
 from django.views.decorators.http import require_GET
+from .caching import get_batch_overview, get_topic_progress_list
+from .exports import attendance_csv_response, progress_csv_response
+from .reports import monthly_attendance_matrix
+from .services import save_student_attendance, update_topic_progress
 
 logger = logging.getLogger(__name__)
 
 
+def staff_required(view_func):
+    """login_required, then 404 unless the user has a Staff profile.
+
+    The view reads the profile from ``request.staff`` (see StaffMiddleware).
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not request.staff:
+            raise Http404("No Staff matches the given query.")
+        return view_func(request, *args, **kwargs)
+    return login_required(wrapper)
+
+
 def home(request):
     return render(request, 'home.html')
 
@@ -50,31 +68,15 @@ def register_staff(request):
 
 @login_required
 def student_detail(request, student_id,batch_id):
-    student = get_object_or_404(Student, pk=student_id)
+    student = get_object_or_404(Student.objects.select_related('course', 'staff'), pk=student_id)
 
-    print("student :",student)
+    logger.debug(f"student_detail: {student}")
     #  Only allow staff to see their own students
-    if hasattr(request.user, 'staff'):
-        if student.staff != request.user.staff:
-            return redirect('home')
-
-    #  Fetch all topics for the student's course
-    # topics = CourseTopic.objects.filter(course=student.course).order_by('module_name', 'topic_name')
-    topics = CourseTopic.objects.filter(course=student.course).order_by('topic_id')
+    if request.staff and student.staff_id != request.staff.pk:
+        return redirect('home')
 
-
-    #  Get progress for each topic (or None if not yet added)
-    progress_dict = {
-        p.topic_id: p for p in StudentTopicProgress.objects.filter(student=student)
-    }
-
-    # Build a list with topic + progress (if exists)
-    topic_progress_list = []
-    for topic in topics:
-        topic_progress_list.append({
-            "topic": topic,
-            "progress": progress_dict.get(topic.pk)
-        })
+    # Topic + progress rows, cached until a topic or the student's progress changes
+    topic_progress_list = get_topic_progress_list(student)
 
     return render(request, 'student_detail.html', {
         'student': student,
@@ -82,16 +84,15 @@ def student_detail(request, student_id,batch_id):
         'batch_id': batch_id,
     })
 
-@login_required
+@staff_required
 def student_list(request,batch_id):
-    staff = get_object_or_404(Staff, user=request.user)
+    staff = request.staff
     batch=get_object_or_404(Batch, pk=batch_id, staff=staff)
-    students = Student.objects.filter(staff=staff,batch=batch)
+    students = Student.objects.filter(staff=staff,batch=batch).select_related('course')
     batches=Batch.objects.filter(staff=staff)
 
     today = localdate()
     attendance=Attendance.objects.filter(staff=staff,date=today).last()
-    print(attendance)
     if request.method == "POST":
         student_id = request.POST.get('student_id')
         new_batch_id = request.POST.get('batch')
@@ -115,18 +116,12 @@ def student_list(request,batch_id):
     return render(request, 'student_list.html', {'students': students , 'attendance':attendance,'batch':batch,'all_batches':all_batches,'batches':batches,})
 
 
-@login_required
+@staff_required
 def add_progress(request, student_id,batch_id):
-    staff = get_object_or_404(Staff, user=request.user)
+    staff = request.staff
     student = get_object_or_404(Student, pk=student_id, staff=staff)
     batch = get_object_or_404(Batch, pk=batch_id)
-    # Ensure all topics exist for this student
-    topics = CourseTopic.objects.filter(course=student.course).order_by('topic_id')
-    for topic in topics:
-        StudentTopicProgress.objects.get_or_create(
-            student=student,
-            topic=topic
-        )
+    # Progress rows are seeded at enrollment (see signals / seed_progress command)
 
     class ProgressForm(forms.ModelForm):
         class Meta:
@@ -143,26 +138,26 @@ def add_progress(request, student_id,batch_id):
         extra=0
     )
 
-    queryset = StudentTopicProgress.objects.filter(student=student).order_by('topic__topic_id')
+    queryset = (
+        StudentTopicProgress.objects
+        .filter(student=student, topic__course_id=student.course_id)
+        .select_related('topic')
+        .order_by('topic_id')
+    )
 
     if request.method == "POST":
         formset = ProgressFormSet(request.POST, queryset=queryset)
         if formset.is_valid():
-            for form in formset.forms:
-                progress = form.save(commit=False)
-                if form.has_changed():
-                    progress.sign = staff.staff_name
-                progress.save()
-                form.save_m2m()
+            changed = [form.save(commit=False) for form in formset.forms if form.has_changed()]
+            update_topic_progress(changed, signed_by=staff.staff_name)
             return redirect('student_detail', student_id=student.pk,batch_id=batch.pk)
         else:
-            print("Formset errors:", formset.errors)
-            print("Non-form errors:", formset.non_form_errors())
+            logger.warning(f"Progress formset errors: {formset.errors} {formset.non_form_errors()}")
 
     else:
         formset = ProgressFormSet(queryset=queryset)
 
-    topic_form_pairs = list(zip(formset.forms, topics))
+    topic_form_pairs = [(form, form.instance.topic) for form in formset.forms]
 
     return render(request, 'add_progress.html', {
         'student': student,
@@ -182,16 +177,16 @@ def staff_login(request):
         if user is not None:
             login(request, user)
             #  Redirect staff to student batch list (not back to home)
-            if hasattr(user, 'staff'):
+            if request.staff:
                 return redirect('get_batches')
             return redirect('home')
         else:
             messages.error(request, "Invalid username or password.")
     return render(request, 'staff_login.html')
 
-@login_required
+@staff_required
 def add_batch(request):
-    staff=get_object_or_404(Staff,user=request.user)
+    staff = request.staff
     if request.method=="POST":
         batch_name=request.POST["batch_name"]
         start_time=request.POST["start_time"]
@@ -217,11 +212,11 @@ def add_batch(request):
 
 
 
-@login_required
+@staff_required
 def mark_student_attendance(request,batch_id):
-    staff = get_object_or_404(Staff, user=request.user)
+    staff = request.staff
     batch=get_object_or_404(Batch, pk=batch_id, staff=staff)
-    students = Student.objects.filter(staff=staff,batch=batch)
+    students = Student.objects.filter(staff=staff,batch=batch).select_related('course')
     today = timezone.now().date()
 
     # --- Get the selected date (POST first, then GET) ---
@@ -241,20 +236,13 @@ def mark_student_attendance(request,batch_id):
 
     # --- Save attendance if POST ---
     if request.method == "POST":
-        for student in students:
-            status = request.POST.get(f"status_{student.student_id}")
+        statuses = {}
+        for student_id in students.values_list('student_id', flat=True):
+            status = request.POST.get(f"status_{student_id}")
             if status is not None:
-                status_bool = True if status == "present" else False
-                attendance, created = StudentAttendance.objects.get_or_create(
-                    student=student,
-                    date=selected_date,
-                    defaults={"status": status_bool}
-                )
-                print("attendance : ",attendance, "created : ",created)
-                if not created:
-                    attendance.status = status_bool
-                    attendance.save()
-                    print("attendance : ",attendance, "created : ",created)
+                statuses[student_id] = status == "present"
+        written = save_student_attendance(statuses, selected_date)
+        logger.info(f"Attendance saved for batch {batch.batch_id} on {selected_date}: {written} rows written")
         # Redirect back to the same selected date
         return redirect(f"{reverse('student_attendance', args=[batch.batch_id])}?date={selected_date.strftime('%Y-%m-%d')}")
 
@@ -272,11 +260,73 @@ def mark_student_attendance(request,batch_id):
         "batch": batch,
     })
 
-@login_required
+@staff_required
+def attendance_report(request, batch_id):
+    staff = request.staff
+    batch = get_object_or_404(Batch, pk=batch_id, staff=staff)
+
+    # --- Selected month (YYYY-MM), defaults to the current month ---
+    try:
+        first_day = datetime.strptime(request.GET.get("month", ""), "%Y-%m").date()
+    except ValueError:
+        first_day = localdate().replace(day=1)
+
+    report = monthly_attendance_matrix(batch, first_day.year, first_day.month)
+    return render(request, "attendance_report.html", {
+        "batch": batch,
+        "report": report,
+        "selected_month": first_day.strftime("%Y-%m"),
+        "month_label": first_day.strftime("%B %Y"),
+    })
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+def _export_batch(request, staff):
+    """The staff member's batch named by ?batch=, None when absent; 404 when it is not one of theirs"""
+    batch_id = request.GET.get("batch")
+    if not batch_id:
+        return None
+    if not batch_id.isdigit():
+        raise Http404("No Batch matches the given query.")
+    return get_object_or_404(Batch, pk=int(batch_id), staff=staff)
+
+@staff_required
+@require_GET
+def export_attendance(request):
+    """Stream the staff member's student attendance as CSV (?batch=&from=&to=)"""
+    staff = request.staff
+    records = StudentAttendance.objects.filter(student__staff=staff)
+    batch = _export_batch(request, staff)
+    if batch:
+        records = records.filter(student__batch=batch)
+    date_from, date_to = _parse_date(request.GET.get("from")), _parse_date(request.GET.get("to"))
+    if date_from:
+        records = records.filter(date__gte=date_from)
+    if date_to:
+        records = records.filter(date__lte=date_to)
+    return attendance_csv_response(records, filename=f"attendance_{localdate():%Y%m%d}.csv")
+
+@staff_required
+@require_GET
+def export_progress(request):
+    """Stream the staff member's student topic progress as CSV (?batch=)"""
+    staff = request.staff
+    records = StudentTopicProgress.objects.filter(student__staff=staff)
+    batch = _export_batch(request, staff)
+    if batch:
+        records = records.filter(student__batch=batch)
+    return progress_csv_response(records, filename=f"progress_{localdate():%Y%m%d}.csv")
+
+@staff_required
 def getBatches(request):
-    staff= get_object_or_404(Staff, user=request.user)
+    staff = request.staff
     batches = Batch.objects.filter(staff=staff).order_by('start_time')
-    return render(request, 'batch.html', {'batches': batches,'staff':staff})
+    batch_stats = get_batch_overview(staff)
+    return render(request, 'batch.html', {'batches': batches,'staff':staff,'batch_stats':batch_stats})
 
 def staff_logout(request):
     logout(request)